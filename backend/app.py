@@ -1,84 +1,159 @@
-from flask import Flask, request, jsonify
+"""
+API Flask do gerador de propostas
+
+O módulo não tem efeitos colaterais no import: create_app() lê o .env, monta
+o app, aplica as migrações e inicia os workers da fila. Os módulos pesados
+(fetcher/requests, extractor, llm) só são importados pela primeira rota
+que precisa deles.
+"""
+from flask import Blueprint, Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
-import openai
-import sqlite3
+import base64
 import datetime
 import json
-import requests
-from bs4 import BeautifulSoup
+import math
+import time
 import re
-from dotenv import load_dotenv
+import db
+import db_utils
+import llm_cache
+import jobs
+import prompts
+import telemetry
+import stats
+import migrations
+import instrumentation
+import compression
+import response_cache
+import projects_cache
+from db import PoolTimeout, get_connection
 
-# Carregar variáveis de ambiente
-load_dotenv()
+# Rotas da API (registradas no app por create_app)
+api = Blueprint('api', __name__)
 
-app = Flask(__name__)
-CORS(app)  # Habilitar CORS para todas as rotas
-
-# Configuração da API OpenAI (usando método antigo compatível)
-openai.api_key = os.environ.get('OPENAI_API_KEY')
+# Chave padrão da API OpenAI (cada requisição pode enviar a sua em `apiKey`)
+OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 
 # Configuração do autor da proposta
 PROPOSAL_AUTHOR = os.environ.get('PROPOSAL_AUTHOR', 'Rivaldo Silveira')
 
-# Configuração do banco de dados SQLite
-DB_PATH = os.path.join(os.path.dirname(__file__), 'proposals.db')
+# Parâmetros das chamadas de geração (também fazem parte da chave do cache)
+GENERATION_MAX_TOKENS = 2500  # Aumentado para permitir propostas com melhor formatação e espaçamento
+GENERATION_TEMPERATURE = 0.7
+
+# Partes fixas dos prompts montadas uma única vez
+prompt_builder = prompts.PromptBuilder(PROPOSAL_AUTHOR, GENERATION_MAX_TOKENS)
+
+# Busca textual: índice FTS5 (desativado automaticamente se o SQLite não tiver FTS5)
+FTS_ENABLED = True
+
+# Pesos BM25 das colunas indexadas: client_name, project_description, content
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+
+# Palavras do termo de busca (letras, números e acentos)
+SEARCH_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Paginação das listagens (keyset por created_at, id)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Colunas que podem ser pedidas em `fields` (e as devolvidas sem `fields`;
+# content_hash é interno da importação)
+PROPOSAL_COLUMNS = (
+    'id', 'client_name', 'project_description', 'value', 'deadline',
+    'additional_points', 'custom_prompt', 'content', 'created_at',
+    'author', 'model', 'project_id'
+)
+PROJECT_COLUMNS = ('id', 'name', 'description', 'created_at')
+
+# Campos calculados pelo banco, para listagens que não precisam do texto completo
+# (o conteúdo pode estar comprimido, ver compression.py)
+PREVIEW_LENGTH = 200
+PROPOSAL_COMPUTED_FIELDS = {
+    'preview': f'substr(unpack_text({{p}}content), 1, {PREVIEW_LENGTH}) AS preview',
+    'content_length': 'length(unpack_text({p}content)) AS content_length'
+}
+
+# Extração do 99freelas: host aceito nas URLs e limites da extração em lote
+FREELAS_HOST = os.environ.get('FREELAS_HOST', '99freelas.com')
+BATCH_MAX_URLS = int(os.environ.get('FREELAS_BATCH_MAX_URLS', '100'))
+BATCH_MAX_CONCURRENCY = 16
+
+def load_settings():
+    """Lê o .env e recalcula as configurações que dependem dele"""
+    global OPENAI_API_KEY, PROPOSAL_AUTHOR, prompt_builder
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
+    PROPOSAL_AUTHOR = os.environ.get('PROPOSAL_AUTHOR', 'Rivaldo Silveira')
+    prompt_builder = prompts.PromptBuilder(PROPOSAL_AUTHOR, GENERATION_MAX_TOKENS)
 
 def init_db():
-    """Inicializa o banco de dados SQLite"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Criação da tabela de propostas
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS proposals (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        client_name TEXT NOT NULL,
-        project_description TEXT NOT NULL,
-        value REAL NOT NULL,
-        deadline TEXT NOT NULL,
-        additional_points TEXT,
-        custom_prompt TEXT,
-        content TEXT NOT NULL,
-        created_at TEXT NOT NULL,
-        author TEXT NOT NULL,
-        model TEXT NOT NULL,
-        project_id INTEGER
-    )
-    ''')
-    
-    # Verifica se a coluna project_id existe, se não, adiciona
-    try:
-        cursor.execute('SELECT project_id FROM proposals LIMIT 1')
-    except sqlite3.OperationalError:
-        # A coluna não existe, vamos adicioná-la
-        cursor.execute('ALTER TABLE proposals ADD COLUMN project_id INTEGER')
-    
-    # Criação da tabela de projetos
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS projects (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        description TEXT NOT NULL,
-        created_at TEXT NOT NULL
-    )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    """Aplica as migrações pendentes do esquema (ver migrations.py)"""
+    global FTS_ENABLED
     
-# Inicializa o banco de dados
-init_db()
+    with get_connection() as conn:
+        migrations.migrate(conn)
+        # Sem FTS5 no SQLite, a migração do índice de busca não cria a tabela
+        FTS_ENABLED = migrations.has_table(conn, 'proposals_fts')
+
+def startup(start_jobs=True):
+    """Preparação do processo: esquema do banco, vocabulário do tokenizer e workers da fila
+
+    Chamada uma vez por create_app(). Servidores que pré-carregam o app e
+    depois fazem fork passam start_jobs=False e iniciam os workers em cada
+    processo filho com job_queue.start().
+    """
+    init_db()
+    # Em segundo plano: a primeira geração não espera pelo download do vocabulário
+    prompts.warmup()
+    if start_jobs:
+        job_queue.start()
+
+def create_app(start_jobs=True):
+    """Cria o app Flask com as rotas da API, os hooks e o banco pronto"""
+    load_settings()
+
+    app = Flask(__name__)
+    CORS(app)  # Habilitar CORS para todas as rotas
+
+    # Tempos por fase, consultas lentas e profiling sob demanda (desligados por padrão)
+    instrumentation.init_app(app)
+
+    # Respostas JSON comprimidas com brotli/gzip conforme o Accept-Encoding
+    compression.init_app(app)
+
+    app.register_blueprint(api)
+    startup(start_jobs)
+    return app
+
+def openai_client(api_key, route):
+    """Cliente da OpenAI com a telemetria ligada (importa llm/requests no primeiro uso)"""
+    import llm
+
+    # Toda chamada à OpenAI alimenta a telemetria (add_listener ignora repetidos)
+    llm.add_listener(telemetry.telemetry.record)
+    return llm.OpenAIClient(api_key, route=route)
+
+@api.app_errorhandler(PoolTimeout)
+def handle_pool_timeout(e):
+    """Responde 503 quando todas as conexões do banco estão ocupadas"""
+    print(f"Pool de conexões esgotado: {str(e)}")
+    return jsonify({
+        'success': False,
+        'error': 'Banco de dados ocupado. Tente novamente em instantes.'
+    }), 503
 
 # Função removida - vamos usar a IA para identificar o gênero
 
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/health', methods=['GET'])
 def health_check():
     """Rota para verificar se a API está funcionando"""
     return jsonify({'status': 'online', 'message': 'API Flask está funcionando!'})
 
-@app.route('/api/extract-99freelas', methods=['POST'])
+@api.route('/api/extract-99freelas', methods=['POST'])
 def extract_99freelas():
     """Extrai informações de um projeto do 99freelas a partir da URL"""
     data = request.json
@@ -92,126 +167,30 @@ def extract_99freelas():
     url = data['url']
     
     # Verifica se é uma URL do 99freelas
-    if '99freelas.com' not in url:
+    if not is_freelas_url(url):
         return jsonify({
             'success': False,
             'error': 'A URL fornecida não é do 99freelas'
         }), 400
     
+    # requests e o extrator só são carregados na primeira extração
+    from extractor import extract_project_data
+    from fetcher import FetchError, fetcher
+
     try:
-        # Faz a requisição para a página do projeto
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        if response.status_code != 200:
-            return jsonify({
-                'success': False,
-                'error': f'Erro ao acessar a página. Status code: {response.status_code}'
-            }), 500
-        
-        # Parse do HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Extrair informações do projeto
-        project_data = {}
-        
-        # Nome do cliente - tentar diferentes estratégias
-        client_name = None
-        
-        # Estratégia 1: Buscar pelo elemento específico do nome do cliente
-        client_name_elem = soup.select_one('.info-usuario-nome span.name')
-        if client_name_elem and client_name_elem.text.strip():
-            client_name = client_name_elem.text.strip()
-            
-        # Estratégia 2: Se não encontrou, buscar na seção de informações do cliente
-        if not client_name:
-            client_div = soup.select_one('div:-soup-contains("Cliente") h2')
-            if client_div and client_div.text.strip():
-                client_name = client_div.text.strip()
-                
-        # Estratégia 3: Tentar encontrar o texto "Cliente:" seguido do nome
-        if not client_name:
-            cliente_pattern = re.search(r'Cliente:?\s*([A-Za-z0-9\s]+)', response.text)
-            if cliente_pattern:
-                client_name = cliente_pattern.group(1).strip()
-                
-        # Se ainda não tiver nome, usar um nome padrão
-        if not client_name:
-            client_name = "Cliente"
-            
-        project_data['clientName'] = client_name
-        
-        # Descrição do projeto - tentar diferentes estratégias
-        project_description = None
-        
-        # Estratégia 1: Buscar pelo elemento específico da descrição
-        project_desc_elem = soup.select_one('.item-text.project-description')
-        if project_desc_elem and project_desc_elem.text.strip():
-            project_description = project_desc_elem.text.strip()
-        
-        # Estratégia 2: Procurar por outros elementos que possam conter a descrição
-        if not project_description:
-            desc_elem = soup.select_one('div:-soup-contains("Descrição do Projeto:"), div.project-description')
-            if desc_elem and desc_elem.text.strip():
-                # Extrair apenas a parte após "Descrição do Projeto:"
-                desc_text = desc_elem.text.strip()
-                desc_match = re.search(r'Descrição do Projeto:?\s*(.+)', desc_text, re.DOTALL)
-                if desc_match:
-                    project_description = desc_match.group(1).strip()
-                else:
-                    project_description = desc_text
-                
-        # Estratégia 3: Procurar por qualquer texto longo que possa ser a descrição
-        if not project_description:
-            for p in soup.select('p'):
-                if p.text and len(p.text.strip()) > 100:  # Descrições geralmente são longas
-                    project_description = p.text.strip()
-                    break
-                    
-        # Se ainda não tiver descrição, usar um texto padrão
-        if not project_description:
-            project_description = "Descrição do projeto não encontrada. Por favor, preencha manualmente."
-            
-        project_data['projectDescription'] = project_description
-        
-        # Valor do projeto (se disponível) - tentar diferentes estratégias
-        value = None
-        
-        # Estratégia 1: Buscar pelo elemento específico do valor
-        value_elem = soup.select_one('div:-soup-contains("Valor Mínimo:") + div')
-        if value_elem:
-            value_text = value_elem.text.strip()
-            # Extrair apenas os números
-            value_match = re.search(r'R\$\s*([\d.,]+)', value_text)
-            if value_match:
-                value = value_match.group(1).replace('.', '').replace(',', '.')
-        
-        # Estratégia 2: Procurar por padrões de valor em toda a página
-        if not value:
-            # Buscar padrões como "R$ 5000" ou "5.000,00"
-            value_pattern = re.search(r'R\$\s*([\d.,]+)', response.text)
-            if value_pattern:
-                value = value_pattern.group(1).replace('.', '').replace(',', '.')
-                
-        # Se ainda não tiver valor, usar um valor padrão
-        if not value:
-            value = "5000"
-            
-        project_data['value'] = value
-        
-        # Não extraímos o prazo pois será preenchido manualmente pelo usuário
-        # Removida a lógica de extração de prazo conforme solicitação
-        
-        # Removemos a coleta de categorias e habilidades como pontos adicionais
-        # Vamos focar apenas nos dados principais: cliente e descrição
+        # Usa a sessão compartilhada e o cache de resultados por URL
+        project_data = fetcher.fetch(url, extract_project_data)
         
         return jsonify({
             'success': True,
             'projectData': project_data
         })
         
+    except FetchError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
     except Exception as e:
         print(f"Erro ao extrair dados do 99freelas: {str(e)}")
         return jsonify({
@@ -219,93 +198,224 @@ def extract_99freelas():
             'error': f'Erro ao extrair dados: {str(e)}'
         }), 500
 
-@app.route('/api/generate-proposal', methods=['POST'])
-def generate_proposal():
-    """Gera uma proposta usando a API da OpenAI"""
+def is_freelas_url(url):
+    """Verifica se a URL aponta para o 99freelas (ou para FREELAS_HOST)"""
+    return isinstance(url, str) and FREELAS_HOST in url
+
+def extraction_error_message(error):
+    """Mensagem de erro da extração, igual à da rota de URL única"""
+    from fetcher import FetchError
+
+    if isinstance(error, FetchError):
+        return str(error)
+    return f'Erro ao extrair dados: {str(error)}'
+
+@api.route('/api/extract-99freelas/batch', methods=['POST'])
+def extract_99freelas_batch():
+    """Extrai vários projetos do 99freelas em paralelo
+
+    Recebe {"urls": [...], "concurrency": 8} e responde em NDJSON: uma linha
+    por URL, na ordem em que cada uma termina, com `index`, `url` e
+    `projectData` ou `error`. A última linha traz o resumo do lote
+    (`done: true`).
+    """
+    from extractor import extract_project_data
+    from fetcher import BATCH_CONCURRENCY, FetchError, fetcher
+
     data = request.json
-    
+
+    urls = data.get('urls') if data else None
+    if not isinstance(urls, list) or not urls:
+        return jsonify({
+            'success': False,
+            'error': 'Lista de URLs não fornecida'
+        }), 400
+
+    if len(urls) > BATCH_MAX_URLS:
+        return jsonify({
+            'success': False,
+            'error': f'Máximo de {BATCH_MAX_URLS} URLs por lote'
+        }), 400
+
+    try:
+        concurrency = int(data.get('concurrency') or BATCH_CONCURRENCY)
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'error': 'Parâmetro concurrency inválido'
+        }), 400
+    concurrency = max(1, min(concurrency, BATCH_MAX_CONCURRENCY))
+
+    def line(payload):
+        return json.dumps(payload, ensure_ascii=False) + '\n'
+
+    def generate():
+        start = time.perf_counter()
+        succeeded = 0
+
+        # URLs inválidas falham na hora, sem impedir o restante do lote
+        valid = []
+        for index, url in enumerate(urls):
+            if is_freelas_url(url):
+                valid.append(index)
+            else:
+                yield line({
+                    'index': index,
+                    'url': url,
+                    'success': False,
+                    'error': 'A URL fornecida não é do 99freelas'
+                })
+
+        results = fetcher.fetch_many([urls[i] for i in valid], extract_project_data, concurrency)
+        for position, project_data, error in results:
+            index = valid[position]
+            if error is None:
+                succeeded += 1
+                yield line({
+                    'index': index,
+                    'url': urls[index],
+                    'success': True,
+                    'projectData': project_data
+                })
+            else:
+                if not isinstance(error, FetchError):
+                    print(f"Erro ao extrair dados do 99freelas: {str(error)}")
+                yield line({
+                    'index': index,
+                    'url': urls[index],
+                    'success': False,
+                    'error': extraction_error_message(error)
+                })
+
+        yield line({
+            'done': True,
+            'total': len(urls),
+            'succeeded': succeeded,
+            'failed': len(urls) - succeeded,
+            'elapsed': round(time.perf_counter() - start, 3)
+        })
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def prepare_generation(data):
+    """Valida a requisição de geração e resolve o projeto e a chave API
+
+    Retorna (project_id, api_key, None) ou (None, None, resposta_de_erro).
+    """
     # Validação básica
-    required_fields = ['clientName', 'projectDescription', 'value', 'deadline']
-    for field in required_fields:
-        if field not in data or not data[field]:
-            return jsonify({
-                'success': False,
-                'error': f'Campo obrigatório ausente: {field}'
-            }), 400
-            
-    # Verificar se um projeto foi selecionado
-    project_id = data.get('projectId')
-    project_description = ""
+    error = generation_error(data)
+    if error:
+        return None, None, (jsonify({
+            'success': False,
+            'error': error
+        }), 400)
     
-    # Só busca informações do projeto se projectId for um valor válido (não None, não vazio, não 0)
-    if project_id and str(project_id).strip():
-        try:
-            # Buscar informações do projeto selecionado
-            conn = sqlite3.connect(DB_PATH)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM projects WHERE id = ?', (project_id,))
-            project = cursor.fetchone()
-            conn.close()
-            
-            if project:
-                project_description = f"Projeto: {project['name']} - {project['description']}"
-            else:
-                # Se o projeto não for encontrado, define project_id como None
-                project_id = None
-        except Exception as e:
-            print(f"Erro ao buscar projeto: {str(e)}")
-            project_id = None
+    # Verificar se um projeto foi selecionado
+    project_id = resolve_project_id(data.get('projectId'))
     
-    # Sempre use uma chave API - priorize a do cliente, depois a do ambiente, ou use uma padrão
-    api_key = data.get('apiKey') or openai.api_key or os.environ.get('DEFAULT_OPENAI_API_KEY')
+    api_key = resolve_api_key(data)
     
     if not api_key:
-        return jsonify({
+        return None, None, (jsonify({
             'success': False,
             'error': 'Chave API OpenAI não configurada. Forneça uma chave API para gerar a proposta.'
-        }), 400
+        }), 400)
     
+    return project_id, api_key, None
+
+def missing_required_field(data):
+    """Retorna o primeiro campo obrigatório ausente da geração, ou None"""
+    for field in ('clientName', 'projectDescription', 'value', 'deadline'):
+        if not data or field not in data or not data[field]:
+            return field
+    return None
+
+def generation_error(data):
+    """Mensagem de erro de validação da geração, ou None se os dados forem válidos"""
+    missing = missing_required_field(data)
+    if missing:
+        return f'Campo obrigatório ausente: {missing}'
+    
+    # O prompt formata o valor como número (ver prompts.py)
     try:
-        # Se uma chave API customizada for fornecida na requisição, usamos temporariamente
-        original_key = openai.api_key
-        if data.get('apiKey'):
-            openai.api_key = data.get('apiKey')
-            
-        proposal_content = generate_with_openai(data)
-        
-        # Restaurar a chave original, se necessário
-        if data.get('apiKey'):
-            openai.api_key = original_key
-            
-        # Obter o último ID de proposta (a função save_proposal é chamada dentro de generate_with_openai)
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('SELECT MAX(id) FROM proposals')
-        last_id = cursor.fetchone()[0]
-        conn.close()
-        
-        proposal_data = {
-            'id': last_id,
-            'clientName': data['clientName'],
-            'projectDescription': data['projectDescription'],
-            'value': data['value'],
-            'deadline': data['deadline'],
-            'additionalPoints': data.get('additionalPoints', ''),
-            'customPrompt': data.get('customPrompt', ''),
-            'content': proposal_content,
-            'generatedWith': 'gpt',
-            'author': PROPOSAL_AUTHOR,
-            'createdAt': datetime.datetime.now().isoformat()
-        }
+        value = float(data['value'])
+    except (TypeError, ValueError):
+        value = None
+    if value is None or not math.isfinite(value):
+        return 'Campo inválido: value deve ser um número'
+    return None
+
+def resolve_project_id(project_id):
+    """Retorna o id do projeto se ele existir, senão None
+
+    A consulta vai ao cache de projetos (ver projects_cache.py), sem SQL.
+    """
+    # Só busca informações do projeto se projectId for um valor válido (não None, não vazio, não 0)
+    if not project_id or not str(project_id).strip():
+        return None
+    
+    try:
+        project = projects_cache.cache.get(project_id)
+    except Exception as e:
+        print(f"Erro ao buscar projeto: {str(e)}")
+        return None
+    
+    # Se o projeto não for encontrado, define project_id como None
+    return project['id'] if project else None
+
+def resolve_api_key(data):
+    """Sempre use uma chave API - priorize a do cliente, depois a do ambiente, ou use uma padrão"""
+    return (data or {}).get('apiKey') or OPENAI_API_KEY or os.environ.get('DEFAULT_OPENAI_API_KEY')
+
+def build_proposal_data(data, content, proposal_id, project_id, prompt=None):
+    """Monta o objeto `proposal` devolvido pelas rotas de geração"""
+    proposal_data = {
+        'id': proposal_id,
+        'clientName': data['clientName'],
+        'projectDescription': data['projectDescription'],
+        'value': data['value'],
+        'deadline': data['deadline'],
+        'additionalPoints': data.get('additionalPoints', ''),
+        'customPrompt': data.get('customPrompt', ''),
+        'content': content,
+        'generatedWith': 'gpt',
+        'author': PROPOSAL_AUTHOR,
+        'createdAt': datetime.datetime.now().isoformat()
+    }
+    
+    # Só adiciona project_id se ele existir e for válido
+    if project_id and str(project_id).strip():
+        proposal_data['projectId'] = project_id
+    
+    # Tamanho do prompt enviado e campos truncados para caber no orçamento
+    if prompt is not None:
+        proposal_data['promptTokens'] = prompt.tokens
+        proposal_data['promptTokenBudget'] = prompt.budget
+        proposal_data['truncatedFields'] = prompt.truncated
+    
+    return proposal_data
+
+@api.route('/api/generate-proposal', methods=['POST'])
+def generate_proposal():
+    """Gera uma proposta usando a API da OpenAI"""
+    data = request.json
+    
+    project_id, api_key, error_response = prepare_generation(data)
+    if error_response:
+        return error_response
+    
+    try:
+        # Cada requisição usa um cliente com a sua própria chave
+        client = openai_client(api_key, '/api/generate-proposal')
+        proposal_content, proposal_id, prompt = generate_with_openai(data, client)
         
-        # Só adiciona project_id se ele existir e for válido
-        if project_id and str(project_id).strip():
-            proposal_data['projectId'] = project_id
-            
         response = {
             'success': True,
-            'proposal': proposal_data
+            'proposal': build_proposal_data(data, proposal_content, proposal_id, project_id, prompt)
         }
         
         return jsonify(response)
@@ -317,296 +427,591 @@ def generate_proposal():
             'error': f'Erro ao gerar a proposta: {str(e)}. Verifique sua chave API e tente novamente.'
         }), 500
 
-def generate_with_openai(data):
-    """Gera proposta usando a API da OpenAI"""
-    
-    client_name = data['clientName']
-    project_description = data['projectDescription']
-    value = data['value']
-    deadline = data['deadline']
-    additional_points = data.get('additionalPoints', '')
-    custom_prompt = data.get('customPrompt', '')
-    
-    # Formata os pontos adicionais, se existirem
-    additional_points_formatted = ""
-    if additional_points:
-        points_list = additional_points.split(',')
-        additional_points_formatted = "\n✅ DIFERENCIAIS INCLUSOS:\n"
-        additional_points_formatted += "\n".join([f"• {point.strip()}" for point in points_list])
-        additional_points_formatted += "\n"
-    
-    # Instruções de formatação simplificadas
-    format_instructions = """
-VOCÊ DEVE USAR ESTAS TAGS FREQUENTEMENTE NO TEXTO PARA DESTACAR INFORMAÇÕES:
-
-{b} {/b}: negrito - USE MUITO para destacar pontos principais, valores, prazos e termos importantes
-{i} {/i}: itálico - USE MUITO para enfatizar conceitos, metodologias e explicações importantes
-{u} {/u}: sublinhado - USE MUITO para elementos cruciais que exigem atenção especial do cliente
-
-EXEMPLOS DE USO CORRETO:
-- "Nosso prazo para entrega será de {b}30 dias úteis{/b}"
-- "Utilizaremos a metodologia {i}Design Thinking{/i} para desenvolver sua solução"
-- "É {u}imprescindível{/u} que os materiais sejam fornecidos até a data acordada"
-
-IMPORTANTE: 
-- Use as tags de formatação em CADA PARÁGRAFO pelo menos uma vez
-- Utilize espaçamento generoso entre parágrafos (linhas em branco)
-- Separe cada tópico principal com pelo menos duas linhas em branco
-- Use listas com marcadores para melhorar a legibilidade
-"""
+@api.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Contadores do cache da OpenAI, do cache das rotas de leitura e do de projetos"""
+    return jsonify({
+        'success': True,
+        'cache': llm_cache.cache.stats(),
+        'responses': response_cache.cache.stats(),
+        'projects': projects_cache.cache.stats()
+    })
+
+@api.route('/api/stats', methods=['GET'])
+@response_cache.cached('proposals', 'projects')
+def get_stats():
+    """Totais de propostas por modelo, mês, projeto e autor
+
+    Lidos da tabela de agregados mantida pelos triggers, sem varrer as propostas.
+    """
+    with get_connection() as conn:
+        result = stats.read(conn)
+    
+    for entry in result['byProject']:
+        project = projects_cache.cache.get(
+            entry['projectId'], min_version=response_cache.etag_version('projects')
+        ) if entry['projectId'] is not None else None
+        entry['projectName'] = project['name'] if project else None
     
-    # Sistema de instruções otimizado e conciso
-    system_prompt = """Redator de propostas comerciais: Crie propostas persuasivas e formais para a plataforma 99freelas.
+    return jsonify({
+        'success': True,
+        'stats': result
+    })
 
-IMPORTANTE: A proposta é de um FREELANCER INDIVIDUAL (não uma equipe/empresa). Use sempre primeira pessoa do singular ("eu farei", "entregarei", "minha experiência", etc.) e não "nós" ou "nossa equipe".
+@api.route('/api/cache', methods=['DELETE'])
+def clear_cache():
+    """Esvazia o cache de respostas da OpenAI"""
+    llm_cache.cache.clear()
+    return jsonify({
+        'success': True,
+        'message': 'Cache de respostas esvaziado'
+    })
 
-Estruture o conteúdo de forma lógica com espaçamento entre parágrafos, mas SEM USAR CABEÇALHOS EXPLÍCITOS como "Apresentação", "Escopo", etc.
+def process_job_item(spec, api_key):
+    """Gera e salva a proposta de um item de job (mesmo caminho de /api/generate-proposal)"""
+    client = openai_client(api_key, '/api/jobs')
+    # O projeto pode ter sido removido enquanto o item esperava na fila
+    spec = dict(spec, projectId=resolve_project_id(spec.get('projectId')))
+    content, prompt = generate_content(spec, client)
+    proposal_id = save_generated_proposal(spec, content, prompt.model)
+    return build_proposal_data(spec, content, proposal_id, spec.get('projectId'), prompt)
 
-A proposta deve fluir naturalmente incluindo:
-- Um cumprimento inicial ao cliente que DEVE seguir este formato específico:
-  * Identifique o gênero do cliente com base no nome fornecido (analise o primeiro nome)
-  * Use "Prezado" para nomes masculinos ou "Prezada" para nomes femininos
-  * SEMPRE inclua ", tudo bem?" logo após o nome
-  * Exemplo: "Prezado João, tudo bem?" ou "Prezada Maria, tudo bem?"
-- Demonstração de entendimento sobre o projeto
-- Descrição do que será entregue
-- Menção ao valor e prazo
-- Uma conclusão com proposta de próximos passos
+# Workers da geração em lote; iniciados por startup() e retomam os jobs pendentes
+job_queue = jobs.JobQueue(process_job_item)
 
-Formatação:
-- UTILIZE FREQUENTEMENTE AS TAGS DE FORMATAÇÃO {b}{/b}, {i}{/i} e {u}{/u} no texto
-- Use {b}{/b} para destacar pontos principais, valores, prazos e termos importantes
-- Use {i}{/i} para conceitos, metodologias e explicações
-- Use {u}{/u} para elementos cruciais que exigem atenção especial
-- Utilize bastante espaço em branco entre parágrafos (linhas em branco)
-- NÃO use títulos de seção como "APRESENTAÇÃO", "ESCOPO", etc.
-- Use parágrafos curtos e concisos
+@api.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Cria um job de geração em lote
 
-Use linguagem formal, destaque benefícios e personalize para o cliente.
-Assine como autor fornecido no final do texto, indicando que é um freelancer profissional.
+    Recebe {"proposals": [...], "apiKey": "..."}, onde cada item tem os mesmos
+    campos de /api/generate-proposal. Responde 202 com o id do job; o
+    andamento e as propostas geradas ficam em GET /api/jobs/<id>.
+    """
+    data = request.json
+    
+    specs = data.get('proposals') if data else None
+    if not isinstance(specs, list) or not specs:
+        return jsonify({
+            'success': False,
+            'error': 'Lista de propostas não fornecida'
+        }), 400
+    
+    if len(specs) > jobs.JOB_MAX_ITEMS:
+        return jsonify({
+            'success': False,
+            'error': f'Máximo de {jobs.JOB_MAX_ITEMS} propostas por job'
+        }), 400
+    
+    for position, spec in enumerate(specs):
+        error = generation_error(spec) if isinstance(spec, dict) else 'Campo obrigatório ausente: clientName'
+        if error:
+            return jsonify({
+                'success': False,
+                'error': f'Item {position}: {error}'
+            }), 400
+    
+    if not resolve_api_key(data):
+        return jsonify({
+            'success': False,
+            'error': 'Chave API OpenAI não configurada. Forneça uma chave API para gerar a proposta.'
+        }), 400
+    
+    # A chave não é gravada junto com os itens
+    items = []
+    for spec in specs:
+        item = {key: value for key, value in spec.items() if key != 'apiKey'}
+        item['projectId'] = resolve_project_id(item.get('projectId'))
+        items.append(item)
+    
+    job_id = job_queue.submit(items, api_key=data.get('apiKey'))
+    
+    return jsonify({
+        'success': True,
+        'job': job_queue.status(job_id, include_results=False)
+    }), 202
 
-""" + format_instructions
+@api.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Andamento de um job e as propostas já geradas (`results=0` omite as propostas)"""
+    include_results = request.args.get('results', '1') != '0'
+    job = job_queue.status(job_id, include_results=include_results)
     
-    # Constrói o prompt conciso para a API
-    # Use variáveis separadas para evitar problemas de formatação com f-strings
-    tag_bold_open = "{b}"
-    tag_bold_close = "{/b}"
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job não encontrado'
+        }), 404
     
-    prompt = f"""Proposta comercial para:
+    return jsonify({
+        'success': True,
+        'job': job
+    })
 
-{tag_bold_open}CLIENTE:{tag_bold_close} {client_name}
+@api.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Métricas das chamadas à OpenAI no formato texto do Prometheus"""
+    cache = llm_cache.cache.stats()
+    body = telemetry.telemetry.render_prometheus(extra=[
+        ('pitchbot_llm_cache_hit_ratio', 'Fração das gerações servidas pelo cache', cache['hit_rate']),
+        ('pitchbot_llm_cache_saved_seconds', 'Segundos de geração economizados pelo cache', cache['saved_seconds']),
+        ('pitchbot_response_cache_hit_ratio', 'Fração das leituras servidas pelo cache de respostas',
+         response_cache.cache.stats()['hit_rate'])
+    ])
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8')
 
-{tag_bold_open}PROJETO:{tag_bold_close} {project_description}
+def sse_event(event, payload):
+    """Formata um evento Server-Sent Events com payload JSON"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
 
-{tag_bold_open}VALOR:{tag_bold_close} R$ {float(value):.2f}
+@api.route('/api/generate-proposal/stream', methods=['POST'])
+def generate_proposal_stream():
+    """Gera uma proposta enviando os tokens por Server-Sent Events
 
-{tag_bold_open}PRAZO:{tag_bold_close} {deadline}"""
+    Eventos: `token` ({content}) a cada trecho recebido da OpenAI, `done`
+    ({success, proposal}) depois de salvar a proposta e `error` em caso de
+    falha. Se o cliente desconectar, a requisição à OpenAI é cancelada e nada
+    é salvo.
+    """
+    data = request.json
     
-    # Adiciona pontos adicionais e instruções se fornecidos
-    if additional_points:
-        prompt += f"\n\n{tag_bold_open}PONTOS ADICIONAIS:{tag_bold_close} {additional_points}"
+    project_id, api_key, error_response = prepare_generation(data)
+    if error_response:
+        return error_response
     
-    # Adiciona informações do projeto selecionado, se houver e não for None/vazio
-    if project_description and project_description.strip():
-        prompt += f"\n\n{tag_bold_open}PROJETO SELECIONADO:{tag_bold_close} {project_description}"
+    generation = build_prompts(data)
+    system_prompt, prompt, model = generation.system_prompt, generation.prompt, generation.model
+    cache_key = llm_cache.make_key(model, GENERATION_TEMPERATURE, system_prompt, prompt)
     
-    if custom_prompt:
-        prompt += f"\n\n{tag_bold_open}INSTRUÇÕES:{tag_bold_close} {custom_prompt}"
+    def generate():
+        # Envia algo imediatamente para que o cliente receba os cabeçalhos
+        yield ': stream iniciado\n\n'
+        
+        content = llm_cache.cache.get(cache_key, bypass=bool(data.get('noCache')))
+        if content is not None:
+            # Resposta em cache: o texto completo vai em um único evento
+            yield sse_event('token', {'content': content})
+        else:
+            start = time.perf_counter()
+            parts = []
+            client = openai_client(api_key, '/api/generate-proposal/stream')
+            stream = client.stream_chat(
+                model,
+                [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=GENERATION_MAX_TOKENS,
+                temperature=GENERATION_TEMPERATURE
+            )
+            try:
+                for piece in stream:
+                    parts.append(piece)
+                    yield sse_event('token', {'content': piece})
+            except Exception as e:
+                print(f"Erro no streaming da OpenAI: {str(e)}")
+                yield sse_event('error', {
+                    'success': False,
+                    'error': f'Erro ao gerar a proposta: {str(e)}. Verifique sua chave API e tente novamente.'
+                })
+                return
+            finally:
+                # Também executado quando o cliente desconecta (GeneratorExit)
+                stream.close()
+            
+            content = ''.join(parts)
+            llm_cache.cache.put(cache_key, model, content, time.perf_counter() - start)
+        
+        try:
+            proposal_id = save_generated_proposal(data, content, model)
+        except Exception as e:
+            print(f"Erro ao salvar proposta: {str(e)}")
+            yield sse_event('error', {
+                'success': False,
+                'error': f'Erro ao salvar a proposta: {str(e)}'
+            })
+            return
+        
+        yield sse_event('done', {
+            'success': True,
+            'proposal': build_proposal_data(data, content, proposal_id, project_id, generation)
+        })
     
-    # Adiciona o restante do prompt
-    prompt += f"""
-
-Escreva uma proposta comercial para a plataforma 99freelas com os elementos abaixo. O texto deve fluir naturalmente entre os tópicos, sem usar cabeçalhos de seção:
-
-- Esta proposta é como FREELANCER INDIVIDUAL, não como equipe ou empresa
-- Use sempre primeira pessoa do singular ("eu farei", "entregarei", "desenvolverei")
-- NUNCA use "nós", "nosso time", "nossa equipe" ou qualquer referência a uma equipe
-- OBRIGATORIAMENTE comece com o cumprimento "Prezado(a) {client_name}, tudo bem?" usando o pronome correto (Prezado/Prezada) baseado no gênero do cliente que você deve identificar pelo nome
-- Adicione uma breve frase cordial antes de entrar no assunto
-- Demonstre que entendeu o projeto e as necessidades
-- Descreva o que será entregue e como será feito por você (individualmente)
-- Explique prazos e cronograma do seu trabalho individual
-- Mencione o investimento e condições de pagamento
-- Finalize com próximos passos e um convite para contato
-
-MUITO IMPORTANTE: 
-- USE FREQUENTEMENTE as tags de formatação em seu texto
-- Use {tag_bold_open}negrito{tag_bold_close} para destacar valores, prazos e pontos principais
-- Use {{i}}itálico{{/i}} para metodologias e conceitos importantes 
-- Use {{u}}sublinhado{{/u}} para elementos cruciais que exigem atenção especial
-- Use pelo menos 3-4 formatações diferentes em cada parágrafo
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Evita buffer em proxies como o nginx
+        }
+    )
 
-Use bastante espaço em branco entre parágrafos para facilitar a leitura.
+def build_prompts(data):
+    """Monta as mensagens da geração dentro do orçamento de tokens (ver prompts.py)
 
+    Retorna um prompts.Prompt com system_prompt, prompt, model e a contagem
+    de tokens de entrada.
+    """
+    return prompt_builder.build(data)
 
-Atenciosamente,
-{tag_bold_open}{PROPOSAL_AUTHOR}{tag_bold_close}
-"""
+def generate_with_openai(data, client):
+    """Gera proposta usando a API da OpenAI com o cliente informado
 
-    # Usar um modelo mais capaz se disponível
-    model = "gpt-4" if data.get('useGPT4', False) else "gpt-3.5-turbo"
-    model_name = model  # Salvar nome do modelo para o banco de dados
+    Retorna (conteúdo, id da proposta salva, prompt usado).
+    """
+    content, prompt = generate_content(data, client)
     
-    # Usando o método compatível com versões anteriores
-    try:
-        from openai import Completion, ChatCompletion
-        
-        response = openai.ChatCompletion.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=2500,  # Aumentado para permitir propostas com melhor formatação e espaçamento
-            temperature=0.7
-        )
-        content = response.choices[0].message.content
-    except (ImportError, AttributeError):
-        # Fallback para API mais antiga se necessário
-        response = openai.chat.completions.create(
-            model=model,
+    # Salva a proposta no banco de dados
+    proposal_id = save_generated_proposal(data, content, prompt.model)
+    
+    return content, proposal_id, prompt
+
+def generate_content(data, client):
+    """Gera o texto da proposta (com cache) e retorna (conteúdo, prompt usado)"""
+    prompt = build_prompts(data)
+    
+    # Prompts idênticos reaproveitam a resposta anterior, a menos que `noCache` seja enviado
+    content, _ = llm_cache.cache.get_or_generate(
+        llm_cache.make_key(prompt.model, GENERATION_TEMPERATURE, prompt.system_prompt, prompt.prompt),
+        prompt.model,
+        lambda: client.chat(
+            model=prompt.model,
             messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
+                {"role": "system", "content": prompt.system_prompt},
+                {"role": "user", "content": prompt.prompt}
             ],
-            max_tokens=2500,  # Aumentado para permitir propostas com melhor formatação e espaçamento
-            temperature=0.7
-        )
-        content = response.choices[0].message.content
+            max_tokens=GENERATION_MAX_TOKENS,
+            temperature=GENERATION_TEMPERATURE
+        ),
+        bypass=bool(data.get('noCache'))
+    )
     
-    # Salva a proposta no banco de dados
-    save_proposal(
-        client_name=client_name,
-        project_description=project_description,
-        value=float(value),
-        deadline=deadline,
-        additional_points=additional_points,
-        custom_prompt=custom_prompt,
+    return content, prompt
+
+def save_generated_proposal(data, content, model):
+    """Salva uma proposta gerada a partir dos dados da requisição"""
+    return save_proposal(
+        client_name=data['clientName'],
+        project_description=data['projectDescription'],
+        value=float(data['value']),
+        deadline=data['deadline'],
+        additional_points=data.get('additionalPoints', ''),
+        custom_prompt=data.get('customPrompt', ''),
         content=content,
         author=PROPOSAL_AUTHOR,
-        model=model_name,
+        model=model,
         project_id=data.get('projectId')
     )
-    
-    return content
 
 def save_proposal(client_name, project_description, value, deadline, 
                 additional_points, custom_prompt, content, author, model, project_id=None):
-    """Salva uma proposta no banco de dados SQLite"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
+    """Salva uma proposta no banco de dados SQLite e retorna o id da nova linha
+
+    A inserção vai para o writer de group commit, que a grava junto com as
+    de outras requisições simultâneas em uma única transação. A descrição e
+    o conteúdo são gravados comprimidos (ver compression.py).
+    """
     created_at = datetime.datetime.now().isoformat()
+    codec = compression.codec_for(db.DB_PATH)
+    project_description = codec.compress(project_description)
+    content = codec.compress(content)
+    
+    return db.get_writer().execute('''
+    INSERT INTO proposals (
+        client_name, project_description, value, deadline, 
+        additional_points, custom_prompt, content, created_at, author, model, project_id
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        client_name, project_description, value, deadline,
+        additional_points, custom_prompt, content, created_at, author, model, project_id
+    ))
+
+def parse_fields(raw_fields, columns, computed=None):
+    """Valida o parâmetro `fields` (lista separada por vírgulas)
+
+    Retorna None quando o parâmetro está ausente, o que significa todas as
+    colunas. `id` e `created_at` são sempre incluídos porque formam o cursor.
+    """
+    if not raw_fields:
+        return None
+    
+    computed = computed or {}
+    fields = [field.strip() for field in raw_fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in columns and field not in computed]
+    if unknown:
+        raise ValueError(f"Campos desconhecidos: {', '.join(unknown)}")
+    
+    for key in ('created_at', 'id'):
+        if key not in fields:
+            fields.insert(0, key)
+    return fields
+
+def parse_page_args(args):
+    """Lê `limit` e `cursor` da query string
+
+    Sem nenhum dos dois a listagem não é paginada (comportamento original).
+    Retorna (limit, (created_at, id)) ou (None, None).
+    """
+    raw_limit = args.get('limit')
+    raw_cursor = args.get('cursor')
+    if not raw_limit and not raw_cursor:
+        return None, None
+    
+    try:
+        limit = int(raw_limit) if raw_limit else DEFAULT_PAGE_SIZE
+    except ValueError:
+        raise ValueError('O parâmetro limit deve ser um número inteiro')
+    if limit < 1:
+        raise ValueError('O parâmetro limit deve ser maior que zero')
+    
+    return min(limit, MAX_PAGE_SIZE), decode_cursor(raw_cursor) if raw_cursor else None
+
+def encode_cursor(row):
+    """Gera o cursor opaco que aponta para depois de `row`"""
+    payload = json.dumps([row['created_at'], row['id']]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """Converte o cursor recebido de volta em (created_at, id)"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(created_at, str) or not isinstance(row_id, int):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise ValueError('Cursor inválido')
+    return created_at, row_id
+
+def paginate(rows, limit):
+    """Recorta a página e calcula o próximo cursor
+
+    As consultas buscam `limit + 1` linhas; a linha extra só indica que
+    existe uma próxima página.
+    """
+    if limit is None:
+        return rows, None
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1])
+
+def _select_list(fields, computed=None, prefix=''):
+    """Monta a lista de colunas do SELECT a partir dos campos validados"""
+    if fields is None:
+        return f'{prefix}*'
+    
+    computed = computed or {}
+    parts = []
+    for field in fields:
+        if field in computed:
+            parts.append(computed[field].format(p=prefix))
+        else:
+            parts.append(f'{prefix}{field}')
+    return ', '.join(parts)
+
+def get_proposals(fields=None, limit=None, after=None):
+    """Recupera as propostas do banco de dados, da mais recente para a mais antiga
+
+    `fields` restringe as colunas retornadas, `limit` limita a quantidade e
+    `after` (created_at, id) continua a listagem a partir de um cursor.
+    """
+    where = ''
+    params = []
+    if after is not None:
+        where = 'WHERE (created_at, id) < (?, ?)'
+        params.extend(after)
+    
+    query = f'''
+    SELECT {_select_list(fields or PROPOSAL_COLUMNS, PROPOSAL_COMPUTED_FIELDS)}
+    FROM proposals
+    {where}
+    ORDER BY created_at DESC, id DESC
+    '''
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        
+        proposals = []
+        for row in rows:
+            proposal = compression.decode_row(dict(row))
+            proposals.append(proposal)
     
-    # Verifica se project_id existe e se a coluna project_id existe na tabela
-    if project_id is not None:
-        try:
-            cursor.execute('''
-            INSERT INTO proposals (
-                client_name, project_description, value, deadline, 
-                additional_points, custom_prompt, content, created_at, author, model, project_id
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                client_name, project_description, value, deadline,
-                additional_points, custom_prompt, content, created_at, author, model, project_id
-            ))
-        except sqlite3.OperationalError as e:
-            # Se a coluna project_id não existir, insere sem ela
-            if "no column named project_id" in str(e):
-                cursor.execute('''
-                INSERT INTO proposals (
-                    client_name, project_description, value, deadline, 
-                    additional_points, custom_prompt, content, created_at, author, model
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    client_name, project_description, value, deadline,
-                    additional_points, custom_prompt, content, created_at, author, model
-                ))
-            else:
-                # Se for outro erro, relança a exceção
-                raise
-    else:
-        # Se não tem project_id, insere sem ele
-        cursor.execute('''
-        INSERT INTO proposals (
-            client_name, project_description, value, deadline, 
-            additional_points, custom_prompt, content, created_at, author, model
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            client_name, project_description, value, deadline,
-            additional_points, custom_prompt, content, created_at, author, model
-        ))
-    
-    proposal_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    
-    return proposal_id
-
-def get_proposals():
-    """Recupera todas as propostas do banco de dados"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM proposals ORDER BY created_at DESC')
-    rows = cursor.fetchall()
-    
-    proposals = []
-    for row in rows:
-        proposal = dict(row)
-        proposals.append(proposal)
-    
-    conn.close()
     return proposals
 
 def get_proposal_by_id(proposal_id):
     """Recupera uma proposta específica pelo ID"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM proposals WHERE id = ?', (proposal_id,))
-    row = cursor.fetchone()
-    
-    proposal = dict(row) if row else None
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute(f"SELECT {', '.join(PROPOSAL_COLUMNS)} FROM proposals WHERE id = ?", (proposal_id,))
+        row = cursor.fetchone()
+        
+        proposal = compression.decode_row(dict(row)) if row else None
     
-    conn.close()
     return proposal
 
-@app.route('/api/proposals', methods=['GET'])
+def build_fts_query(search_term):
+    """Converte o termo digitado em uma consulta FTS5 de prefixos
+
+    Cada palavra vira um prefixo entre aspas ("orc"*), de forma que a busca
+    funciona enquanto o usuário digita e caracteres especiais não quebram a
+    sintaxe do FTS5. Retorna None se o termo não tiver nenhuma palavra.
+    """
+    tokens = SEARCH_TOKEN_RE.findall(search_term)
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+def search_proposals(search_term, rank=False, highlight=False, fields=None, limit=None, after=None):
+    """Busca propostas por cliente, descrição ou conteúdo
+
+    Sem opções, mantém o formato e a ordem (created_at DESC) da listagem.
+    Com `rank`, ordena por relevância BM25 e inclui o campo `score`; com
+    `highlight`, inclui um trecho (`snippet`) com os termos marcados em {b}{/b}.
+    `fields`, `limit` e `after` funcionam como em get_proposals (o cursor
+    só se aplica à ordem por data).
+    """
+    fts_query = build_fts_query(search_term) if FTS_ENABLED else None
+    
+    params = []
+    if fts_query is None:
+        # Fallback: varredura com LIKE (SQLite sem FTS5 ou termo sem palavras)
+        columns = [_select_list(fields or PROPOSAL_COLUMNS, PROPOSAL_COMPUTED_FIELDS, 'p.')]
+        source = 'proposals p'
+        conditions = [
+            '(p.client_name LIKE ? OR unpack_text(p.project_description) LIKE ? OR unpack_text(p.content) LIKE ?)'
+        ]
+        params.extend([f'%{search_term}%'] * 3)
+        rank = False
+    else:
+        columns = [_select_list(fields or PROPOSAL_COLUMNS, PROPOSAL_COMPUTED_FIELDS, 'p.')]
+        if rank:
+            columns.append('bm25(proposals_fts, ?, ?, ?) AS score')
+            params.extend(FTS_WEIGHTS)
+        if highlight:
+            columns.append("snippet(proposals_fts, -1, '{b}', '{/b}', '…', 24) AS snippet")
+        source = 'proposals_fts JOIN proposals p ON p.id = proposals_fts.rowid'
+        conditions = ['proposals_fts MATCH ?']
+        params.append(fts_query)
+    
+    if after is not None and not rank:
+        conditions.append('(p.created_at, p.id) < (?, ?)')
+        params.extend(after)
+    
+    query = f'''
+    SELECT {', '.join(columns)}
+    FROM {source}
+    WHERE {' AND '.join(conditions)}
+    ORDER BY {'score' if rank else 'p.created_at DESC, p.id DESC'}
+    '''
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return [compression.decode_row(dict(row)) for row in cursor.fetchall()]
+
+@api.route('/api/proposals', methods=['GET'])
+@response_cache.cached('proposals')
 def list_proposals():
-    """Lista todas as propostas salvas, com opção de filtro por cliente"""
+    """Lista todas as propostas salvas, com opção de filtro por cliente
+
+    Aceita `fields`, `limit` e `cursor` para listagens paginadas e enxutas.
+    """
     search_term = request.args.get('search', '')
+    rank = request.args.get('rank') == 'bm25'
+    
+    try:
+        fields = parse_fields(request.args.get('fields'), PROPOSAL_COLUMNS, PROPOSAL_COMPUTED_FIELDS)
+        limit, after = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    # Busca uma linha a mais para saber se existe próxima página
+    fetch_limit = limit + 1 if limit is not None else None
     
     if search_term:
-        # Se houver termo de busca, filtramos os resultados
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Busca por cliente, descrição ou conteúdo
-        cursor.execute('''
-        SELECT * FROM proposals 
-        WHERE client_name LIKE ? 
-           OR project_description LIKE ? 
-           OR content LIKE ?
-        ORDER BY created_at DESC
-        ''', (f'%{search_term}%', f'%{search_term}%', f'%{search_term}%'))
-        
-        rows = cursor.fetchall()
-        proposals = [dict(row) for row in rows]
-        conn.close()
+        # Se houver termo de busca, filtramos os resultados pelo índice FTS5
+        proposals = search_proposals(
+            search_term,
+            rank=rank,
+            highlight=request.args.get('highlight', '').lower() in ('1', 'true'),
+            fields=fields,
+            limit=fetch_limit,
+            after=after
+        )
     else:
         # Sem termo de busca, retorna todas as propostas
-        proposals = get_proposals()
+        proposals = get_proposals(fields=fields, limit=fetch_limit, after=after)
     
-    return jsonify({
+    proposals, next_cursor = paginate(proposals, limit)
+    
+    response = {
         'success': True,
         'proposals': proposals
-    })
+    }
+    if limit is not None and not (search_term and rank):
+        response['nextCursor'] = next_cursor
+    
+    return jsonify(response)
+
+EXPORT_CONTENT_TYPES = {
+    'none': ('application/x-ndjson; charset=utf-8', '.ndjson'),
+    'gzip': ('application/gzip', '.ndjson.gz'),
+    'zstd': ('application/zstd', '.ndjson.zst')
+}
+
+@api.route('/api/proposals/export', methods=['GET'])
+def export_proposals():
+    """Baixa as propostas em NDJSON, em streaming e opcionalmente comprimidas
 
-@app.route('/api/proposals/<int:proposal_id>', methods=['GET'])
+    Aceita `since`, `until`, `model` e `compress` (none, gzip ou zstd).
+    """
+    codec_name = request.args.get('compress', 'none')
+    filters = {
+        'since': request.args.get('since'),
+        'until': request.args.get('until'),
+        'model': request.args.get('model')
+    }
+    
+    try:
+        # Valida os filtros antes de começar a resposta
+        db_utils.build_export_query(**filters)
+        db_utils.make_compressor(codec_name)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    def generate():
+        # Conexão própria (fora do pool): um download lento não ocupa vaga das rotas
+        conn = db.open_connection()
+        try:
+            yield from db_utils.iter_ndjson(conn, codec_name, **filters)
+        finally:
+            conn.close()
+    
+    content_type, extension = EXPORT_CONTENT_TYPES[codec_name]
+    filename = f"propostas-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}{extension}"
+    return Response(
+        stream_with_context(generate()),
+        content_type=content_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@api.route('/api/proposals/<int:proposal_id>', methods=['GET'])
+@response_cache.cached('proposals')
 def get_proposal(proposal_id):
     """Recupera uma proposta específica pelo ID"""
     proposal = get_proposal_by_id(proposal_id)
@@ -622,23 +1027,21 @@ def get_proposal(proposal_id):
             'error': 'Proposta não encontrada'
         }), 404
 
-@app.route('/api/proposals/<int:proposal_id>', methods=['DELETE'])
+@api.route('/api/proposals/<int:proposal_id>', methods=['DELETE'])
 def delete_proposal(proposal_id):
     """Deleta uma proposta específica pelo ID"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT id FROM proposals WHERE id = ?', (proposal_id,))
-    if not cursor.fetchone():
-        conn.close()
-        return jsonify({
-            'success': False,
-            'error': 'Proposta não encontrada'
-        }), 404
-    
-    cursor.execute('DELETE FROM proposals WHERE id = ?', (proposal_id,))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT id FROM proposals WHERE id = ?', (proposal_id,))
+        if not cursor.fetchone():
+            return jsonify({
+                'success': False,
+                'error': 'Proposta não encontrada'
+            }), 404
+        
+        cursor.execute('DELETE FROM proposals WHERE id = ?', (proposal_id,))
+        conn.commit()
     
     return jsonify({
         'success': True,
@@ -646,25 +1049,44 @@ def delete_proposal(proposal_id):
     })
 
 # Rotas para projetos
-@app.route('/api/projects', methods=['GET'])
+@api.route('/api/projects', methods=['GET'])
+@response_cache.cached('projects')
 def list_projects():
-    """Lista todos os projetos salvos"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+    """Lista todos os projetos salvos
+
+    Aceita `fields`, `limit` e `cursor` como a listagem de propostas. Os
+    projetos vêm do cache em memória (ver projects_cache.py).
+    """
+    try:
+        fields = parse_fields(request.args.get('fields'), PROJECT_COLUMNS)
+        limit, after = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     
-    cursor.execute('SELECT * FROM projects ORDER BY created_at DESC')
-    rows = cursor.fetchall()
+    # Já na ordem da listagem (created_at DESC, id DESC)
+    projects = projects_cache.cache.list(min_version=response_cache.etag_version('projects'))
+    if after is not None:
+        projects = [project for project in projects if (project['created_at'], project['id']) < after]
+    if limit is not None:
+        projects = projects[:limit + 1]
+    if fields is not None:
+        projects = [{field: project[field] for field in fields} for project in projects]
     
-    projects = [dict(row) for row in rows]
-    conn.close()
+    projects, next_cursor = paginate(projects, limit)
     
-    return jsonify({
+    response = {
         'success': True,
         'projects': projects
-    })
+    }
+    if limit is not None:
+        response['nextCursor'] = next_cursor
+    
+    return jsonify(response)
 
-@app.route('/api/projects', methods=['POST'])
+@api.route('/api/projects', methods=['POST'])
 def create_project():
     """Cria um novo projeto"""
     data = request.json
@@ -676,19 +1098,19 @@ def create_project():
             'error': 'Nome e descrição do projeto são obrigatórios'
         }), 400
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    created_at = datetime.datetime.now().isoformat()
-    
-    cursor.execute('''
-    INSERT INTO projects (name, description, created_at)
-    VALUES (?, ?, ?)
-    ''', (data['name'], data['description'], created_at))
-    
-    project_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        
+        created_at = datetime.datetime.now().isoformat()
+        
+        cursor.execute('''
+        INSERT INTO projects (name, description, created_at)
+        VALUES (?, ?, ?)
+        ''', (data['name'], data['description'], created_at))
+        
+        project_id = cursor.lastrowid
+        conn.commit()
+    projects_cache.cache.invalidate()
     
     return jsonify({
         'success': True,
@@ -700,32 +1122,24 @@ def create_project():
         }
     })
 
-@app.route('/api/projects/<int:project_id>', methods=['GET'])
+@api.route('/api/projects/<int:project_id>', methods=['GET'])
+@response_cache.cached('projects')
 def get_project(project_id):
     """Recupera um projeto específico pelo ID"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM projects WHERE id = ?', (project_id,))
-    row = cursor.fetchone()
+    project = projects_cache.cache.get(project_id, min_version=response_cache.etag_version('projects'))
     
-    if not row:
-        conn.close()
+    if not project:
         return jsonify({
             'success': False,
             'error': 'Projeto não encontrado'
         }), 404
     
-    project = dict(row)
-    conn.close()
-    
     return jsonify({
         'success': True,
         'project': project
     })
 
-@app.route('/api/projects/<int:project_id>', methods=['PUT'])
+@api.route('/api/projects/<int:project_id>', methods=['PUT'])
 def update_project(project_id):
     """Atualiza um projeto existente"""
     data = request.json
@@ -737,25 +1151,24 @@ def update_project(project_id):
             'error': 'Nome e descrição do projeto são obrigatórios'
         }), 400
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT id FROM projects WHERE id = ?', (project_id,))
-    if not cursor.fetchone():
-        conn.close()
-        return jsonify({
-            'success': False,
-            'error': 'Projeto não encontrado'
-        }), 404
-    
-    cursor.execute('''
-    UPDATE projects 
-    SET name = ?, description = ?
-    WHERE id = ?
-    ''', (data['name'], data['description'], project_id))
-    
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT id FROM projects WHERE id = ?', (project_id,))
+        if not cursor.fetchone():
+            return jsonify({
+                'success': False,
+                'error': 'Projeto não encontrado'
+            }), 404
+        
+        cursor.execute('''
+        UPDATE projects 
+        SET name = ?, description = ?
+        WHERE id = ?
+        ''', (data['name'], data['description'], project_id))
+        
+        conn.commit()
+    projects_cache.cache.invalidate()
     
     return jsonify({
         'success': True,
@@ -766,23 +1179,22 @@ def update_project(project_id):
         }
     })
 
-@app.route('/api/projects/<int:project_id>', methods=['DELETE'])
+@api.route('/api/projects/<int:project_id>', methods=['DELETE'])
 def delete_project(project_id):
     """Deleta um projeto específico pelo ID"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT id FROM projects WHERE id = ?', (project_id,))
-    if not cursor.fetchone():
-        conn.close()
-        return jsonify({
-            'success': False,
-            'error': 'Projeto não encontrado'
-        }), 404
-    
-    cursor.execute('DELETE FROM projects WHERE id = ?', (project_id,))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT id FROM projects WHERE id = ?', (project_id,))
+        if not cursor.fetchone():
+            return jsonify({
+                'success': False,
+                'error': 'Projeto não encontrado'
+            }), 404
+        
+        cursor.execute('DELETE FROM projects WHERE id = ?', (project_id,))
+        conn.commit()
+    projects_cache.cache.invalidate()
     
     return jsonify({
         'success': True,
@@ -798,7 +1210,9 @@ if __name__ == '__main__':
         print("✅ API OpenAI configurada com sucesso.")
     
     print(f"👤 Autor das propostas configurado: {PROPOSAL_AUTHOR}")
-    print(f"💾 Banco de dados configurado em: {DB_PATH}")
+    print(f"💾 Banco de dados configurado em: {db.DB_PATH}")
+    
+    print("🚀 Em produção, use: python serving.py (gunicorn/waitress)")
     
-    # Inicia o servidor Flask
-    app.run(debug=True, port=5000)
+    # Inicia o servidor Flask (desenvolvimento)
+    create_app().run(debug=True, port=5000)
@@ -0,0 +1,142 @@
+"""
+Benchmark da extração em lote do 99freelas
+
+Sobe o FixturePageServer com as páginas de benchmarks/fixtures/99freelas
+(com latência simulada) e extrai N URLs de duas formas: uma a uma por
+POST /api/extract-99freelas e de uma vez por POST /api/extract-99freelas/batch.
+Confere que o lote devolve os mesmos dados, que URLs inválidas e páginas
+inexistentes viram erros por URL e que o intervalo mínimo entre requisições
+ao mesmo host foi respeitado.
+
+Uso:
+    python benchmarks/bench_batch_extract.py [--urls 50] [--concurrency 8] [--latency 0.3] [--host-delay 0.05]
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+_tmpdir = tempfile.mkdtemp(prefix='pitchbot-bench-')
+os.environ['PITCHBOT_DB_PATH'] = os.path.join(_tmpdir, 'bench.db')
+
+import app as backend  # noqa: E402
+from fetcher import fetcher  # noqa: E402
+from mock_servers import FixturePageServer  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures', '99freelas')
+
+
+def fixture_names():
+    return sorted(name[:-5] for name in os.listdir(FIXTURES_DIR) if name.endswith('.html'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--urls', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--host-delay', type=float, default=0.05)
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    names = fixture_names()
+    with FixturePageServer(FIXTURES_DIR, latency=args.latency) as pages:
+        # O servidor local faz o papel do 99freelas
+        backend.FREELAS_HOST = '127.0.0.1'
+        fetcher.throttle.delay = args.host_delay
+
+        server = make_server('127.0.0.1', 0, backend.create_app(), threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{server.server_port}/api/extract-99freelas'
+
+        urls = [pages.page_url(names[i % len(names)], n=i) for i in range(args.urls)]
+
+        try:
+            start = time.perf_counter()
+            serial = [
+                requests.post(base, json={'url': url}, timeout=60).json()['projectData']
+                for url in urls
+            ]
+            serial_s = time.perf_counter() - start
+
+            # Mesmas páginas com outras URLs, para não vir do cache
+            fetcher.clear()
+            batch_urls = [url + '&batch=1' for url in urls]
+            extra = ['https://example.com/nao-e-99freelas', pages.page_url('nao_existe')]
+            request_times_before = len(pages.request_times)
+            peak_before = pages.peak_active
+            pages.peak_active = 0
+
+            start = time.perf_counter()
+            first_line_s = None
+            lines = []
+            with requests.post(base + '/batch', json={
+                'urls': batch_urls + extra,
+                'concurrency': args.concurrency
+            }, stream=True, timeout=120) as response:
+                response.raise_for_status()
+                for raw in response.iter_lines():
+                    if first_line_s is None:
+                        first_line_s = time.perf_counter() - start
+                    lines.append(json.loads(raw))
+            batch_s = time.perf_counter() - start
+        finally:
+            server.shutdown()
+            shutil.rmtree(_tmpdir, ignore_errors=True)
+
+    summary = lines[-1]
+    results = {item['index']: item for item in lines[:-1]}
+
+    mismatches = [
+        i for i in range(args.urls)
+        if not results[i]['success'] or results[i]['projectData'] != serial[i]
+    ]
+    invalid = results[args.urls]
+    missing = results[args.urls + 1]
+
+    batch_times = sorted(pages.request_times[request_times_before:])
+    min_gap = min((b - a for a, b in zip(batch_times, batch_times[1:])), default=0.0)
+
+    report = {
+        'urls': args.urls,
+        'concurrency': args.concurrency,
+        'page_latency_s': args.latency,
+        'host_delay_s': args.host_delay,
+        'serial_s': round(serial_s, 3),
+        'batch_s': round(batch_s, 3),
+        'batch_first_result_s': round(first_line_s, 3),
+        'speedup': round(serial_s / batch_s, 2),
+        'peak_concurrent_fetches': pages.peak_active,
+        'serial_peak_concurrent_fetches': peak_before,
+        'min_gap_between_requests_s': round(min_gap, 3),
+        'summary': summary,
+        'identical_output': not mismatches,
+        'invalid_url_error': invalid.get('error'),
+        'missing_page_error': missing.get('error')
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    ok = (
+        not mismatches
+        and not invalid['success'] and not missing['success']
+        and summary['succeeded'] == args.urls
+        and min_gap >= args.host_delay * 0.5  # folga para o atraso de agendamento das threads
+    )
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""
+Benchmark da compressão do texto das propostas e das respostas HTTP
+
+Gera propostas sintéticas no formato das geradas pelo app (saudação,
+parágrafos com {b}/{i}/{u}, lista de entregas e assinatura) e compara o
+tamanho do banco com o texto sem compressão, com deflate sem dicionário e
+com o dicionário treinado (db_utils.compress_proposals). Mede também os
+bytes de GET /api/proposals sem codificação, com gzip e com brotli, e o
+tempo de compressão e descompressão por proposta.
+
+Uso:
+    python benchmarks/bench_compression.py [--rows 5000] [--page 50]
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_tmpdir = tempfile.mkdtemp(prefix='pitchbot-bench-')
+os.environ['PITCHBOT_DB_PATH'] = os.path.join(_tmpdir, 'bench.db')
+os.environ['JOB_WORKERS'] = '0'
+
+import app as backend  # noqa: E402
+import compression  # noqa: E402
+import db  # noqa: E402
+import db_utils  # noqa: E402
+
+NAMES = ('João', 'Maria', 'Carlos', 'Ana', 'Pedro', 'Juliana', 'Rafael', 'Fernanda', 'Lucas', 'Camila')
+PROJECTS = (
+    ('loja virtual', 'WooCommerce'), ('aplicativo de delivery', 'Flutter'),
+    ('sistema de agendamento', 'Django'), ('site institucional', 'WordPress'),
+    ('painel administrativo', 'React'), ('integração de pagamentos', 'Node.js'),
+    ('automação de planilhas', 'Python'), ('landing page', 'Next.js')
+)
+OPENINGS = (
+    'Agradeço a oportunidade de apresentar esta proposta para o seu {project}.',
+    'Fico feliz em saber do seu interesse em desenvolver um {project}.',
+    'Li com atenção a descrição do seu {project} e entendi perfeitamente o objetivo.',
+)
+BODIES = (
+    'Como {{b}}freelancer especializado em {tech}{{/b}}, eu serei responsável por todas as etapas: '
+    'levantamento dos requisitos, desenvolvimento, {{i}}testes{{/i}} e entrega final.',
+    'Utilizarei a metodologia {{i}}ágil{{/i}}, com entregas parciais semanais, para que você acompanhe '
+    'a evolução do {project} e possa sugerir ajustes a qualquer momento.',
+    'Minha experiência com {{b}}{tech}{{/b}} garante uma solução {{i}}escalável{{/i}}, segura e fácil de manter, '
+    'com código documentado e {{u}}boas práticas de desenvolvimento{{/u}}.',
+    'Antes de iniciar, farei uma {{i}}reunião de alinhamento{{/i}} para entender em detalhes as necessidades '
+    'do seu negócio e definir as prioridades do {project}.',
+)
+DELIVERABLES = (
+    '{b}Desenvolvimento completo{/b} conforme o escopo descrito',
+    '{i}Testes{/i} e correções antes da entrega',
+    '{u}Suporte de 30 dias{/u} após a entrega',
+    'Documentação e treinamento de uso',
+    'Publicação em ambiente de produção',
+    'Relatórios semanais de andamento',
+)
+
+
+def make_proposal(rng, index):
+    name = rng.choice(NAMES)
+    project, tech = rng.choice(PROJECTS)
+    value = rng.randrange(500, 20000, 50)
+    days = rng.choice((10, 15, 20, 30, 45, 60))
+    greeting = 'Prezada' if name.endswith('a') else 'Prezado'
+    paragraphs = [f'{greeting} {name}, tudo bem?', rng.choice(OPENINGS).format(project=project)]
+    paragraphs += [body.format(project=project, tech=tech) for body in rng.sample(BODIES, 3)]
+    paragraphs.append('{b}O que será entregue:{/b}\n\n' + '\n'.join(
+        f'- {item}' for item in rng.sample(DELIVERABLES, 4)
+    ))
+    paragraphs.append(
+        f'O prazo para a entrega será de {{b}}{days} dias úteis{{/b}}, e o investimento total é de '
+        f'{{b}}R$ {value:,.2f}{{/b}}, com pagamento pela plataforma 99freelas. É {{u}}imprescindível{{/u}} '
+        'que os acessos e materiais sejam fornecidos no início do projeto.'
+    )
+    paragraphs.append('Fico à disposição para esclarecer qualquer dúvida. Caso esteja de acordo, '
+                      'podemos dar início ao projeto imediatamente.')
+    paragraphs.append('Atenciosamente,\n{b}Rivaldo Silveira{/b}')
+    description = (f'Preciso de um {project} desenvolvido em {tech}, com painel para gerenciar '
+                   f'os pedidos e integração com o sistema atual da empresa (pedido {index}).')
+    return name, description, float(value), f'{days} dias', '\n\n\n'.join(paragraphs)
+
+
+def seed(path, rows, mode):
+    """Cria o banco e grava as propostas com o modo de compressão indicado"""
+    db.configure(path=path)
+    backend.init_db()
+    compression.STORAGE_COMPRESSION = mode != 'none'
+    # Um codec sem dicionário carregado comprime só com deflate
+    codec = compression.TextCodec() if mode == 'deflate' else compression.codec_for(path)
+
+    rng = random.Random(42)
+    start = datetime.datetime(2024, 1, 1)
+    with db.get_connection() as conn:
+        conn.executemany('''
+        INSERT INTO proposals (
+            client_name, project_description, value, deadline,
+            additional_points, custom_prompt, content, created_at, author, model
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (name, codec.compress(description), value, deadline, '', '',
+             codec.compress(content), (start + datetime.timedelta(minutes=i)).isoformat(),
+             'Bench', 'gpt-3.5-turbo')
+            for i, (name, description, value, deadline, content)
+            in enumerate(make_proposal(rng, i) for i in range(rows))
+        ])
+        conn.commit()
+    db.get_pool().close()
+    compression.STORAGE_COMPRESSION = True
+
+
+def database_size(path):
+    conn = db.open_connection(path)
+    try:
+        conn.execute('VACUUM')
+        return conn.execute('PRAGMA page_count').fetchone()[0] * conn.execute('PRAGMA page_size').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def response_sizes(client, url):
+    sizes = {}
+    for encoding in ('identity', 'gzip', 'br'):
+        if encoding == 'br' and compression.brotli is None:
+            continue
+        start = time.perf_counter()
+        response = client.get(url, headers={'Accept-Encoding': encoding})
+        sizes[encoding] = {
+            'bytes': len(response.get_data()),
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+    return sizes
+
+
+def codec_timings(codec, texts):
+    start = time.perf_counter()
+    packed = [codec.compress(text) for text in texts]
+    compress_us = (time.perf_counter() - start) / len(texts) * 1e6
+    start = time.perf_counter()
+    for value in packed:
+        compression.decompress(value)
+    decompress_us = (time.perf_counter() - start) / len(texts) * 1e6
+    return {'compress_us': round(compress_us, 1), 'decompress_us': round(decompress_us, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--page', type=int, default=50)
+    args = parser.parse_args()
+
+    report = {'rows': args.rows, 'database_bytes': {}}
+    try:
+        for mode in ('none', 'deflate', 'dictionary'):
+            path = os.path.join(_tmpdir, f'{mode}.db')
+            seed(path, args.rows, mode)
+            if mode == 'dictionary':
+                # Dicionário treinado com as propostas do banco, como em produção
+                db_utils.DB_PATH = path
+                db_utils.compress_proposals()
+            report['database_bytes'][mode] = database_size(path)
+
+        sizes = report['database_bytes']
+        report['database_ratio'] = {
+            mode: round(sizes['none'] / sizes[mode], 2) for mode in ('deflate', 'dictionary')
+        }
+
+        db.configure(path=os.path.join(_tmpdir, 'dictionary.db'))
+        client = backend.create_app().test_client()
+        report['list_response_bytes'] = {
+            'page': response_sizes(client, f'/api/proposals?limit={args.page}'),
+            'preview_page': response_sizes(client, f'/api/proposals?limit={args.page}&fields=client_name,preview'),
+            'full_list': response_sizes(client, '/api/proposals')
+        }
+
+        rng = random.Random(7)
+        texts = [make_proposal(rng, i)[4] for i in range(500)]
+        report['codec'] = {
+            'dictionary': codec_timings(compression.codec_for(os.path.join(_tmpdir, 'dictionary.db')), texts),
+            'deflate': codec_timings(compression.TextCodec(), texts)
+        }
+        report['average_content_bytes'] = round(sum(len(t.encode('utf-8')) for t in texts) / len(texts))
+    finally:
+        db.get_pool().close()
+        shutil.rmtree(_tmpdir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
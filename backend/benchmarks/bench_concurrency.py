@@ -0,0 +1,91 @@
+"""
+Teste de carga de gerações simultâneas contra uma OpenAI falsa
+
+Sobe o MockOpenAIServer com latência fixa e dispara N requisições
+simultâneas a POST /api/generate-proposal, cada uma com a sua própria
+chave. Com clientes por requisição e pool de conexões compartilhado, N
+gerações devem terminar em aproximadamente o tempo de uma.
+
+Uso:
+    python benchmarks/bench_concurrency.py [--concurrency 8] [--latency 1.0]
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+_tmpdir = tempfile.mkdtemp(prefix='pitchbot-bench-')
+os.environ['PITCHBOT_DB_PATH'] = os.path.join(_tmpdir, 'bench.db')
+
+import app as backend  # noqa: E402
+import llm  # noqa: E402
+from mock_servers import MockOpenAIServer  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+
+
+def generate(url, index):
+    """Faz uma geração com uma chave diferente por requisição"""
+    response = requests.post(url, json={
+        'clientName': f'Cliente {index}',
+        'projectDescription': 'Landing page para evento',
+        'value': '1500',
+        'deadline': '10 dias',
+        'apiKey': f'sk-mock-{index}'
+    }, timeout=120)
+    response.raise_for_status()
+    return response.json()['proposal']['id']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=1.0)
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    with MockOpenAIServer(latency=args.latency) as mock:
+        llm.OPENAI_API_BASE = mock.url
+
+        server = make_server('127.0.0.1', 0, backend.create_app(), threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_port}/api/generate-proposal'
+
+        try:
+            start = time.perf_counter()
+            generate(url, 0)
+            single = time.perf_counter() - start
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                ids = list(executor.map(lambda i: generate(url, i), range(1, args.concurrency + 1)))
+            concurrent = time.perf_counter() - start
+        finally:
+            server.shutdown()
+            shutil.rmtree(_tmpdir, ignore_errors=True)
+
+        print(json.dumps({
+            'concurrency': args.concurrency,
+            'upstream_latency_s': args.latency,
+            'single_generation_s': round(single, 3),
+            'concurrent_batch_s': round(concurrent, 3),
+            'batch_over_single': round(concurrent / single, 2),
+            'peak_upstream_requests': mock.peak_active,
+            'unique_ids': len(set(ids))
+        }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
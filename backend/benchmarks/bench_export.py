@@ -0,0 +1,105 @@
+"""
+Benchmark da exportação de propostas
+
+Compara a exportação original (fetchall + json.dump com indentação) com a
+exportação NDJSON em streaming, sem compressão e com gzip/zstd: tempo,
+tamanho do arquivo e pico de memória alocada (tracemalloc). Com o
+streaming, o pico não deve crescer junto com --rows.
+
+Uso:
+    python benchmarks/bench_export.py [--rows 20000] [--content-size 2000]
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import db_utils  # noqa: E402
+
+
+def seed(path, rows, content_size):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+    CREATE TABLE proposals (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_name TEXT NOT NULL,
+        project_description TEXT NOT NULL,
+        value REAL NOT NULL,
+        deadline TEXT NOT NULL,
+        additional_points TEXT,
+        custom_prompt TEXT,
+        content TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        author TEXT NOT NULL,
+        model TEXT NOT NULL
+    )
+    ''')
+    start = datetime.datetime(2024, 1, 1)
+    content = ('Prezado cliente, segue a proposta. ' * (content_size // 35 + 1))[:content_size]
+    conn.executemany('''
+    INSERT INTO proposals (
+        client_name, project_description, value, deadline,
+        additional_points, custom_prompt, content, created_at, author, model
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        (f'Cliente {i}', f'Projeto de exemplo número {i}', 1000.0 + i, '30 dias', '', '',
+         content, (start + datetime.timedelta(minutes=i)).isoformat(), 'Bench', 'gpt-3.5-turbo')
+        for i in range(rows)
+    ))
+    conn.commit()
+    conn.close()
+
+
+def measure(func, output_file):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'file_mb': round(os.path.getsize(output_file) / 1e6, 2),
+        'peak_memory_mb': round(peak / 1e6, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--content-size', type=int, default=2000)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='pitchbot-bench-')
+    results = {}
+    try:
+        db_utils.DB_PATH = os.path.join(tmpdir, 'bench.db')
+        seed(db_utils.DB_PATH, args.rows, args.content_size)
+
+        legacy_file = os.path.join(tmpdir, 'export.json')
+        results['json_indent'] = measure(lambda: db_utils.export_proposals(legacy_file), legacy_file)
+
+        for compression, extension in (('none', '.ndjson'), ('gzip', '.ndjson.gz'), ('zstd', '.ndjson.zst')):
+            if compression == 'zstd' and db_utils.zstandard is None:
+                continue
+            output_file = os.path.join(tmpdir, f'export{extension}')
+            results[f'ndjson_{compression}'] = measure(
+                lambda: db_utils.export_ndjson(output_file, compression), output_file
+            )
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print(json.dumps({'rows': args.rows, 'content_size': args.content_size, 'exports': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark do extrator de páginas do 99freelas
+
+Compara o extrator de passada única (extractor.py) com a implementação
+anterior baseada na árvore do BeautifulSoup, usando as páginas salvas em
+benchmarks/fixtures/99freelas. Antes de medir, confere que os dois retornam
+exatamente os mesmos dados para cada página; qualquer diferença encerra com
+código de saída 1.
+
+Uso:
+    python benchmarks/bench_extractor.py [--repeat 50]
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from extractor import extract_project_data  # noqa: E402
+
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures', '99freelas')
+
+
+def legacy_extract_project_data(html):
+    """Implementação anterior (árvore completa + seletores CSS), usada como referência"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    client_name = None
+    client_name_elem = soup.select_one('.info-usuario-nome span.name')
+    if client_name_elem and client_name_elem.text.strip():
+        client_name = client_name_elem.text.strip()
+    if not client_name:
+        client_div = soup.select_one('div:-soup-contains("Cliente") h2')
+        if client_div and client_div.text.strip():
+            client_name = client_div.text.strip()
+    if not client_name:
+        cliente_pattern = re.search(r'Cliente:?\s*([A-Za-z0-9\s]+)', html)
+        if cliente_pattern:
+            client_name = cliente_pattern.group(1).strip()
+    if not client_name:
+        client_name = "Cliente"
+
+    project_description = None
+    project_desc_elem = soup.select_one('.item-text.project-description')
+    if project_desc_elem and project_desc_elem.text.strip():
+        project_description = project_desc_elem.text.strip()
+    if not project_description:
+        desc_elem = soup.select_one('div:-soup-contains("Descrição do Projeto:"), div.project-description')
+        if desc_elem and desc_elem.text.strip():
+            desc_text = desc_elem.text.strip()
+            desc_match = re.search(r'Descrição do Projeto:?\s*(.+)', desc_text, re.DOTALL)
+            if desc_match:
+                project_description = desc_match.group(1).strip()
+            else:
+                project_description = desc_text
+    if not project_description:
+        for p in soup.select('p'):
+            if p.text and len(p.text.strip()) > 100:
+                project_description = p.text.strip()
+                break
+    if not project_description:
+        project_description = "Descrição do projeto não encontrada. Por favor, preencha manualmente."
+
+    value = None
+    value_elem = soup.select_one('div:-soup-contains("Valor Mínimo:") + div')
+    if value_elem:
+        value_text = value_elem.text.strip()
+        value_match = re.search(r'R\$\s*([\d.,]+)', value_text)
+        if value_match:
+            value = value_match.group(1).replace('.', '').replace(',', '.')
+    if not value:
+        value_pattern = re.search(r'R\$\s*([\d.,]+)', html)
+        if value_pattern:
+            value = value_pattern.group(1).replace('.', '').replace(',', '.')
+    if not value:
+        value = "5000"
+
+    return {
+        'clientName': client_name,
+        'projectDescription': project_description,
+        'value': value
+    }
+
+
+def load_fixtures():
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            fixtures[os.path.basename(path)] = f.read()
+    return fixtures
+
+
+def time_per_page(func, html, repeat):
+    """Tempo médio de uma extração, em milissegundos"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(html)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+
+    mismatches = []
+    for name, html in fixtures.items():
+        expected = legacy_extract_project_data(html)
+        actual = extract_project_data(html)
+        if actual != expected:
+            mismatches.append({'fixture': name, 'expected': expected, 'actual': actual})
+
+    if mismatches:
+        print(json.dumps({'mismatches': mismatches}, indent=2, ensure_ascii=False))
+        sys.exit(1)
+
+    results = []
+    for name, html in fixtures.items():
+        legacy_ms = time_per_page(legacy_extract_project_data, html, args.repeat)
+        single_pass_ms = time_per_page(extract_project_data, html, args.repeat)
+        results.append({
+            'fixture': name,
+            'size_kb': round(len(html.encode('utf-8')) / 1024, 1),
+            'legacy_ms': round(legacy_ms, 3),
+            'single_pass_ms': round(single_pass_ms, 3),
+            'speedup': round(legacy_ms / single_pass_ms, 2)
+        })
+
+    print(json.dumps({
+        'fixtures': len(fixtures),
+        'repeat': args.repeat,
+        'identical_output': True,
+        'results': results
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark da importação de propostas em lote
+
+Gera um arquivo NDJSON sintético e o importa com db_utils.import_proposals
+em um banco com o esquema completo do app (índices e triggers da busca
+FTS5). Para comparar, importa uma amostra com o método original (json.load
+e um INSERT por linha, com os triggers ativos) e extrapola a taxa.
+
+Uso:
+    python benchmarks/bench_import.py [--rows 1000000] [--legacy-rows 20000] [--content-size 500]
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import db  # noqa: E402
+import db_utils  # noqa: E402
+
+
+def write_ndjson(path, rows, content_size):
+    start = datetime.datetime(2024, 1, 1)
+    content = ('Prezado cliente, segue a proposta. ' * (content_size // 35 + 1))[:content_size]
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(rows):
+            f.write(json.dumps({
+                'client_name': f'Cliente {i}',
+                'project_description': f'Projeto de exemplo número {i}',
+                'value': 1000.0 + i,
+                'deadline': '30 dias',
+                'additional_points': '',
+                'custom_prompt': '',
+                'content': f'{content} #{i}',
+                'created_at': (start + datetime.timedelta(seconds=i)).isoformat(),
+                'author': 'Bench',
+                'model': 'gpt-3.5-turbo'
+            }, ensure_ascii=False) + '\n')
+
+
+def legacy_import(path, rows):
+    """Método original: arquivo inteiro em memória e um execute por linha"""
+    with open(path, encoding='utf-8') as f:
+        proposals = [json.loads(next(f)) for _ in range(rows)]
+
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        for proposal in proposals:
+            cursor.execute('''
+            INSERT INTO proposals (
+                client_name, project_description, value, deadline,
+                additional_points, custom_prompt, content, created_at, author, model
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', tuple(proposal[column] for column in db_utils.IMPORT_COLUMNS))
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--legacy-rows', type=int, default=20000)
+    parser.add_argument('--content-size', type=int, default=500)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='pitchbot-bench-')
+    try:
+        source = os.path.join(tmpdir, 'proposals.ndjson')
+        write_ndjson(source, args.rows, args.content_size)
+
+        os.environ['JOB_WORKERS'] = '0'
+        import app as backend
+
+        db.configure(path=os.path.join(tmpdir, 'legacy.db'))
+        backend.init_db()
+        start = time.perf_counter()
+        legacy_import(source, min(args.legacy_rows, args.rows))
+        legacy_rate = min(args.legacy_rows, args.rows) / (time.perf_counter() - start)
+
+        db.configure(path=os.path.join(tmpdir, 'bulk.db'))
+        backend.init_db()
+        db.get_pool().close()
+        db_utils.DB_PATH = db.DB_PATH
+        start = time.perf_counter()
+        result = db_utils.import_proposals(source)
+        elapsed = time.perf_counter() - start
+
+        # Reimportar o mesmo arquivo só encontra repetições
+        start = time.perf_counter()
+        again = db_utils.import_proposals(source)
+        reimport_elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print(json.dumps({
+        'rows': args.rows,
+        'bulk_import': dict(result, elapsed_s=round(elapsed, 2), rows_per_s=round(args.rows / elapsed)),
+        'reimport': dict(again, elapsed_s=round(reimport_elapsed, 2)),
+        'legacy_rows_per_s': round(legacy_rate),
+        'legacy_estimated_s': round(args.rows / legacy_rate, 1),
+        'speedup': round(args.rows / legacy_rate / elapsed, 1)
+    }, indent=2))
+
+    sys.exit(0 if result['inserted'] == args.rows and again['inserted'] == 0 else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark do custo da instrumentação por requisição
+
+Mede requisições por segundo em GET /api/proposals (test client do Flask,
+sem rede) com a instrumentação desligada, ligada e ligada com o log de
+consultas lentas. Cada modo roda em um subprocesso, porque as variáveis de
+ambiente são lidas na importação dos módulos.
+
+Uso:
+    python benchmarks/bench_instrumentation.py [--rows 50] [--requests 3000]
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+
+MODES = {
+    'off': {},
+    'spans': {'PITCHBOT_INSTRUMENTATION': '1', 'SLOW_REQUEST_MS': '1000000'},
+    'spans+slow_query_log': {
+        'PITCHBOT_INSTRUMENTATION': '1', 'SLOW_REQUEST_MS': '1000000', 'DB_SLOW_QUERY_MS': '1000000'
+    }
+}
+
+
+def child(rows, total, path):
+    """Executado no subprocesso: popula o banco e mede a taxa de requisições"""
+    sys.path.insert(0, BACKEND_DIR)
+    import app as backend
+    import db
+
+    application = backend.create_app()
+    now = datetime.datetime.now()
+    with db.get_connection() as conn:
+        conn.executemany('''
+        INSERT INTO proposals (
+            client_name, project_description, value, deadline,
+            additional_points, custom_prompt, content, created_at, author, model
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (
+                f'Cliente {i}', f'Projeto de exemplo número {i}', 1000.0 + i, '30 dias',
+                '', '', 'Prezado cliente, tudo bem? ' * 20,
+                (now - datetime.timedelta(minutes=i)).isoformat(), 'Bench', 'gpt-3.5-turbo'
+            )
+            for i in range(rows)
+        ])
+        conn.commit()
+
+    client = application.test_client()
+    for _ in range(100):
+        client.get(path)
+
+    start = time.perf_counter()
+    for _ in range(total):
+        client.get(path)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'requests_per_s': round(total / elapsed), 'elapsed_s': round(elapsed, 3)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--path', default='/api/proposals?limit=20')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.rows, args.requests, args.path)
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='pitchbot-bench-') as tmpdir:
+        for mode, overrides in MODES.items():
+            env = {
+                key: value for key, value in os.environ.items()
+                if key not in ('PITCHBOT_INSTRUMENTATION', 'DB_SLOW_QUERY_MS', 'PITCHBOT_PROFILING')
+            }
+            env.update(overrides, PITCHBOT_DB_PATH=os.path.join(tmpdir, f'{mode}.db'), JOB_WORKERS='0')
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child',
+                 '--rows', str(args.rows), '--requests', str(args.requests), '--path', args.path],
+                env=env, capture_output=True, text=True, check=True
+            ).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    baseline = results['off']['requests_per_s']
+    for mode, result in results.items():
+        result['overhead_pct'] = round((baseline / result['requests_per_s'] - 1) * 100, 1)
+
+    print(json.dumps({'path': args.path, 'requests': args.requests, 'modes': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
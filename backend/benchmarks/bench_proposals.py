@@ -0,0 +1,120 @@
+"""
+Benchmark de requisições por segundo em GET /api/proposals
+
+Compara o pool de conexões (db.get_connection) com o modelo antigo de abrir
+e fechar uma conexão sqlite3 a cada requisição. Usa um banco temporário
+populado com propostas sintéticas e um servidor Werkzeug com threads.
+
+Uso:
+    python benchmarks/bench_proposals.py [--rows 50] [--requests 1000] [--concurrency 8] [--path /api/proposals]
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# O banco precisa ser definido antes de criar o app
+_tmpdir = tempfile.mkdtemp(prefix='pitchbot-bench-')
+os.environ['PITCHBOT_DB_PATH'] = os.path.join(_tmpdir, 'bench.db')
+
+import db  # noqa: E402
+import app as backend  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+
+
+def seed(rows):
+    """Popula o banco temporário com propostas sintéticas"""
+    now = datetime.datetime.now()
+    with db.get_connection() as conn:
+        conn.executemany('''
+        INSERT INTO proposals (
+            client_name, project_description, value, deadline,
+            additional_points, custom_prompt, content, created_at, author, model
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (
+                f'Cliente {i}', f'Projeto de exemplo número {i}', 1000.0 + i, '30 dias',
+                '', '', 'Prezado cliente, tudo bem? ' * 20,
+                (now - datetime.timedelta(minutes=i)).isoformat(), 'Bench', 'gpt-3.5-turbo'
+            )
+            for i in range(rows)
+        ])
+        conn.commit()
+
+
+@contextlib.contextmanager
+def per_request_connection():
+    """Comportamento antigo: uma conexão nova por requisição"""
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def run(url, total, concurrency):
+    """Dispara `total` requisições com `concurrency` threads e mede a taxa"""
+    def fetch(_):
+        with urllib.request.urlopen(url) as resp:
+            resp.read()
+
+    # Aquecimento
+    for _ in range(concurrency):
+        fetch(None)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(fetch, range(total)))
+    elapsed = time.perf_counter() - start
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--path', default='/api/proposals')
+    args = parser.parse_args()
+
+    application = backend.create_app()
+    seed(args.rows)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    server = make_server('127.0.0.1', 0, application, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}{args.path}'
+
+    results = {}
+    original = backend.get_connection
+    try:
+        backend.get_connection = per_request_connection
+        results['per_request_rps'] = run(url, args.requests, args.concurrency)
+        backend.get_connection = original
+        results['pooled_rps'] = run(url, args.requests, args.concurrency)
+    finally:
+        backend.get_connection = original
+        server.shutdown()
+        shutil.rmtree(_tmpdir, ignore_errors=True)
+
+    results['speedup'] = results['pooled_rps'] / results['per_request_rps']
+    results.update(rows=args.rows, requests=args.requests, concurrency=args.concurrency, path=args.path)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Benchmark dos servidores de produção com uma OpenAI falsa local
+
+Sobe o backend em um subprocesso com cada servidor disponível (o
+servidor de desenvolvimento do `flask run`, o gunicorn e o waitress via
+serving.py), sempre com um banco novo e com OPENAI_API_BASE apontando para
+o MockOpenAIServer. Mede a taxa e as latências de:
+
+- gerações (`/api/generate-proposal`), cada uma esperando --latency
+  segundos pela OpenAI falsa;
+- leituras (`/api/proposals?limit=50`) depois das gerações.
+
+Para os servidores de produção, mede também o desligamento: uma geração
+lenta é iniciada, o processo recebe SIGTERM e o relatório diz se a geração
+terminou com 200, se novas conexões foram recusadas e quanto tempo o
+processo levou para sair.
+
+Uso:
+    python benchmarks/bench_serving.py [--servers dev,gunicorn,waitress] [--concurrency 32]
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import signal
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from loadtest import free_port, percentile, session, start_server, stop_server  # noqa: E402
+from mock_servers import MockOpenAIServer  # noqa: E402
+
+
+def load(total, concurrency, call):
+    """Executa `call(i)` `total` vezes com `concurrency` threads"""
+    latencies = []
+    errors = 0
+
+    def timed(index):
+        start = time.perf_counter()
+        ok = call(index)
+        return time.perf_counter() - start, ok
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # Aquecimento: imports tardios, sessões HTTP e pools de cada processo
+        list(executor.map(call, range(-concurrency, 0)))
+
+        start = time.perf_counter()
+        for elapsed, ok in executor.map(timed, range(total)):
+            latencies.append(elapsed)
+            errors += 0 if ok else 1
+    wall = time.perf_counter() - start
+    return {
+        'requests': total,
+        'errors': errors,
+        'rps': round(total / wall, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1)
+    }
+
+
+def generation(base, index, timeout=120):
+    response = session().post(f'{base}/api/generate-proposal', json={
+        'clientName': f'Cliente {index}',
+        'projectDescription': f'Landing page para o evento {index}',
+        'value': '1500',
+        'deadline': '10 dias',
+        'apiKey': f'sk-mock-{index}'
+    }, timeout=timeout)
+    return response.status_code == 200
+
+
+def read_page(base, _):
+    return session().get(f'{base}/api/proposals?limit=50', timeout=30).status_code == 200
+
+
+def measure_drain(name, port, env, mock, latency):
+    """SIGTERM com uma geração em andamento: ela termina e o servidor sai"""
+    process, base = start_server(name, port, env)
+    mock.latency = latency
+    result = {}
+    try:
+        pending = ThreadPoolExecutor(max_workers=1).submit(
+            lambda: requests.post(f'{base}/api/generate-proposal', json={
+                'clientName': 'Drain', 'projectDescription': 'Sistema', 'value': '1',
+                'deadline': '1 dia', 'apiKey': 'sk-mock-drain'
+            }, timeout=60).status_code
+        )
+        time.sleep(latency / 4)
+        signaled = time.perf_counter()
+        os.kill(process.pid, signal.SIGTERM)
+        time.sleep(0.5)
+        try:
+            requests.get(f'{base}/api/health', timeout=2)
+            result['new_connections_refused'] = False
+        except requests.ConnectionError:
+            result['new_connections_refused'] = True
+        try:
+            result['in_flight_status'] = pending.result(timeout=60)
+        except requests.RequestException as e:
+            result['in_flight_status'] = f'erro: {e.__class__.__name__}'
+        process.wait(timeout=60)
+        result['exit_after_signal_s'] = round(time.perf_counter() - signaled, 2)
+        result['exit_code'] = process.returncode
+    finally:
+        stop_server(process)
+    return result
+
+
+def available(name):
+    if name == 'dev':
+        return True
+    try:
+        __import__(name)
+        return True
+    except ImportError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--servers', default='dev,gunicorn,waitress')
+    parser.add_argument('--generations', type=int, default=256)
+    parser.add_argument('--reads', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--latency', type=float, default=0.5)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=32)
+    args = parser.parse_args()
+
+    logging.getLogger('urllib3').setLevel(logging.ERROR)
+    tmpdir = tempfile.mkdtemp(prefix='pitchbot-bench-')
+    report = {
+        'cpus': os.cpu_count(), 'latency_s': args.latency, 'concurrency': args.concurrency,
+        'workers': args.workers, 'threads': args.threads, 'servers': {}
+    }
+    try:
+        with MockOpenAIServer(latency=args.latency) as mock:
+            for name in args.servers.split(','):
+                if not available(name):
+                    report['servers'][name] = {'skipped': f'{name} não instalado'}
+                    continue
+                env = dict(
+                    os.environ,
+                    PITCHBOT_DB_PATH=os.path.join(tmpdir, f'{name}.db'),
+                    OPENAI_API_BASE=mock.url,
+                    JOB_WORKERS='0',
+                    WEB_WORKERS=str(args.workers),
+                    WEB_THREADS=str(args.threads),
+                    WEB_GRACEFUL_TIMEOUT='30'
+                )
+                mock.latency = args.latency
+                mock.peak_active = 0
+                process, base = start_server(name, free_port(), env)
+                try:
+                    result = {
+                        'generate': load(args.generations, args.concurrency,
+                                         lambda i: generation(base, i)),
+                        'peak_upstream_requests': mock.peak_active,
+                        'read': load(args.reads, args.concurrency, lambda i: read_page(base, i))
+                    }
+                finally:
+                    stop_server(process)
+                if name != 'dev':
+                    result['sigterm'] = measure_drain(name, free_port(), env, mock, latency=3.0)
+                report['servers'][name] = result
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
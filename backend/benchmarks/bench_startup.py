@@ -0,0 +1,159 @@
+"""
+Benchmark do tempo de inicialização do backend
+
+Mede, em processos Python novos:
+
+- o `python -X importtime -c "import app"`: tempo total do import e os
+  módulos mais caros;
+- o tempo até a primeira resposta de /api/health (import, create_app() e a
+  primeira requisição), com um banco novo (todas as migrações) e com um banco
+  já migrado;
+- quais módulos pesados (requests, bs4, openai, tiktoken) já estavam carregados nesse
+  momento: nenhum deveria estar, eles são importados pelas rotas que os usam.
+
+Sai com código 1 se um módulo pesado for carregado antes da primeira
+resposta ou se a mediana passar de --max-ms, para uso na CI.
+
+Uso:
+    python benchmarks/bench_startup.py [--runs 5] [--max-ms 1000]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('requests', 'bs4', 'openai', 'tiktoken')
+
+# Executado no processo filho: os tempos começam antes do import do app
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+response = application.test_client().get('/api/health')
+answered = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (answered - created) * 1000,
+    'first_response_ms': (answered - start) * 1000,
+    'loaded': [name for name in %r if name in sys.modules]
+}))
+''' % (HEAVY_MODULES,)
+
+
+def child_env(path):
+    # O vocabulário do tiktoken carrega em segundo plano e, sem cache local, baixa com o requests
+    return dict(os.environ, PITCHBOT_DB_PATH=path, JOB_WORKERS='0', TIKTOKEN_WARMUP='0')
+
+
+def import_profile(path, top):
+    """Roda `-X importtime` e devolve o tempo do app e os imports mais caros"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=BACKEND_DIR, env=child_env(path), capture_output=True, text=True, check=True
+    )
+    modules = []
+    direct = []
+    children = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package (2 espaços por nível)
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), depth, int(cumulative_us)))
+        # Os filhos são listados antes do módulo que os importou
+        if depth == 1:
+            children.append((name.strip(), int(cumulative_us)))
+        elif depth == 0:
+            if name == 'app':
+                direct = children
+            children = []
+
+    app_us = next((cumulative for name, depth, cumulative in modules if name == 'app' and depth == 0), None)
+    direct.sort(key=lambda item: item[1], reverse=True)
+    return {
+        'app_import_ms': round(app_us / 1000, 1) if app_us is not None else None,
+        'modules': len(modules),
+        'slowest_direct_imports_ms': {name: round(us / 1000, 1) for name, us in direct[:top]},
+        'heavy_modules_imported': sorted({name for name, _, _ in modules} & set(HEAVY_MODULES))
+    }
+
+
+def first_response(path):
+    """Processo novo até a primeira resposta de /api/health"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD],
+        cwd=BACKEND_DIR, env=child_env(path), capture_output=True, text=True, check=True
+    )
+    wall = (time.perf_counter() - start) * 1000
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['process_wall_ms'] = wall
+    return timings
+
+
+def summarize(runs):
+    summary = {
+        key: {
+            'median': round(statistics.median(run[key] for run in runs), 1),
+            'max': round(max(run[key] for run in runs), 1)
+        }
+        for key in ('import_ms', 'create_app_ms', 'first_request_ms', 'first_response_ms', 'process_wall_ms')
+    }
+    summary['heavy_modules_loaded'] = sorted({name for run in runs for name in run['loaded']})
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='falha se a mediana até a primeira resposta (banco migrado) passar deste valor')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='pitchbot-bench-')
+    try:
+        existing = os.path.join(tmpdir, 'existing.db')
+        first_response(existing)  # aplica as migrações uma vez
+
+        report = {
+            'python': sys.version.split()[0],
+            'runs': args.runs,
+            'importtime': import_profile(existing, args.top),
+            'fresh_database': summarize([
+                first_response(os.path.join(tmpdir, f'fresh-{i}.db')) for i in range(args.runs)
+            ]),
+            'existing_database': summarize([first_response(existing) for _ in range(args.runs)])
+        }
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    failures = []
+    loaded = set(report['fresh_database']['heavy_modules_loaded'] + report['existing_database']['heavy_modules_loaded'])
+    if loaded:
+        failures.append(f'módulos pesados carregados antes da primeira resposta: {", ".join(sorted(loaded))}')
+    median = report['existing_database']['first_response_ms']['median']
+    if args.max_ms is not None and median > args.max_ms:
+        failures.append(f'primeira resposta em {median} ms (limite {args.max_ms} ms)')
+    report['failures'] = failures
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
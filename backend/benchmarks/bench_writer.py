@@ -0,0 +1,118 @@
+"""
+Benchmark do group commit das inserções de propostas
+
+Dispara inserções de várias threads ao mesmo tempo de duas formas: uma
+transação por linha (conexão do pool + commit, como save_proposal fazia) e
+pelo GroupCommitWriter. Confere que cada chamador recebeu o id da própria
+linha (e não o de outra requisição, como acontecia com SELECT MAX(id)).
+
+Uso:
+    python benchmarks/bench_writer.py [--threads 16] [--rows 200] [--synchronous NORMAL]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import db  # noqa: E402
+
+INSERT_SQL = '''
+INSERT INTO proposals (
+    client_name, project_description, value, deadline,
+    additional_points, custom_prompt, content, created_at, author, model, project_id
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def params(marker):
+    return (
+        marker, 'Landing page para evento', 1500.0, '10 dias', '', '',
+        'Prezado cliente, ' * 50, '2024-01-01T00:00:00', 'Bench', 'gpt-3.5-turbo', None
+    )
+
+
+def insert_per_row(marker):
+    with db.get_connection() as conn:
+        rowid = conn.execute(INSERT_SQL, params(marker)).lastrowid
+        conn.commit()
+    return marker, rowid
+
+
+def insert_group_commit(marker):
+    return marker, db.get_writer().execute(INSERT_SQL, params(marker))
+
+
+def run(func, prefix, threads, rows):
+    markers = [f'{prefix}-{i}' for i in range(threads * rows)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(func, markers))
+    elapsed = time.perf_counter() - start
+
+    # Cada id devolvido precisa apontar para a linha do próprio chamador
+    with db.get_connection() as conn:
+        stored = dict(conn.execute(
+            'SELECT id, client_name FROM proposals WHERE client_name LIKE ?', (f'{prefix}-%',)
+        ).fetchall())
+    wrong_ids = sum(1 for marker, rowid in results if stored.get(rowid) != marker)
+
+    return {
+        'inserts': len(markers),
+        'elapsed_s': round(elapsed, 3),
+        'inserts_per_s': round(len(markers) / elapsed),
+        'wrong_ids': wrong_ids
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--synchronous', default='NORMAL', choices=['NORMAL', 'FULL'])
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='pitchbot-bench-')
+    try:
+        db.configure(path=os.path.join(tmpdir, 'bench.db'), size=args.threads)
+
+        import app as backend
+        backend.init_db()
+
+        # Aplica o modo de sincronização escolhido às conexões abertas daqui em diante
+        original_open = db.open_connection
+
+        def open_connection(path=None):
+            conn = original_open(path)
+            conn.execute(f'PRAGMA synchronous={args.synchronous}')
+            return conn
+
+        db.open_connection = open_connection
+        db.configure(size=args.threads)
+
+        per_row = run(insert_per_row, 'row', args.threads, args.rows)
+        group = run(insert_group_commit, 'group', args.threads, args.rows)
+        writer_stats = dict(db.get_writer().stats)
+        db.get_writer().close()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print(json.dumps({
+        'threads': args.threads,
+        'synchronous': args.synchronous,
+        'per_row_commit': per_row,
+        'group_commit': dict(group, **writer_stats),
+        'speedup': round(per_row['elapsed_s'] / group['elapsed_s'], 2)
+    }, indent=2))
+
+    sys.exit(0 if per_row['wrong_ids'] == 0 and group['wrong_ids'] == 0 else 1)
+
+
+if __name__ == '__main__':
+    main()
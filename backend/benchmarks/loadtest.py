@@ -0,0 +1,401 @@
+"""
+Teste de carga de ponta a ponta com a OpenAI e o 99freelas falsos
+
+Sobe os servidores locais de mock_servers.py (chat completions com latência,
+taxa de tokens e streaming configuráveis; páginas do 99freelas salvas em
+benchmarks/fixtures), popula um banco novo com propostas sintéticas e
+inicia o backend em um subprocesso apontando para eles (OPENAI_API_BASE e
+FREELAS_HOST). Cada cenário roda por --duration segundos com --concurrency
+clientes:
+
+- generate:  POST /api/generate-proposal
+- stream:    POST /api/generate-proposal/stream (mede também o primeiro token)
+- extract:   POST /api/extract-99freelas (URL nova a cada requisição)
+- list:      GET /api/proposals?limit=50
+- search:    GET /api/proposals?search=...
+- projects:  criar, ler, alterar, listar e remover um projeto
+- mixed:     todos os anteriores sorteados com os pesos de MIXED_WEIGHTS
+
+O relatório em JSON traz, por operação, a taxa, as latências p50/p95/p99 e
+a taxa de erros; com --compare, também a variação em relação a um relatório
+anterior (de outra versão, por exemplo).
+
+Uso:
+    python benchmarks/loadtest.py [--server auto] [--concurrency 16] [--duration 10]
+        [--scenarios generate,list] [--output atual.json] [--compare anterior.json]
+"""
+import argparse
+import contextlib
+import datetime
+import itertools
+import json
+import logging
+import os
+import random
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures', '99freelas')
+sys.path.insert(0, BENCH_DIR)
+
+from mock_servers import FixturePageServer, MockOpenAIServer  # noqa: E402
+
+SCENARIOS = ('generate', 'stream', 'extract', 'list', 'search', 'projects', 'mixed')
+MIXED_WEIGHTS = {'list': 40, 'search': 20, 'projects': 15, 'generate': 10, 'stream': 10, 'extract': 5}
+
+# Páginas com projeto válido (as demais fixtures testam casos de erro do extrator)
+EXTRACT_PAGES = ('full_page', 'client_h2', 'nested_value', 'regex_fallbacks', 'long_paragraph')
+SEARCH_TERMS = ('loja', 'aplicativo', 'agendamento', 'integração pagamentos', 'landing', 'wordpress', 'python')
+WORDS = ('loja', 'virtual', 'aplicativo', 'delivery', 'agendamento', 'site', 'institucional', 'painel',
+         'integração', 'pagamentos', 'automação', 'planilhas', 'landing', 'page', 'wordpress', 'react',
+         'python', 'django', 'flutter', 'entrega', 'suporte', 'prazo', 'projeto', 'cliente')
+
+_local = threading.local()
+
+
+def session():
+    """Uma sessão keep-alive por thread do gerador de carga"""
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_command(name, port):
+    """Comando do backend: `dev` é o `flask run`; os demais passam por serving.py"""
+    if name == 'dev':
+        return [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(port), '--with-threads']
+    return [sys.executable, 'serving.py', '--server', name, '--port', str(port)]
+
+
+def start_server(name, port, env):
+    """Inicia o backend e espera o /api/health responder"""
+    process = subprocess.Popen(
+        server_command(name, port), cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+    )
+    base = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{name} terminou ao iniciar (código {process.returncode})')
+        try:
+            if requests.get(f'{base}/api/health', timeout=1).status_code == 200:
+                return process, base
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.1)
+    stop_server(process)
+    raise RuntimeError(f'{name} não respondeu em 30 s')
+
+
+def stop_server(process):
+    if process.poll() is None:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(latencies, errors, wall):
+    """Taxa, percentis (ms) e erros de uma operação"""
+    total = len(latencies)
+    return {
+        'requests': total,
+        'errors': errors,
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'rps': round(total / wall, 1) if wall else 0.0,
+        'p50_ms': round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        'max_ms': round(max(latencies) * 1000, 1) if latencies else None
+    }
+
+
+def seed(path, rows):
+    """Cria o banco com as migrações e grava `rows` propostas sintéticas"""
+    sys.path.insert(0, BACKEND_DIR)
+    import app as backend
+    import db
+
+    db.configure(path=path)
+    backend.init_db()
+    rng = random.Random(42)
+    start = datetime.datetime(2024, 1, 1)
+    with db.get_connection() as conn:
+        conn.executemany('''
+        INSERT INTO proposals (
+            client_name, project_description, value, deadline,
+            additional_points, custom_prompt, content, created_at, author, model
+        ) VALUES (?, pack_text(?), ?, ?, ?, ?, pack_text(?), ?, ?, ?)
+        ''', [
+            (
+                f'Cliente {i}',
+                ' '.join(rng.choices(WORDS, k=20)),
+                float(rng.randrange(500, 20000, 50)), f'{rng.choice((10, 15, 30))} dias', '', '',
+                'Prezado cliente, ' + ' '.join(rng.choices(WORDS, k=250)),
+                (start + datetime.timedelta(minutes=i)).isoformat(), 'Loadtest', 'gpt-3.5-turbo'
+            )
+            for i in range(rows)
+        ])
+        conn.commit()
+    db.get_pool().close()
+
+
+class Client:
+    """Operações de cada cenário; cada uma devolve [(operação, segundos, status)]"""
+
+    def __init__(self, base, pages):
+        self.base = base
+        self.pages = pages
+
+    def _call(self, operation, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = session().request(method, self.base + path, timeout=120, **kwargs)
+            status = response.status_code
+        except requests.RequestException as e:
+            response, status = None, e.__class__.__name__
+        return (operation, time.perf_counter() - start, status), response
+
+    def generate(self, i):
+        result, _ = self._call('generate', 'POST', '/api/generate-proposal', json=self._proposal(i))
+        return [result]
+
+    def stream(self, i):
+        start = time.perf_counter()
+        first_token = None
+        try:
+            with session().post(self.base + '/api/generate-proposal/stream', json=self._proposal(i),
+                                stream=True, timeout=120) as response:
+                status = response.status_code
+                for line in response.iter_lines():
+                    if line == b'event: error':
+                        status = 'stream_error'
+                    if first_token is None and line == b'event: token':
+                        first_token = time.perf_counter() - start
+        except requests.RequestException as e:
+            status = e.__class__.__name__
+        results = [('stream', time.perf_counter() - start, status)]
+        if first_token is not None:
+            results.append(('stream_first_token', first_token, status))
+        return results
+
+    def extract(self, i):
+        url = self.pages.page_url(EXTRACT_PAGES[i % len(EXTRACT_PAGES)], n=i)
+        result, _ = self._call('extract', 'POST', '/api/extract-99freelas', json={'url': url})
+        return [result]
+
+    def list(self, i):
+        result, _ = self._call('list', 'GET', '/api/proposals', params={'limit': 50})
+        return [result]
+
+    def search(self, i):
+        term = SEARCH_TERMS[i % len(SEARCH_TERMS)]
+        result, _ = self._call('search', 'GET', '/api/proposals', params={'search': term, 'limit': 50})
+        return [result]
+
+    def projects(self, i):
+        results = []
+        result, response = self._call('project_create', 'POST', '/api/projects', json={
+            'name': f'Projeto {i}', 'description': f'Projeto de carga número {i}'
+        })
+        results.append(result)
+        if response is None or not response.ok:
+            return results
+        project_id = response.json()['project']['id']
+        for operation, method, kwargs in (
+            ('project_get', 'GET', {}),
+            ('project_update', 'PUT', {'json': {'name': f'Projeto {i} (alterado)', 'description': 'Alterado'}}),
+        ):
+            results.append(self._call(operation, method, f'/api/projects/{project_id}', **kwargs)[0])
+        results.append(self._call('project_list', 'GET', '/api/projects')[0])
+        results.append(self._call('project_delete', 'DELETE', f'/api/projects/{project_id}')[0])
+        return results
+
+    def mixed(self, i):
+        rng = random.Random(i)
+        scenario = rng.choices(list(MIXED_WEIGHTS), weights=list(MIXED_WEIGHTS.values()))[0]
+        return getattr(self, scenario)(i)
+
+    @staticmethod
+    def _proposal(i):
+        return {
+            'clientName': f'Cliente {i}',
+            'projectDescription': f'Loja virtual com integração de pagamentos (pedido {i})',
+            'value': '2500',
+            'deadline': '20 dias',
+            'apiKey': f'sk-mock-{i % 64}'
+        }
+
+
+def run_scenario(client, scenario, concurrency, duration, counter):
+    """Roda o cenário com `concurrency` threads por `duration` segundos"""
+    call = getattr(client, scenario)
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    lock = threading.Lock()
+
+    def worker(deadline):
+        while time.perf_counter() < deadline:
+            results = call(next(counter))
+            with lock:
+                for operation, elapsed, status in results:
+                    latencies[operation].append(elapsed)
+                    statuses[operation][str(status)] += 1
+
+    def run(threads):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    # Aquecimento (imports tardios, sessões HTTP e pools do backend), fora da medição
+    run([threading.Thread(target=lambda: call(next(counter))) for _ in range(concurrency)])
+
+    start = time.perf_counter()
+    run([threading.Thread(target=worker, args=(start + duration,)) for _ in range(concurrency)])
+    wall = time.perf_counter() - start
+
+    report = {}
+    for operation, values in sorted(latencies.items()):
+        errors = sum(count for status, count in statuses[operation].items()
+                     if not (status.isdigit() and int(status) < 400))
+        report[operation] = dict(summarize(values, errors, wall), status=dict(statuses[operation]))
+    return report
+
+
+def compare(current, baseline):
+    """Variação (%) de taxa e latências em relação a um relatório anterior"""
+    changes = {}
+    for scenario, operations in current['scenarios'].items():
+        for operation, stats in operations.items():
+            previous = baseline.get('scenarios', {}).get(scenario, {}).get(operation)
+            if not previous:
+                continue
+            changes[f'{scenario}.{operation}'] = {
+                key: round((stats[key] - previous[key]) / previous[key] * 100, 1)
+                for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms')
+                if stats.get(key) is not None and previous.get(key)
+            }
+            changes[f'{scenario}.{operation}']['error_rate'] = round(stats['error_rate'] - previous['error_rate'], 4)
+    return changes
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--server', default='auto', choices=('auto', 'dev', 'gunicorn', 'waitress'))
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10, help='segundos por cenário')
+    parser.add_argument('--rows', type=int, default=10000, help='propostas no banco antes da carga')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='segundos até o primeiro token')
+    parser.add_argument('--llm-tokens-per-second', type=float, default=50)
+    parser.add_argument('--llm-tokens', type=int, default=200, help='tokens por resposta')
+    parser.add_argument('--page-latency', type=float, default=0.1, help='latência das páginas do 99freelas')
+    parser.add_argument('--host-delay', type=float, default=0.0,
+                        help='FREELAS_HOST_DELAY do backend (0 mede a capacidade, sem o intervalo de cortesia)')
+    parser.add_argument('--workers', type=int, default=None, help='WEB_WORKERS do backend')
+    parser.add_argument('--threads', type=int, default=None, help='WEB_THREADS do backend')
+    parser.add_argument('--output', help='grava o relatório neste arquivo além de imprimir')
+    parser.add_argument('--compare', help='relatório anterior para calcular a variação')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'cenários desconhecidos: {", ".join(sorted(unknown))}')
+
+    logging.getLogger('urllib3').setLevel(logging.ERROR)
+    tmpdir = tempfile.mkdtemp(prefix='pitchbot-loadtest-')
+    report = {
+        'revision': git_revision(),
+        'started_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'cpus': os.cpu_count(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'scenarios': {}
+    }
+    try:
+        path = os.path.join(tmpdir, 'loadtest.db')
+        # As mensagens das migrações não podem se misturar ao JSON da saída
+        with contextlib.redirect_stdout(sys.stderr):
+            seed(path, args.rows)
+
+        with MockOpenAIServer(latency=args.llm_latency, tokens_per_second=args.llm_tokens_per_second,
+                              completion_tokens=args.llm_tokens) as llm_mock, \
+                FixturePageServer(FIXTURES_DIR, latency=args.page_latency) as pages:
+            env = dict(
+                os.environ,
+                PITCHBOT_DB_PATH=path,
+                OPENAI_API_BASE=llm_mock.url,
+                FREELAS_HOST='127.0.0.1',
+                FREELAS_HOST_DELAY=str(args.host_delay),
+                JOB_WORKERS='0'
+            )
+            if args.workers:
+                env['WEB_WORKERS'] = str(args.workers)
+            if args.threads:
+                env['WEB_THREADS'] = str(args.threads)
+
+            process, base = start_server(args.server, free_port(), env)
+            try:
+                client = Client(base, pages)
+                counter = itertools.count()
+                for scenario in scenarios:
+                    report['scenarios'][scenario] = run_scenario(
+                        client, scenario, args.concurrency, args.duration, counter
+                    )
+            finally:
+                stop_server(process)
+
+            report['upstream'] = {
+                'openai_requests': llm_mock.requests,
+                'openai_peak_concurrency': llm_mock.peak_active,
+                'freelas_requests': pages.requests,
+                'freelas_peak_concurrency': pages.peak_active
+            }
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            report['compared_to'] = {'file': args.compare, 'changes_pct': compare(report, json.load(f))}
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
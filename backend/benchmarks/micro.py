@@ -0,0 +1,226 @@
+"""
+Micro-benchmarks das funções quentes, com baseline e limite de regressão
+
+Mede, no próprio processo e sem servidor HTTP:
+
+- extract.*:   extractor.extract_project_data nas páginas de benchmarks/fixtures
+- prompts.*:   build_prompts + chave do cache (o trabalho de generate_with_openai
+               antes da chamada à OpenAI), com descrição curta e longa
+- proposals.*: get_proposals (SQL + linhas em dicts), o jsonify de uma página
+               e a view de /api/proposals sem o cache de respostas
+- search.*:    search_proposals com termos comuns, dois termos, termo seletivo,
+               ordenação BM25 e trechos destacados
+
+As funções de banco rodam em bancos SQLite sintéticos de 1k, 10k e 100k
+propostas (--sizes). Cada medida é o menor tempo por chamada entre
+--repeat rodadas de pelo menos --min-time segundos.
+
+Os resultados são comparados com o baseline (benchmarks/baselines/micro.json):
+qualquer benchmark mais lento que o baseline além de --threshold (25% por
+padrão), mesmo depois de --retries novas medidas, é listado em `regressions`
+e o script sai com código 1. --save grava
+os resultados atuais como o novo baseline. Baselines só são comparáveis na
+mesma máquina: gere um na máquina da CI antes de usar o limite.
+
+Uso:
+    python benchmarks/micro.py [--sizes 1000,10000,100000] [--filter search] [--save]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures', '99freelas')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baselines', 'micro.json')
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+os.environ.setdefault('JOB_WORKERS', '0')
+
+import app as backend  # noqa: E402
+import db  # noqa: E402
+import llm_cache  # noqa: E402
+from flask import jsonify  # noqa: E402
+from loadtest import seed  # noqa: E402
+
+EXTRACT_PAGES = ('full_page', 'long_paragraph', 'regex_fallbacks')
+
+SHORT_PROPOSAL = {
+    'clientName': 'Maria Souza',
+    'projectDescription': 'Loja virtual em WooCommerce com integração de pagamentos e frete.',
+    'value': '3500',
+    'deadline': '30 dias',
+    'additionalPoints': 'Suporte de 30 dias',
+    'customPrompt': ''
+}
+# Descrição acima do orçamento de tokens: passa pelo corte do PromptBuilder
+LONG_PROPOSAL = dict(
+    SHORT_PROPOSAL,
+    projectDescription=' '.join(['Sistema de agendamento com painel administrativo, '
+                                 'notificações por e-mail e integração com o Google Agenda.'] * 400)
+)
+
+SEARCHES = {
+    'common': {'search_term': 'loja'},
+    'two_terms': {'search_term': 'integração pagamentos'},
+    'selective': {'search_term': 'Cliente 123'},
+    'bm25': {'search_term': 'wordpress', 'rank': True},
+    'highlight': {'search_term': 'loja', 'highlight': True}
+}
+
+
+def _loop(func, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - start
+
+
+def measure(func, min_time, repeat):
+    """Menor tempo por chamada (µs) entre `repeat` rodadas de pelo menos `min_time` s"""
+    func()  # aquecimento (caches, imports tardios)
+    number = 1
+    while (elapsed := _loop(func, number)) < min_time:
+        number *= 2
+
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        best = min(best, _loop(func, number) / number)
+    return best * 1e6, number
+
+
+def cpu_benchmarks():
+    from extractor import extract_project_data
+
+    for name in EXTRACT_PAGES:
+        with open(os.path.join(FIXTURES_DIR, f'{name}.html'), encoding='utf-8') as f:
+            html = f.read()
+        yield f'extract.{name}', lambda html=html: extract_project_data(html)
+
+    def prompt(data):
+        built = backend.build_prompts(data)
+        return llm_cache.make_key(built.model, backend.GENERATION_TEMPERATURE, built.system_prompt, built.prompt)
+
+    yield 'prompts.short', lambda: prompt(SHORT_PROPOSAL)
+    yield 'prompts.long', lambda: prompt(LONG_PROPOSAL)
+
+
+def database_benchmarks(application, size):
+    page = backend.get_proposals(limit=50)
+
+    yield f'proposals.get_proposals@{size}', lambda: backend.get_proposals(limit=51)
+
+    def serialize():
+        with application.app_context():
+            return jsonify({'success': True, 'proposals': page}).get_data()
+
+    yield f'proposals.jsonify_page@{size}', serialize
+
+    view = backend.list_proposals.__wrapped__  # sem o cache de respostas
+
+    def list_view():
+        with application.test_request_context('/api/proposals?limit=50'):
+            return view().get_data()
+
+    yield f'proposals.list_view@{size}', list_view
+
+    for name, kwargs in SEARCHES.items():
+        yield f'search.{name}@{size}', lambda kwargs=kwargs: backend.search_proposals(limit=51, **kwargs)
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def machine():
+    return {'python': sys.version.split()[0], 'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--filter', default='', help='só os benchmarks cujo nome contém este texto')
+    parser.add_argument('--min-time', type=float, default=0.1)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--threshold', type=float, default=0.25, help='regressão tolerada (0.25 = 25%%)')
+    parser.add_argument('--retries', type=int, default=2,
+                        help='novas medidas de um benchmark acima do limite antes de contá-lo como regressão')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save', action='store_true', help='grava os resultados como o novo baseline')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    baseline = load_baseline(args.baseline)
+    limits = {
+        name: previous['us'] * (1 + args.threshold)
+        for name, previous in (baseline or {}).get('benchmarks', {}).items()
+    }
+    results = {}
+
+    def run(benchmarks):
+        for name, func in benchmarks:
+            if args.filter not in name:
+                continue
+            us, number = measure(func, args.min_time, args.repeat)
+            # Uma medida acima do limite pode ser ruído da máquina: mede de novo antes de acusar
+            for _ in range(args.retries if not args.save else 0):
+                if us <= limits.get(name, float('inf')):
+                    break
+                us = min(us, measure(func, args.min_time, args.repeat)[0])
+            results[name] = {'us': round(us, 2), 'loops': number}
+            print(f'{name:40s} {us:12.1f} µs', file=sys.stderr)
+
+    tmpdir = tempfile.mkdtemp(prefix='pitchbot-micro-')
+    try:
+        # As mensagens das migrações e do tokenizer vão para o stderr, longe do JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            run(cpu_benchmarks())
+            for size in sizes:
+                path = os.path.join(tmpdir, f'{size}.db')
+                start = time.perf_counter()
+                seed(path, size)
+                print(f'banco com {size} propostas em {time.perf_counter() - start:.1f} s', file=sys.stderr)
+                db.configure(path=path)
+                application = backend.create_app(start_jobs=False)
+                run(database_benchmarks(application, size))
+                db.get_pool().close()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    report = {'machine': machine(), 'threshold': args.threshold, 'benchmarks': results, 'regressions': []}
+    if baseline:
+        report['baseline_machine'] = baseline.get('machine')
+        for name, result in results.items():
+            previous = baseline['benchmarks'].get(name)
+            if not previous:
+                continue
+            result['baseline_us'] = previous['us']
+            result['ratio'] = round(result['us'] / previous['us'], 3)
+            if result['ratio'] > 1 + args.threshold:
+                report['regressions'].append(name)
+
+    if args.save:
+        # Mantém os benchmarks que não rodaram agora (--filter, --sizes)
+        saved = (baseline or {}).get('benchmarks', {})
+        saved.update({name: {'us': result['us']} for name, result in results.items()})
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'machine': machine(), 'benchmarks': dict(sorted(saved.items()))}, f, indent=2)
+            f.write('\n')
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    sys.exit(1 if report['regressions'] and not args.save else 0)
+
+
+if __name__ == '__main__':
+    main()
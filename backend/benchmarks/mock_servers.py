@@ -0,0 +1,250 @@
+"""
+Servidores locais que substituem serviços externos nos benchmarks
+
+MockOpenAIServer imita POST /chat/completions (com e sem streaming) com
+latência e velocidade de geração configuráveis, sem consumir tokens reais.
+FixturePageServer serve as páginas salvas em benchmarks/fixtures/99freelas
+como se fossem projetos do 99freelas.
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+MOCK_TEXT = (
+    'Prezado {b}Cliente{/b}, tudo bem? Analisei o seu projeto com atenção e '
+    'desenvolverei a solução utilizando a metodologia {i}ágil{/i}, com entregas '
+    'semanais e {u}comunicação constante{/u}. '
+)
+
+
+class _LocalServer:
+    """Servidor HTTP local em uma thread, usado como context manager"""
+
+    def __init__(self):
+        self.requests = 0
+        self.active = 0
+        self.peak_active = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._server.server_port}'
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _enter(self):
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+
+    def _leave(self):
+        with self._lock:
+            self.active -= 1
+
+    def _handler(self):
+        raise NotImplementedError
+
+
+class MockOpenAIServer(_LocalServer):
+    """API de chat falsa com latência e taxa de tokens configuráveis
+
+    - latency: segundos até o primeiro token
+    - tokens_per_second: velocidade de geração (0 = instantâneo)
+    - completion_tokens: quantidade de tokens de cada resposta
+    - fail_requests / fail_status: as primeiras `fail_requests` requisições
+      respondem com o status de erro informado (ex.: 429)
+    """
+
+    def __init__(self, latency=0.5, tokens_per_second=0, completion_tokens=50,
+                 fail_requests=0, fail_status=429):
+        super().__init__()
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.fail_requests = fail_requests
+        self.fail_status = fail_status
+        self.cancelled = 0
+
+    def _tokens(self):
+        words = MOCK_TEXT.split(' ')
+        return [words[i % len(words)] + ' ' for i in range(self.completion_tokens)]
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+
+                mock._enter()
+                try:
+                    with mock._lock:
+                        fail = mock.requests <= mock.fail_requests
+                    time.sleep(mock.latency)
+                    if fail:
+                        self._error()
+                    elif body.get('stream'):
+                        self._stream(body)
+                    else:
+                        self._complete(body)
+                finally:
+                    mock._leave()
+
+            def _usage(self, body):
+                prompt_chars = sum(len(m.get('content', '')) for m in body.get('messages', []))
+                return {
+                    'prompt_tokens': prompt_chars // 4,
+                    'completion_tokens': mock.completion_tokens,
+                    'total_tokens': prompt_chars // 4 + mock.completion_tokens
+                }
+
+            def _error(self):
+                payload = json.dumps({
+                    'error': {'message': f'Mock error {mock.fail_status}', 'type': 'mock_error'}
+                }).encode('utf-8')
+                self.send_response(mock.fail_status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _complete(self, body):
+                if mock.tokens_per_second:
+                    time.sleep(mock.completion_tokens / mock.tokens_per_second)
+
+                payload = json.dumps({
+                    'id': 'chatcmpl-mock',
+                    'object': 'chat.completion',
+                    'model': body.get('model'),
+                    'choices': [{
+                        'index': 0,
+                        'message': {'role': 'assistant', 'content': ''.join(mock._tokens())},
+                        'finish_reason': 'stop'
+                    }],
+                    'usage': self._usage(body)
+                }).encode('utf-8')
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _chunk(self, data):
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                self.wfile.flush()
+
+            def _stream(self, body):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+
+                delay = 1 / mock.tokens_per_second if mock.tokens_per_second else 0
+                try:
+                    for token in mock._tokens():
+                        event = {
+                            'object': 'chat.completion.chunk',
+                            'model': body.get('model'),
+                            'choices': [{'index': 0, 'delta': {'content': token}}]
+                        }
+                        self._chunk(f'data: {json.dumps(event)}\n\n'.encode('utf-8'))
+                        if delay:
+                            time.sleep(delay)
+                    if (body.get('stream_options') or {}).get('include_usage'):
+                        event = {'object': 'chat.completion.chunk', 'choices': [], 'usage': self._usage(body)}
+                        self._chunk(f'data: {json.dumps(event)}\n\n'.encode('utf-8'))
+                    self._chunk(b'data: [DONE]\n\n')
+                    self.wfile.write(b'0\r\n\r\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    with mock._lock:
+                        mock.cancelled += 1
+                    self.close_connection = True
+
+        return Handler
+
+
+class FixturePageServer(_LocalServer):
+    """Serve páginas HTML salvas em GET /project/<nome>
+
+    - directory: pasta com os arquivos <nome>.html
+    - latency: segundos de espera antes de cada resposta
+
+    A query string é ignorada, então `/project/full_page?n=1` e `?n=2` são
+    URLs distintas (para o cache) com o mesmo conteúdo. Nomes desconhecidos
+    respondem 404. `request_times` guarda o instante (monotonic) de chegada
+    de cada requisição.
+    """
+
+    def __init__(self, directory, latency=0.0):
+        super().__init__()
+        self.directory = directory
+        self.latency = latency
+        self.request_times = []
+
+    def page_url(self, name, **query):
+        url = f'{self.url}/project/{name}'
+        if query:
+            url += '?' + '&'.join(f'{key}={value}' for key, value in query.items())
+        return url
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with mock._lock:
+                    mock.request_times.append(time.monotonic())
+                mock._enter()
+                try:
+                    time.sleep(mock.latency)
+                    path = urlsplit(self.path).path
+                    name = os.path.basename(path) if path.startswith('/project/') else ''
+                    file_path = os.path.join(mock.directory, f'{name}.html')
+                    if not name or not os.path.isfile(file_path):
+                        self._send(404, b'Not found', 'text/plain')
+                        return
+                    with open(file_path, 'rb') as f:
+                        self._send(200, f.read(), 'text/html; charset=utf-8')
+                finally:
+                    mock._leave()
+
+            def _send(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
@@ -0,0 +1,410 @@
+"""
+Compressão transparente do texto das propostas e das respostas HTTP
+
+Armazenamento: `content` e `project_description` são gravados como BLOB
+com deflate (zlib) usando um dicionário treinado com as próprias propostas
+(saudações, assinatura, tags {b}/{i}/{u} e frases recorrentes), o que
+rende bem mais que o deflate puro em textos curtos. Cada BLOB começa com um
+cabeçalho de 5 bytes: versão do formato e id do dicionário (o adler32 dele,
+o mesmo DICTID do zlib). Os dicionários ficam na tabela `text_dictionaries`
+e nunca são alterados; treinar de novo cria um dicionário novo.
+
+Valores TEXT (curtos demais para compensar, ou gravados com a compressão
+desligada) são lidos como estão, então cada linha decide seu formato pelo
+tipo do valor. Em SQL, as funções `pack_text()` e `unpack_text()` são
+registradas em todas as conexões (register), e o índice FTS5 lê o texto
+pela view `proposals_fts_source`, que já devolve as colunas descomprimidas.
+
+HTTP: respostas JSON e de texto a partir de HTTP_COMPRESSION_MIN_SIZE bytes
+são enviadas em brotli (se o pacote `brotli` estiver instalado) ou gzip,
+conforme o Accept-Encoding do cliente.
+"""
+import collections
+import datetime
+import heapq
+import os
+import sqlite3
+import struct
+import threading
+import zlib
+
+from flask import request
+
+import instrumentation
+
+try:
+    import brotli
+except ImportError:  # dependência opcional (Content-Encoding: br)
+    brotli = None
+
+# Armazenamento ---------------------------------------------------------------
+
+STORAGE_COMPRESSION = os.environ.get('PITCHBOT_STORAGE_COMPRESSION', '1') != '0'
+# Textos menores que isso (em caracteres) ficam como TEXT
+STORAGE_COMPRESSION_MIN_SIZE = int(os.environ.get('STORAGE_COMPRESSION_MIN_SIZE', '64'))
+STORAGE_COMPRESSION_LEVEL = 9
+
+COMPRESSED_COLUMNS = ('project_description', 'content')
+
+# Versão do formato e id do dicionário (0 = deflate sem dicionário)
+HEADER = struct.Struct('>BI')
+FORMAT_DEFLATE = 1
+
+# Janela do deflate: bytes do dicionário além disso nunca são referenciados
+DICTIONARY_SIZE = 32 * 1024
+# Treino: propostas mais recentes usadas e tamanho dos trechos avaliados
+TRAINING_SAMPLES = 2000
+TRAINING_MAX_BYTES = 2 * 1024 * 1024
+MIN_TRAINING_SAMPLES = 20
+DMER_SIZE = 8
+SEGMENT_SIZE = 256
+
+# Dicionário inicial, usado enquanto não há propostas suficientes para treinar
+SEED_TEXT = """Prezado cliente, tudo bem? Prezada cliente, tudo bem?
+
+Agradeço a oportunidade de apresentar esta proposta para o seu projeto. Analisei com atenção a descrição e entendi que o objetivo é {b}desenvolver uma solução{/b} que atenda às suas necessidades com {i}qualidade{/i}, {i}agilidade{/i} e {u}segurança{/u}.
+
+Como {b}freelancer{/b}, eu serei responsável por todas as etapas do trabalho: levantamento dos requisitos, planejamento, desenvolvimento, testes e entrega final. Utilizarei a metodologia {i}ágil{/i}, com entregas parciais para que você acompanhe a evolução do projeto e possa sugerir ajustes.
+
+{b}O que será entregue:{/b}
+
+- {b}Desenvolvimento completo{/b} conforme o escopo descrito
+- {i}Testes{/i} e correções antes da entrega
+- {u}Suporte{/u} após a entrega para ajustes e dúvidas
+- Documentação e orientações de uso
+
+O prazo para a entrega será de {b}30 dias úteis{/b}, contados a partir da aprovação da proposta e do recebimento dos materiais necessários. É {u}imprescindível{/u} que as informações e os acessos sejam fornecidos no início do projeto.
+
+O investimento total para este projeto é de {b}R$ {/b}, com pagamento pela plataforma 99freelas, garantindo {i}segurança{/i} para ambas as partes.
+
+Fico à disposição para esclarecer qualquer dúvida e ajustar a proposta conforme a sua necessidade. Caso esteja de acordo, podemos dar início ao projeto imediatamente.
+
+Atenciosamente,
+"""
+
+
+def train_dictionary(samples, size=DICTIONARY_SIZE):
+    """Monta um dicionário de deflate com os trechos mais repetidos das amostras
+
+    Versão simplificada do algoritmo COVER do zstd: os textos são divididos
+    em trechos de SEGMENT_SIZE bytes, cada trecho vale a soma das frequências
+    (em quantas amostras aparecem) das suas sequências de DMER_SIZE bytes
+    ainda não cobertas, e os melhores trechos são escolhidos até encher o
+    dicionário. Os mais valiosos ficam no final, mais perto do texto, onde
+    as referências do deflate custam menos bits.
+    """
+    data = []
+    total = 0
+    for sample in samples:
+        encoded = sample.encode('utf-8')
+        if total + len(encoded) > TRAINING_MAX_BYTES:
+            break
+        data.append(encoded)
+        total += len(encoded)
+
+    # Frequência de cada sequência = em quantas amostras ela aparece
+    frequency = collections.Counter()
+    candidates = []
+    for encoded in data:
+        sample_dmers = set()
+        for start in range(0, len(encoded), SEGMENT_SIZE):
+            segment = encoded[start:start + SEGMENT_SIZE]
+            dmers = {segment[i:i + DMER_SIZE] for i in range(len(segment) - DMER_SIZE + 1)}
+            sample_dmers |= dmers
+            candidates.append((segment, dmers))
+        frequency.update(sample_dmers)
+
+    segments = []
+    for segment, dmers in candidates:
+        dmers = {dmer for dmer in dmers if frequency[dmer] > 1}
+        if dmers:
+            segments.append((segment, dmers))
+
+    covered = set()
+
+    def score(dmers):
+        return sum(frequency[dmer] for dmer in dmers if dmer not in covered)
+
+    # Guloso com avaliação preguiçosa: a nota de um trecho só diminui
+    heap = [(-score(dmers), index) for index, (_, dmers) in enumerate(segments)]
+    heapq.heapify(heap)
+    chosen = []
+    length = 0
+    while heap and length < size:
+        _, index = heapq.heappop(heap)
+        segment, dmers = segments[index]
+        current = score(dmers)
+        if current <= 0:
+            continue
+        if heap and current < -heap[0][0]:
+            heapq.heappush(heap, (-current, index))
+            continue
+        chosen.append(segment)
+        covered.update(dmers)
+        length += len(segment)
+
+    return b''.join(reversed(chosen))[-size:]
+
+
+class DictionaryStore:
+    """Dicionários conhecidos pelo processo, pelo id (o adler32 do conteúdo)
+
+    Como o id vem do conteúdo, o mesmo dicionário serve a qualquer banco, e
+    a descompressão não depende de qual banco gravou o texto.
+    """
+
+    def __init__(self):
+        self._dictionaries = {}
+        self._compressors = {}
+        self._lock = threading.Lock()
+
+    def add(self, dictionary):
+        """Registra um dicionário no processo e retorna o id dele"""
+        dictionary_id = zlib.adler32(dictionary)
+        with self._lock:
+            if dictionary_id not in self._dictionaries:
+                self._dictionaries[dictionary_id] = dictionary
+                # Compressor já carregado com o dicionário; cada texto usa uma cópia
+                compressor = zlib.compressobj(
+                    STORAGE_COMPRESSION_LEVEL, zlib.DEFLATED, -15, 9,
+                    zlib.Z_DEFAULT_STRATEGY, dictionary
+                )
+                self._compressors[dictionary_id] = compressor
+        return dictionary_id
+
+    def compressor(self, dictionary_id):
+        return self._compressors[dictionary_id].copy()
+
+    def get(self, dictionary_id, paths):
+        """Dicionário pelo id, procurando nos bancos `paths` os que ainda não foram carregados"""
+        dictionary = self._dictionaries.get(dictionary_id)
+        for path in paths:
+            if dictionary is not None:
+                break
+            # Dicionário treinado por outro processo (db_utils.py compress) depois da carga
+            conn = sqlite3.connect(path)
+            try:
+                row = conn.execute(
+                    'SELECT data FROM text_dictionaries WHERE id = ?', (dictionary_id,)
+                ).fetchone()
+            except sqlite3.OperationalError:
+                row = None
+            finally:
+                conn.close()
+            if row is not None:
+                self.add(row[0])
+                dictionary = row[0]
+        if dictionary is None:
+            raise ValueError(f'Dicionário de compressão {dictionary_id:08x} não encontrado')
+        return dictionary
+
+
+dictionaries = DictionaryStore()
+
+
+class TextCodec:
+    """Comprime os textos de um banco com o dicionário mais recente dele
+
+    Há um codec por arquivo de banco (codec_for), então dois bancos abertos
+    no mesmo processo não trocam o dicionário de gravação um do outro.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.dictionary_id = 0
+
+    def load(self, conn):
+        """Carrega os dicionários do banco; o mais recente passa a ser usado na gravação"""
+        try:
+            rows = conn.execute(
+                'SELECT data FROM text_dictionaries ORDER BY created_at, rowid'
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return self.dictionary_id  # banco ainda sem a migração da tabela
+        for (data,) in rows:
+            self.dictionary_id = dictionaries.add(data)
+        return self.dictionary_id
+
+    def compress(self, text):
+        """BLOB comprimido, ou o próprio texto se não compensar"""
+        if not STORAGE_COMPRESSION or not isinstance(text, str) or len(text) < STORAGE_COMPRESSION_MIN_SIZE:
+            return text
+        raw = text.encode('utf-8')
+        dictionary_id = self.dictionary_id
+        if dictionary_id:
+            compressor = dictionaries.compressor(dictionary_id)
+        else:
+            compressor = zlib.compressobj(STORAGE_COMPRESSION_LEVEL, zlib.DEFLATED, -15)
+        packed = HEADER.pack(FORMAT_DEFLATE, dictionary_id) + compressor.compress(raw) + compressor.flush()
+        return packed if len(packed) < len(raw) else text
+
+    def decompress(self, value):
+        """Texto original de um valor lido deste banco (TEXT passa direto)"""
+        return decompress(value, [self.path] if self.path else [])
+
+
+_codecs = {}  # caminho absoluto do banco -> TextCodec
+_codecs_lock = threading.Lock()
+
+
+def database_path(conn):
+    """Caminho absoluto do banco principal da conexão (None para bancos em memória)"""
+    path = conn.execute('PRAGMA database_list').fetchone()[2]
+    return os.path.abspath(path) if path else None
+
+
+def codec_for(path):
+    """Codec do banco em `path` (um novo a cada chamada para bancos em memória)"""
+    if not path:
+        return TextCodec()
+    path = os.path.abspath(path)
+    with _codecs_lock:
+        codec = _codecs.get(path)
+        if codec is None:
+            codec = _codecs[path] = TextCodec(path)
+        return codec
+
+
+def decompress(value, paths=None):
+    """Texto original de um valor lido do banco (TEXT passa direto)
+
+    Um dicionário desconhecido é procurado nos bancos `paths` ou, sem eles,
+    em todos os bancos já abertos pelo processo.
+    """
+    if not isinstance(value, bytes):
+        return value
+    version, dictionary_id = HEADER.unpack_from(value)
+    if version != FORMAT_DEFLATE:
+        raise ValueError(f'Formato de compressão desconhecido: {version}')
+    if dictionary_id:
+        if paths is None:
+            with _codecs_lock:
+                paths = list(_codecs)
+        decompressor = zlib.decompressobj(-15, dictionaries.get(dictionary_id, paths))
+    else:
+        decompressor = zlib.decompressobj(-15)
+    return (decompressor.decompress(value[HEADER.size:]) + decompressor.flush()).decode('utf-8')
+
+
+def decode_row(row):
+    """Descomprime as colunas de texto de uma proposta (dict) no lugar"""
+    for column in COMPRESSED_COLUMNS:
+        value = row.get(column)
+        if isinstance(value, bytes):
+            row[column] = decompress(value)
+    return row
+
+
+def register(conn):
+    """Carrega os dicionários do banco e registra pack_text/unpack_text na conexão
+
+    Toda conexão que grava em `proposals` precisa das funções, porque os
+    triggers do índice de busca usam unpack_text(). pack_text() depende do
+    dicionário atual do banco, que muda a cada treino, então não é
+    registrada como determinística.
+    """
+    codec = codec_for(database_path(conn))
+    codec.load(conn)
+    conn.create_function('pack_text', 1, codec.compress)
+    conn.create_function('unpack_text', 1, codec.decompress, deterministic=True)
+
+
+def save_dictionary(conn, dictionary, samples):
+    """Grava um dicionário novo e passa a usá-lo nas próximas gravações do banco"""
+    dictionary_id = dictionaries.add(dictionary)
+    conn.execute('''
+    INSERT OR IGNORE INTO text_dictionaries (id, data, samples, created_at)
+    VALUES (?, ?, ?, ?)
+    ''', (dictionary_id, dictionary, samples, datetime.datetime.now().isoformat()))
+    codec_for(database_path(conn)).dictionary_id = dictionary_id
+    return dictionary_id
+
+
+def training_samples(conn, limit=TRAINING_SAMPLES):
+    """Textos das propostas mais recentes, já descomprimidos"""
+    rows = conn.execute(
+        'SELECT project_description, content FROM proposals ORDER BY id DESC LIMIT ?', (limit,)
+    ).fetchall()
+    path = database_path(conn)
+    paths = [path] if path else []
+    samples = []
+    for description, content in rows:
+        samples.append(decompress(content, paths))
+        samples.append(decompress(description, paths))
+    return samples
+
+
+def train(conn):
+    """Treina e grava um dicionário com as propostas do banco (ou o inicial)
+
+    Retorna (id do dicionário, quantidade de propostas usadas no treino).
+    """
+    samples = training_samples(conn)
+    if len(samples) // 2 < MIN_TRAINING_SAMPLES:
+        dictionary = train_dictionary([SEED_TEXT] * 2 + samples) or SEED_TEXT.encode('utf-8')
+    else:
+        dictionary = train_dictionary(samples)
+    return save_dictionary(conn, dictionary, len(samples) // 2), len(samples) // 2
+
+
+# HTTP ------------------------------------------------------------------------
+
+HTTP_COMPRESSION = os.environ.get('HTTP_COMPRESSION', '1') != '0'
+HTTP_COMPRESSION_MIN_SIZE = int(os.environ.get('HTTP_COMPRESSION_MIN_SIZE', '1024'))
+HTTP_COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'image/svg+xml')
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def choose_encoding(accept_encodings):
+    """`br`, `gzip` ou None, pela qualidade que o cliente deu a cada um"""
+    gzip_quality = accept_encodings.quality('gzip')
+    if brotli is not None:
+        brotli_quality = accept_encodings.quality('br')
+        if brotli_quality > 0 and brotli_quality >= gzip_quality:
+            return 'br'
+    return 'gzip' if gzip_quality > 0 else None
+
+
+def encode_body(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _compressible(response):
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in HTTP_COMPRESSIBLE_TYPES
+
+
+def compress_response(response):
+    """after_request: comprime o corpo conforme o Accept-Encoding
+
+    Respostas em streaming (SSE, exportação) e as que já têm
+    Content-Encoding passam sem alteração.
+    """
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers or not _compressible(response)):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < HTTP_COMPRESSION_MIN_SIZE:
+        return response
+
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    with instrumentation.span('compress'):
+        response.set_data(encode_body(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    """Registra a compressão das respostas no app (se HTTP_COMPRESSION não for 0)"""
+    if HTTP_COMPRESSION:
+        app.after_request(compress_response)
@@ -0,0 +1,349 @@
+"""
+Camada de conexões SQLite compartilhada pelas rotas do backend
+
+As conexões são abertas uma única vez, ajustadas com os PRAGMAs de
+desempenho (WAL, synchronous=NORMAL, mmap e cache) e reutilizadas entre
+requisições através de um pool com espera limitada.
+
+As inserções de propostas passam por um GroupCommitWriter: uma thread com
+conexão própria que grava em uma única transação todas as inserções que
+chegaram enquanto o commit anterior estava em andamento, devolvendo a cada
+chamador o id da sua linha.
+"""
+import contextlib
+import os
+import queue
+import sqlite3
+import threading
+# No Python < 3.11 o timeout de Future.result() não é o TimeoutError embutido
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import compression
+import instrumentation
+
+# Caminho do banco de dados (pode ser sobrescrito pela variável de ambiente)
+DB_PATH = os.environ.get(
+    'PITCHBOT_DB_PATH',
+    os.path.join(os.path.dirname(__file__), 'proposals.db')
+)
+
+# Configuração do pool de conexões
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '5'))
+
+# Ajustes aplicados em cada conexão no momento da abertura
+BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', '5000'))
+MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', str(64 * 1024)))
+
+# Group commit das inserções
+WRITER_MAX_BATCH = int(os.environ.get('DB_WRITER_MAX_BATCH', '256'))
+WRITER_TIMEOUT = float(os.environ.get('DB_WRITER_TIMEOUT', '30'))
+
+
+class PoolTimeout(Exception):
+    """Nenhuma conexão ficou livre dentro do tempo de espera do pool"""
+
+
+class WriterTimeout(PoolTimeout):
+    """A inserção não foi confirmada pelo writer dentro do tempo de espera"""
+
+
+def open_connection(path=None):
+    """Abre uma conexão nova já ajustada para uso concorrente"""
+    conn = sqlite3.connect(
+        path or DB_PATH,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,  # a conexão circula entre threads, mas nunca em duas ao mesmo tempo
+        factory=instrumentation.connection_factory()
+    )
+    conn.row_factory = sqlite3.Row
+
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+    conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KB}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA foreign_keys=ON')
+
+    # pack_text/unpack_text, usadas pelos triggers da busca (ver compression.py)
+    compression.register(conn)
+
+    return conn
+
+
+class ConnectionPool:
+    """Pool de conexões SQLite com tamanho máximo e espera limitada"""
+
+    def __init__(self, path, size=None, timeout=None):
+        self.path = path
+        self.size = size or POOL_SIZE
+        self.timeout = POOL_TIMEOUT if timeout is None else timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._pid = os.getpid()
+
+    def acquire(self, timeout=None):
+        """Obtém uma conexão do pool, abrindo uma nova se houver vaga"""
+        wait = self.timeout if timeout is None else timeout
+        if not self._slots.acquire(timeout=wait):
+            raise PoolTimeout(
+                f'Nenhuma conexão disponível após {wait:.1f}s (pool com {self.size} conexões)'
+            )
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        try:
+            return open_connection(self.path)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn, discard=False):
+        """Devolve a conexão ao pool, descartando transações pendentes"""
+        try:
+            if discard:
+                conn.close()
+                return
+
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+        except sqlite3.Error:
+            # Conexão em estado inválido: fecha e libera a vaga para uma nova
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Fecha todas as conexões ociosas"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Retorna o pool do processo atual, recriando-o após um fork"""
+    global _pool
+
+    pool = _pool
+    if pool is not None and pool.path == DB_PATH and pool._pid == os.getpid():
+        return pool
+
+    with _pool_lock:
+        if _pool is None or _pool.path != DB_PATH or _pool._pid != os.getpid():
+            # Conexões herdadas de outro processo não podem ser reutilizadas
+            if _pool is not None and _pool._pid == os.getpid():
+                _pool.close()
+            _pool = ConnectionPool(DB_PATH)
+        return _pool
+
+
+def configure(path=None, size=None, timeout=None):
+    """Reconfigura o caminho e o tamanho do pool (usado por scripts e benchmarks)"""
+    global DB_PATH, POOL_SIZE, POOL_TIMEOUT, _pool
+
+    with _pool_lock:
+        if path is not None:
+            DB_PATH = path
+        if size is not None:
+            POOL_SIZE = size
+        if timeout is not None:
+            POOL_TIMEOUT = timeout
+
+        if _pool is not None and _pool._pid == os.getpid():
+            _pool.close()
+        _pool = ConnectionPool(DB_PATH, POOL_SIZE, POOL_TIMEOUT)
+
+
+@contextlib.contextmanager
+def get_connection():
+    """Empresta uma conexão do pool durante o bloco `with`
+
+    Exceções dentro do bloco desfazem a transação aberta; o commit continua
+    sendo responsabilidade de quem escreve.
+    """
+    pool = get_pool()
+    with instrumentation.span('db'):
+        conn = pool.acquire()
+    try:
+        yield conn
+    except sqlite3.DatabaseError:
+        pool.release(conn, discard=not _is_healthy(conn))
+        raise
+    except BaseException:
+        pool.release(conn)
+        raise
+    else:
+        pool.release(conn)
+
+
+def _is_healthy(conn):
+    """Verifica se a conexão ainda responde após um erro de banco"""
+    try:
+        conn.rollback()
+        conn.execute('SELECT 1')
+        return True
+    except sqlite3.Error:
+        return False
+
+
+class GroupCommitWriter:
+    """Thread dedicada que agrupa inserções concorrentes em uma transação
+
+    Não há espera artificial: enquanto um commit está em andamento, as novas
+    inserções se acumulam na fila e entram juntas na transação seguinte. Com
+    pouca carga cada inserção vira a sua própria transação; com muita, o
+    custo do commit é dividido pelo lote.
+    """
+
+    def __init__(self, path, max_batch=None):
+        self.path = path
+        self.max_batch = max_batch or WRITER_MAX_BATCH
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = os.getpid()
+        self.stats = {'transactions': 0, 'rows': 0, 'largest_batch': 0}
+
+    def submit(self, sql, params=()):
+        """Enfileira um INSERT sem esperar; retorna um Future com o `lastrowid`"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((sql, params, future))
+        return future
+
+    def execute(self, sql, params=(), timeout=None):
+        """Executa um INSERT no próximo lote e retorna o `lastrowid` da linha
+
+        O timeout só vale enquanto a inserção espera na fila: se ela já entrou
+        em uma transação, a espera continua até o resultado, para que um 503
+        nunca corresponda a uma proposta gravada (e duplicada no reenvio).
+        """
+        future = self.submit(sql, params)
+        wait = WRITER_TIMEOUT if timeout is None else timeout
+        try:
+            with instrumentation.span('db'):
+                return future.result(timeout=wait)
+        except FutureTimeout:
+            if future.cancel():
+                raise WriterTimeout(f'Inserção não confirmada após {wait:.1f}s')
+        with instrumentation.span('db'):
+            return future.result()
+
+    def close(self):
+        """Grava o que estiver na fila e encerra a thread"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        """Bloqueia até a primeira inserção e junta as que já estiverem na fila"""
+        batch = [self._queue.get()]
+        while batch[-1] is not None and len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = open_connection(self.path)
+        try:
+            while True:
+                batch = self._next_batch()
+                stop = batch[-1] is None
+                if stop:
+                    batch.pop()
+                if batch:
+                    conn = self._write(conn, batch)
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _write(self, conn, batch):
+        """Grava o lote; erros de uma linha só afetam o seu chamador"""
+        # Inserções canceladas pelo chamador após o timeout não entram no banco
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if batch:
+            conn = self._commit(conn, batch)
+        return conn
+
+    def _commit(self, conn, batch):
+        results = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for sql, params, future in batch:
+                try:
+                    results.append((future, conn.execute(sql, params).lastrowid, None))
+                except sqlite3.IntegrityError as e:
+                    # A falha desfaz só o comando; a transação continua válida
+                    results.append((future, None, e))
+            conn.commit()
+        except sqlite3.Error as e:
+            if not _is_healthy(conn):
+                conn.close()
+                conn = open_connection(self.path)
+            if len(batch) == 1:
+                batch[0][2].set_exception(e)
+                return conn
+            # Não dá para saber qual linha derrubou a transação: cada uma é
+            # gravada na sua, e o erro volta só para quem o causou
+            for item in batch:
+                conn = self._commit(conn, [item])
+            return conn
+
+        self.stats['transactions'] += 1
+        self.stats['rows'] += len(batch)
+        self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+        for future, rowid, error in results:
+            if error is None:
+                future.set_result(rowid)
+            else:
+                future.set_exception(error)
+        return conn
+
+
+_writer = None
+
+
+def get_writer():
+    """Retorna o writer do processo atual, recriando-o após um fork"""
+    global _writer
+
+    writer = _writer
+    if writer is not None and writer.path == DB_PATH and writer._pid == os.getpid():
+        return writer
+
+    with _pool_lock:
+        if _writer is None or _writer.path != DB_PATH or _writer._pid != os.getpid():
+            if _writer is not None and _writer._pid == os.getpid():
+                _writer.close()
+            _writer = GroupCommitWriter(DB_PATH)
+        return _writer
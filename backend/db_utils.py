@@ -1,12 +1,35 @@
 """
 Utilitários para gerenciamento do banco de dados SQLite
 """
+import argparse
+import codecs
+import datetime
+import gzip
+import hashlib
+import io
+import json
 import sqlite3
 import os
 import sys
+import time
+import zlib
 
-# Caminho do banco de dados
-DB_PATH = os.path.join(os.path.dirname(__file__), 'proposals.db')
+import compression
+import db
+import migrations
+import stats
+
+try:
+    import zstandard
+except ImportError:  # dependência opcional (exportação .zst)
+    zstandard = None
+
+# Caminho do banco de dados (o mesmo do app, inclusive PITCHBOT_DB_PATH)
+DB_PATH = db.DB_PATH
+
+# Linhas lidas do cursor por vez na exportação em streaming
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', '500'))
+EXPORT_COMPRESSIONS = ('none', 'gzip', 'zstd')
 
 def init_db():
     """Inicializa o banco de dados do zero"""
@@ -20,34 +43,27 @@ def init_db():
             print("Operação cancelada.")
             return
         
-        os.remove(DB_PATH)
+        # O WAL de um banco antigo não pode sobrar ao lado do novo
+        for path in (DB_PATH, f'{DB_PATH}-wal', f'{DB_PATH}-shm'):
+            if os.path.exists(path):
+                os.remove(path)
         print("Banco de dados anterior removido.")
     
-    # Cria novo banco
+    # Cria novo banco com o mesmo esquema do app
     conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    try:
+        version = migrations.migrate(conn)
+    finally:
+        conn.close()
     
-    # Criação da tabela de propostas
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS proposals (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        client_name TEXT NOT NULL,
-        project_description TEXT NOT NULL,
-        value REAL NOT NULL,
-        deadline TEXT NOT NULL,
-        additional_points TEXT,
-        custom_prompt TEXT,
-        content TEXT NOT NULL,
-        created_at TEXT NOT NULL,
-        author TEXT NOT NULL,
-        model TEXT NOT NULL
-    )
-    ''')
-    
-    conn.commit()
-    conn.close()
-    
-    print(f"Banco de dados inicializado com sucesso em: {DB_PATH}")
+    print(f"Banco de dados inicializado com sucesso em: {DB_PATH} (esquema versão {version})")
+
+def _connect_for_export():
+    """Conexão de leitura com as funções de compressão do texto registradas"""
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    compression.register(conn)
+    return conn
 
 def export_proposals(output_file):
     """Exporta propostas para um arquivo JSON"""
@@ -57,14 +73,13 @@ def export_proposals(output_file):
         print(f"Banco de dados não encontrado em {DB_PATH}")
         return
     
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    conn = _connect_for_export()
     cursor = conn.cursor()
     
     cursor.execute('SELECT * FROM proposals ORDER BY created_at DESC')
     rows = cursor.fetchall()
     
-    proposals = [dict(row) for row in rows]
+    proposals = [export_row(row) for row in rows]
     
     conn.close()
     
@@ -73,96 +88,564 @@ def export_proposals(output_file):
     
     print(f"{len(proposals)} propostas exportadas para {output_file}")
 
-def import_proposals(input_file):
-    """Importa propostas de um arquivo JSON"""
-    import json
-    
+def export_row(row):
+    """Proposta como gravada no arquivo: texto descomprimido e sem o hash interno"""
+    proposal = compression.decode_row(dict(row))
+    proposal.pop('content_hash', None)
+    return proposal
+
+def build_export_query(since=None, until=None, model=None):
+    """Monta o SELECT da exportação com os filtros de data e modelo
+
+    `since` e `until` são datas ou datas/horas ISO; uma data sem hora em
+    `until` inclui o dia inteiro. Retorna (sql, parâmetros) ou levanta
+    ValueError se algum filtro for inválido.
+    """
+    conditions = []
+    params = []
+
+    if since:
+        conditions.append('created_at >= ?')
+        params.append(_parse_export_date(since, 'since').isoformat())
+    if until:
+        bound = _parse_export_date(until, 'until')
+        if isinstance(bound, datetime.datetime):
+            conditions.append('created_at <= ?')
+        else:
+            # Data sem hora: tudo antes do dia seguinte
+            bound += datetime.timedelta(days=1)
+            conditions.append('created_at < ?')
+        params.append(bound.isoformat())
+    if model:
+        conditions.append('model = ?')
+        params.append(model)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    # Ordem do rowid: leitura sequencial, sem ordenação em memória
+    return f'SELECT * FROM proposals {where} ORDER BY id', params
+
+def _parse_export_date(value, name):
+    try:
+        if len(value) == 10:
+            return datetime.date.fromisoformat(value)
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'O parâmetro {name} deve ser uma data ISO (AAAA-MM-DD ou AAAA-MM-DDTHH:MM:SS)')
+
+class _NoCompression:
+    def compress(self, data):
+        return data
+
+    def flush(self):
+        return b''
+
+def make_compressor(codec_name):
+    """Compressor incremental (compress/flush) para o formato pedido"""
+    if codec_name in (None, 'none'):
+        return _NoCompression()
+    if codec_name == 'gzip':
+        return zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: cabeçalho gzip
+    if codec_name == 'zstd':
+        if zstandard is None:
+            raise ValueError('A compressão zstd requer o pacote zstandard (pip install zstandard)')
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    raise ValueError(f"Compressão inválida: {codec_name}. Use {', '.join(EXPORT_COMPRESSIONS)}")
+
+def iter_ndjson(conn, codec_name=None, since=None, until=None, model=None,
+                chunk_size=EXPORT_CHUNK_SIZE, counts=None):
+    """Gera a exportação em NDJSON (uma proposta por linha), em blocos de bytes
+
+    As linhas são lidas com fetchmany em um único SELECT, então a memória
+    usada não depende do tamanho da tabela e a exportação inteira vem do
+    mesmo snapshot do banco. `counts['rows']`, se informado, recebe o total.
+    """
+    sql, params = build_export_query(since, until, model)
+    compressor = make_compressor(codec_name)
+
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            if counts is not None:
+                counts['rows'] = counts.get('rows', 0) + len(rows)
+            lines = ''.join(json.dumps(export_row(row), ensure_ascii=False) + '\n' for row in rows)
+            data = compressor.compress(lines.encode('utf-8'))
+            if data:
+                yield data
+    finally:
+        cursor.close()
+
+    tail = compressor.flush()
+    if tail:
+        yield tail
+
+def compression_for(output_file):
+    """Compressão indicada pela extensão do arquivo (.gz ou .zst)"""
+    if output_file.endswith('.gz'):
+        return 'gzip'
+    if output_file.endswith('.zst'):
+        return 'zstd'
+    return 'none'
+
+def export_ndjson(output_file, codec_name=None, since=None, until=None, model=None):
+    """Exporta propostas para NDJSON em streaming, opcionalmente comprimido"""
+    if not os.path.exists(DB_PATH):
+        print(f"Banco de dados não encontrado em {DB_PATH}")
+        return
+
+    conn = _connect_for_export()
+    counts = {'rows': 0}
+    try:
+        with open(output_file, 'wb') as f:
+            for chunk in iter_ndjson(conn, codec_name or compression_for(output_file),
+                                     since=since, until=until, model=model, counts=counts):
+                f.write(chunk)
+    finally:
+        conn.close()
+
+    print(f"{counts['rows']} propostas exportadas para {output_file}")
+
+# Importação em lote ---------------------------------------------------------
+
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '5000'))
+IMPORT_READ_SIZE = 1024 * 1024
+
+# Colunas gravadas pela importação (id e project_id não são copiados entre bancos)
+IMPORT_COLUMNS = (
+    'client_name', 'project_description', 'value', 'deadline',
+    'additional_points', 'custom_prompt', 'content', 'created_at', 'author', 'model'
+)
+
+# Descrição e conteúdo vão comprimidos pelo pack_text da conexão (ver compression.py)
+IMPORT_INSERT_SQL = f'''
+INSERT OR IGNORE INTO proposals ({', '.join(IMPORT_COLUMNS)}, content_hash)
+VALUES ({', '.join('pack_text(?)' if column in compression.COMPRESSED_COLUMNS else '?' for column in IMPORT_COLUMNS)}, ?)
+'''
+
+def content_hash(client_name, project_description, value, deadline, additional_points,
+                 custom_prompt, content, created_at, author, model):
+    """Hash (16 bytes) dos dados da proposta, usado para ignorar linhas repetidas"""
+    try:
+        value = repr(float(value))
+    except (TypeError, ValueError):
+        value = str(value)  # valores não numéricos são gravados como vieram
+    payload = '\x1f'.join((
+        client_name, project_description, value, deadline,
+        additional_points or '', custom_prompt or '', content, created_at, author, model
+    ))
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).digest()
+
+def _prepare_import_schema(conn):
+    """Garante o esquema atual (coluna content_hash e tabela de checkpoints)
+
+    Registra também as funções de compressão, usadas pelos triggers da busca.
+    """
+    migrations.migrate(conn)
+    compression.register(conn)
+
+def _backfill_hashes(conn):
+    """Calcula o hash das propostas gravadas pelo app desde a última importação
+
+    O trigger da busca só observa as colunas de texto (migração 8), então
+    o UPDATE não refaz o índice FTS dessas linhas.
+    """
+    conn.create_function('proposal_hash', 10, content_hash, deterministic=True)
+    # O hash é sempre do texto original, esteja ele comprimido ou não
+    columns = ', '.join(
+        f'unpack_text({column})' if column in compression.COMPRESSED_COLUMNS else column
+        for column in IMPORT_COLUMNS
+    )
+    conn.execute(f'''
+    UPDATE OR IGNORE proposals SET content_hash = proposal_hash({columns})
+    WHERE content_hash IS NULL
+    ''')
+    conn.commit()
+
+def _defer_indexes(conn, checkpoint):
+    """Remove os índices secundários da tabela, guardando no checkpoint o SQL para recriá-los
+
+    Só os índices comuns saem: os triggers (busca FTS, agregados, versões
+    dos ETags) continuam ativos, porque o app pode alterar propostas durante
+    a carga. O índice único do hash fica, porque é ele que descarta as
+    repetições. O SQL é gravado na mesma transação que remove os índices,
+    então uma importação interrompida à força os recria na execução seguinte.
+    """
+    indexes = conn.execute('''
+    SELECT name, sql FROM sqlite_master
+    WHERE tbl_name = 'proposals' AND type = 'index' AND sql IS NOT NULL
+      AND name != 'idx_proposals_content_hash'
+    ''').fetchall()
+    pending = checkpoint['deferred_sql'] or []
+    checkpoint['deferred_sql'] = pending + [sql for _, sql in indexes if sql not in pending]
+    _save_checkpoint(conn, checkpoint)  # abre a transação
+    for name, _ in indexes:
+        conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+    conn.commit()
+
+def _restore_indexes(conn, checkpoint):
+    """Recria os índices removidos por _defer_indexes"""
+    conn.rollback()  # um lote pela metade, se a carga falhou
+    conn.execute('UPDATE import_checkpoints SET deferred_sql = NULL WHERE source = ?', (checkpoint['source'],))
+    for sql in checkpoint['deferred_sql']:
+        conn.execute(sql.replace('CREATE INDEX', 'CREATE INDEX IF NOT EXISTS', 1))
+    conn.commit()
+    checkpoint['deferred_sql'] = None
+
+def open_import_file(input_file):
+    """Abre o arquivo em modo binário, descomprimindo .gz e .zst"""
+    if input_file.endswith('.gz'):
+        return gzip.open(input_file, 'rb')
+    if input_file.endswith('.zst'):
+        if zstandard is None:
+            raise ValueError('A importação de .zst requer o pacote zstandard (pip install zstandard)')
+        reader = zstandard.ZstdDecompressor().stream_reader(open(input_file, 'rb'), closefd=True)
+        return io.BufferedReader(reader, IMPORT_READ_SIZE)  # leitura por linha
+    return open(input_file, 'rb')
+
+def _skip_to(f, offset):
+    """Avança até `offset` bytes descomprimidos (descartando o que for lido se preciso)"""
+    if f.seekable():
+        f.seek(offset)
+        return
+    remaining = offset
+    while remaining > 0:
+        chunk = f.read(min(remaining, IMPORT_READ_SIZE))
+        if not chunk:
+            raise ValueError('O arquivo ficou menor que a posição do checkpoint; use --restart')
+        remaining -= len(chunk)
+
+def detect_format(f):
+    """'array' se o arquivo começa com '[', senão 'ndjson' (consome só o início)"""
+    while True:
+        char = f.read(1)
+        if not char:
+            return 'ndjson'
+        if not char.isspace():
+            return 'array' if char == b'[' else 'ndjson'
+
+def iter_ndjson_records(f, offset=0):
+    """Gera (proposta, posição após a linha) de um arquivo NDJSON"""
+    for line in f:
+        offset += len(line)
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line), offset
+        except ValueError:
+            raise ValueError(f'Linha NDJSON inválida terminando na posição {offset}')
+
+def iter_json_array(f, offset=0):
+    """Gera (proposta, posição após o objeto) de um array JSON, sem carregá-lo inteiro
+
+    Com `offset` > 0, a leitura continua logo depois de um objeto já lido.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buf = ''
+    pos = 0
+    eof = False
+    started = offset > 0
+
+    while True:
+        # Pula espaços, vírgulas e o '[' inicial (todos ocupam 1 byte)
+        while pos < len(buf) and (buf[pos] in ' \t\r\n,' or (buf[pos] == '[' and not started)):
+            started = started or buf[pos] == '['
+            pos += 1
+            offset += 1
+        if pos >= len(buf):
+            if eof:
+                return
+            chunk = f.read(IMPORT_READ_SIZE)
+            eof = not chunk
+            buf = buf[pos:] + text_decoder.decode(chunk, final=eof)
+            pos = 0
+            continue
+        if buf[pos] == ']':
+            return
+
+        try:
+            record, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            if eof:
+                raise ValueError(f'JSON inválido perto da posição {offset}')
+            # Objeto incompleto: lê mais um bloco e tenta de novo
+            chunk = f.read(IMPORT_READ_SIZE)
+            eof = not chunk
+            buf = buf[pos:] + text_decoder.decode(chunk, final=eof)
+            pos = 0
+            continue
+
+        offset += len(buf[pos:end].encode('utf-8'))
+        pos = end
+        yield record, offset
+
+def _import_text(value, default=None):
+    """Campo de texto do registro: strings e números viram texto; outros tipos são inválidos"""
+    if value is None or value == '':
+        if default is None:
+            raise ValueError('campo obrigatório vazio')
+        return default
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise ValueError(f'tipo inválido: {type(value).__name__}')
+
+def _import_value(value):
+    """Valor da proposta como número (aceita números e textos numéricos, como '1500.00')"""
+    if isinstance(value, bool):
+        raise ValueError('tipo inválido: bool')
+    value = float(value)  # TypeError/ValueError para null, listas e textos não numéricos
+    if value != value or value in (float('inf'), float('-inf')):
+        raise ValueError('valor não finito')
+    return value
+
+def _import_row(record):
+    """Linha pronta para o INSERT, ou None se o registro for inválido
+
+    Campos obrigatórios ausentes ou vazios, textos de tipo errado e valores
+    não numéricos invalidam só o registro, não o lote.
+    """
+    try:
+        row = (
+            _import_text(record['client_name']),
+            _import_text(record['project_description']),
+            _import_value(record['value']),
+            _import_text(record['deadline']),
+            _import_text(record.get('additional_points'), ''),
+            _import_text(record.get('custom_prompt'), ''),
+            _import_text(record['content']),
+            _import_text(record['created_at']),
+            _import_text(record['author']),
+            _import_text(record.get('model'), 'unknown')
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
+    # O hash é do texto original; a compressão fica para o INSERT
+    return row + (content_hash(*row),)
+
+def _save_checkpoint(conn, checkpoint):
+    conn.execute('''
+    INSERT OR REPLACE INTO import_checkpoints (
+        source, size, mtime, format, offset, rows_read, inserted, duplicates, invalid,
+        deferred_sql, updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        checkpoint['source'], checkpoint['size'], checkpoint['mtime'], checkpoint['format'],
+        checkpoint['offset'], checkpoint['rows_read'], checkpoint['inserted'],
+        checkpoint['duplicates'], checkpoint['invalid'],
+        json.dumps(checkpoint['deferred_sql']) if checkpoint['deferred_sql'] is not None else None,
+        datetime.datetime.now().isoformat()
+    ))
+
+def _load_checkpoint(conn, source, size, mtime):
+    row = conn.execute('SELECT * FROM import_checkpoints WHERE source = ?', (source,)).fetchone()
+    if row is None or row['size'] != size or row['mtime'] != mtime:
+        return None
+    checkpoint = dict(row)
+    checkpoint['deferred_sql'] = json.loads(row['deferred_sql']) if row['deferred_sql'] else None
+    return checkpoint
+
+def import_proposals(input_file, batch_size=IMPORT_BATCH_SIZE, defer_indexes=True, restart=False):
+    """Importa propostas de um arquivo JSON (array) ou NDJSON, em lote
+
+    O arquivo é lido aos poucos e gravado em transações de `batch_size`
+    linhas com executemany. Linhas com o mesmo hash de conteúdo de uma
+    proposta existente são ignoradas. Cada transação grava também a posição
+    já importada do arquivo, então uma importação interrompida continua de
+    onde parou ao rodar o mesmo comando de novo (`restart=True` recomeça).
+    Retorna as contagens da importação.
+    """
     if not os.path.exists(input_file):
         print(f"Arquivo de importação não encontrado: {input_file}")
-        return
-    
-    with open(input_file, 'r', encoding='utf-8') as f:
-        proposals = json.load(f)
-    
+        return None
+
+    source = os.path.abspath(input_file)
+    stat = os.stat(source)
+
     conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    for proposal in proposals:
-        cursor.execute('''
-        INSERT INTO proposals (
-            client_name, project_description, value, deadline, 
-            additional_points, custom_prompt, content, created_at, author, model
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            proposal['client_name'], 
-            proposal['project_description'], 
-            proposal['value'], 
-            proposal['deadline'],
-            proposal.get('additional_points', ''),
-            proposal.get('custom_prompt', ''),
-            proposal['content'],
-            proposal['created_at'],
-            proposal['author'],
-            proposal.get('model', 'unknown')
-        ))
-    
+    conn.row_factory = sqlite3.Row
+    try:
+        _prepare_import_schema(conn)
+        checkpoint = None if restart else _load_checkpoint(conn, source, stat.st_size, stat.st_mtime_ns)
+        if checkpoint is not None:
+            print(f"Retomando a importação: {checkpoint['rows_read']} linhas já lidas")
+
+        # Ajustes só desta conexão: commit sem fsync e cache maior durante a carga
+        if conn.execute('PRAGMA journal_mode').fetchone()[0].lower() != 'wal':
+            conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('PRAGMA cache_size=-131072')
+        conn.execute('PRAGMA temp_store=MEMORY')
+
+        if checkpoint is None:
+            with open_import_file(input_file) as probe:
+                file_format = detect_format(probe)
+            checkpoint = {
+                'source': source, 'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+                'format': file_format, 'offset': 0, 'rows_read': 0,
+                'inserted': 0, 'duplicates': 0, 'invalid': 0, 'deferred_sql': None
+            }
+            _save_checkpoint(conn, checkpoint)
+            conn.commit()
+
+        if defer_indexes:
+            _defer_indexes(conn, checkpoint)
+        try:
+            _import_file(conn, input_file, checkpoint, batch_size)
+        finally:
+            # Também se a carga falhar: o app continua usando o banco
+            if checkpoint['deferred_sql']:
+                print("Recriando índices...")
+                _restore_indexes(conn, checkpoint)
+
+        conn.execute('DELETE FROM import_checkpoints WHERE source = ?', (source,))
+        conn.commit()
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    finally:
+        conn.close()
+
+    result = {key: checkpoint[key] for key in ('rows_read', 'inserted', 'duplicates', 'invalid')}
+    print(f"{result['inserted']} propostas importadas com sucesso "
+          f"({result['duplicates']} repetidas e {result['invalid']} inválidas ignoradas).")
+    return result
+
+def _import_file(conn, input_file, checkpoint, batch_size):
+    """Lê o arquivo a partir do checkpoint e grava as propostas em lotes"""
+    with open_import_file(input_file) as f:
+        if checkpoint['offset']:
+            _skip_to(f, checkpoint['offset'])
+
+        _backfill_hashes(conn)
+
+        reader = iter_json_array if checkpoint['format'] == 'array' else iter_ndjson_records
+        start = time.perf_counter()
+        batch = []
+        for record, offset in reader(f, checkpoint['offset']):
+            checkpoint['rows_read'] += 1
+            checkpoint['offset'] = offset
+            row = _import_row(record) if isinstance(record, dict) else None
+            if row is None:
+                checkpoint['invalid'] += 1
+            else:
+                batch.append(row)
+            if len(batch) >= batch_size:
+                _write_import_batch(conn, batch, checkpoint)
+                batch = []
+                rate = checkpoint['rows_read'] / max(time.perf_counter() - start, 1e-9)
+                print(f"  {checkpoint['rows_read']} linhas lidas ({rate:.0f}/s)")
+        _write_import_batch(conn, batch, checkpoint)
+
+def _write_import_batch(conn, batch, checkpoint):
+    """Grava o lote e a posição do arquivo na mesma transação"""
+    inserted = conn.executemany(IMPORT_INSERT_SQL, batch).rowcount if batch else 0
+    checkpoint['inserted'] += inserted
+    checkpoint['duplicates'] += len(batch) - inserted
+    _save_checkpoint(conn, checkpoint)
     conn.commit()
-    conn.close()
-    
-    print(f"{len(proposals)} propostas importadas com sucesso.")
 
-def display_stats():
-    """Exibe estatísticas do banco de dados"""
+def display_stats(rebuild=False):
+    """Exibe estatísticas do banco de dados a partir da tabela de agregados"""
     if not os.path.exists(DB_PATH):
         print(f"Banco de dados não encontrado em {DB_PATH}")
         return
     
     conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Total de propostas
-    cursor.execute('SELECT COUNT(*) FROM proposals')
-    total = cursor.fetchone()[0]
-    
-    # Valor total
-    cursor.execute('SELECT SUM(value) FROM proposals')
-    total_value = cursor.fetchone()[0] or 0
-    
-    # Propostas por modelo
-    cursor.execute('SELECT model, COUNT(*) FROM proposals GROUP BY model')
-    models = cursor.fetchall()
-    
-    # Propostas por mês
-    cursor.execute('''
-    SELECT substr(created_at, 1, 7) as month, COUNT(*) 
-    FROM proposals 
-    GROUP BY month 
-    ORDER BY month DESC
-    ''')
-    months = cursor.fetchall()
-    
-    conn.close()
+    try:
+        # Bancos de versões antigas ganham os agregados pela migração
+        migrations.migrate(conn)
+        if rebuild:
+            stats.rebuild(conn)
+            print("Agregados recalculados a partir das propostas.")
+        result = stats.read(conn)
+    finally:
+        conn.close()
     
     print("\n===== Estatísticas do Banco de Dados =====")
-    print(f"Total de propostas: {total}")
-    print(f"Valor total: R$ {total_value:.2f}")
+    print(f"Total de propostas: {result['total']['count']}")
+    print(f"Valor total: R$ {result['total']['totalValue']:.2f}")
     
     print("\nPropostas por modelo:")
-    for model, count in models:
-        print(f"  {model}: {count}")
+    for entry in result['byModel']:
+        print(f"  {entry['model']}: {entry['count']}")
     
     print("\nPropostas por mês:")
-    for month, count in months:
-        print(f"  {month}: {count}")
+    for entry in result['byMonth']:
+        print(f"  {entry['month']}: {entry['count']}")
+    
+    print("\nPropostas por autor:")
+    for entry in result['byAuthor']:
+        print(f"  {entry['author']}: {entry['count']}")
+    
+    print("\nPropostas por projeto:")
+    for entry in result['byProject']:
+        label = entry['projectId'] if entry['projectId'] is not None else 'sem projeto'
+        print(f"  {label}: {entry['count']}")
+
+def _database_size(conn):
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    return conn.execute('PRAGMA page_count').fetchone()[0] * page_size
+
+def compress_proposals():
+    """Treina um dicionário novo com as propostas atuais e recomprime o texto
+
+    Útil depois que o banco cresceu: o primeiro dicionário é treinado na
+    migração, com as propostas que existiam na época (ou com o texto
+    inicial de compression.py). No final o arquivo é compactado (VACUUM).
+    """
+    if not os.path.exists(DB_PATH):
+        print(f"Banco de dados não encontrado em {DB_PATH}")
+        return None
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        migrations.migrate(conn)
+        compression.register(conn)
+        size_before = _database_size(conn)
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            dictionary_id, samples = compression.train(conn)
+            # O texto não muda, então o índice de busca não precisa ser refeito
+            trigger = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'proposals_fts_update'"
+            ).fetchone()
+            if trigger:
+                conn.execute('DROP TRIGGER proposals_fts_update')
+            updated = conn.execute('''
+            UPDATE proposals SET
+                project_description = pack_text(unpack_text(project_description)),
+                content = pack_text(unpack_text(content))
+            ''').rowcount
+            if trigger:
+                conn.execute(trigger[0])
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+        conn.execute('VACUUM')
+        size_after = _database_size(conn)
+    finally:
+        conn.close()
+
+    print(f"{updated} propostas recomprimidas com o dicionário {dictionary_id:08x} "
+          f"(treinado com {samples} propostas).")
+    print(f"Tamanho do banco: {size_before / 1e6:.2f} MB -> {size_after / 1e6:.2f} MB")
+    return {'proposals': updated, 'samples': samples, 'size_before': size_before, 'size_after': size_after}
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Uso: python db_utils.py <comando>")
         print("Comandos disponíveis:")
         print("  init    - Inicializa o banco de dados")
-        print("  export  - Exporta propostas para arquivo JSON")
-        print("  import  - Importa propostas de arquivo JSON")
-        print("  stats   - Exibe estatísticas do banco de dados")
+        print("  export  - Exporta propostas para arquivo JSON ou NDJSON (.ndjson, .gz, .zst)")
+        print("  import  - Importa propostas de arquivo JSON ou NDJSON (retoma se interrompida)")
+        print("  stats   - Exibe estatísticas do banco de dados (--rebuild recalcula os agregados)")
+        print("  compress - Treina um novo dicionário e recomprime o texto das propostas")
         sys.exit(1)
     
     comando = sys.argv[1].lower()
@@ -170,17 +653,44 @@ if __name__ == "__main__":
     if comando == 'init':
         init_db()
     elif comando == 'export':
-        if len(sys.argv) < 3:
-            output_file = 'propostas_export.json'
-        else:
-            output_file = sys.argv[2]
-        export_proposals(output_file)
+        parser = argparse.ArgumentParser(prog='db_utils.py export')
+        parser.add_argument('output_file', nargs='?', default='propostas_export.json')
+        parser.add_argument('--since', help='Data inicial (AAAA-MM-DD)')
+        parser.add_argument('--until', help='Data final, inclusiva (AAAA-MM-DD)')
+        parser.add_argument('--model', help='Somente propostas deste modelo')
+        parser.add_argument('--compress', choices=EXPORT_COMPRESSIONS,
+                            help='Padrão: pela extensão do arquivo (.gz, .zst)')
+        args = parser.parse_args(sys.argv[2:])
+
+        try:
+            if args.output_file.endswith('.json'):
+                # Formato original (array JSON montado em memória)
+                if args.since or args.until or args.model or args.compress:
+                    raise ValueError('Filtros e compressão só valem na exportação NDJSON (.ndjson, .gz, .zst)')
+                export_proposals(args.output_file)
+            else:
+                export_ndjson(args.output_file, args.compress, args.since, args.until, args.model)
+        except ValueError as e:
+            print(str(e))
+            sys.exit(1)
     elif comando == 'import':
-        if len(sys.argv) < 3:
-            print("Especifique o arquivo de importação: python db_utils.py import arquivo.json")
+        parser = argparse.ArgumentParser(prog='db_utils.py import')
+        parser.add_argument('input_file', help='Array JSON ou NDJSON (.json, .ndjson, .gz, .zst)')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--keep-indexes', action='store_true',
+                            help='Não remove os índices durante a carga')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignora o checkpoint e lê o arquivo desde o início')
+        args = parser.parse_args(sys.argv[2:])
+
+        try:
+            import_proposals(args.input_file, args.batch_size, not args.keep_indexes, args.restart)
+        except ValueError as e:
+            print(str(e))
             sys.exit(1)
-        import_proposals(sys.argv[2])
     elif comando == 'stats':
-        display_stats()
+        display_stats(rebuild='--rebuild' in sys.argv[2:])
+    elif comando == 'compress':
+        compress_proposals()
     else:
         print(f"Comando desconhecido: {comando}")
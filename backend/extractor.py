@@ -0,0 +1,387 @@
+"""
+Extração de dados das páginas de projeto do 99freelas em uma única passada
+
+A versão anterior montava a árvore completa do BeautifulSoup e rodava
+seletores `:-soup-contains(...)`, que recalculam o texto de cada <div> da
+página a cada consulta. Aqui o HTML é tokenizado direto pelo
+html.parser.HTMLParser da biblioteca padrão, com as mesmas regras que o
+BeautifulSoup aplica sobre ele com 'html.parser' (entidades, tags vazias,
+normalização de espaços), mas sem construir a árvore: cada estratégia é
+resolvida durante a leitura e o parse termina assim que cliente, descrição
+e valor foram encontrados pelas estratégias principais.
+
+As regras de cada estratégia reproduzem exatamente o que os seletores
+retornavam (primeiro elemento na ordem do documento, texto de `.text` etc.);
+tests/test_extractor.py e benchmarks/bench_extractor.py conferem o resultado
+contra a implementação antiga.
+"""
+import re
+from bisect import bisect_left
+from html.entities import html5
+from html.parser import HTMLParser
+
+# Padrões pré-compilados das estratégias baseadas em texto
+CLIENT_RE = re.compile(r'Cliente:?\s*([A-Za-z0-9\s]+)')
+DESCRIPTION_RE = re.compile(r'Descrição do Projeto:?\s*(.+)', re.DOTALL)
+VALUE_RE = re.compile(r'R\$\s*([\d.,]+)')
+CLASS_RE = re.compile(r'\S+')
+
+# Textos procurados por `div:-soup-contains(...)`
+CLIENT_MARKER = 'Cliente'
+DESCRIPTION_MARKER = 'Descrição do Projeto:'
+VALUE_MARKER = 'Valor Mínimo:'
+MARKERS = (CLIENT_MARKER, DESCRIPTION_MARKER, VALUE_MARKER)
+MARKER_TAIL = max(len(marker) for marker in MARKERS) - 1
+
+DEFAULT_CLIENT_NAME = "Cliente"
+DEFAULT_DESCRIPTION = "Descrição do projeto não encontrada. Por favor, preencha manualmente."
+DEFAULT_VALUE = "5000"
+
+# Mesmas regras de árvore do BeautifulSoup com 'html.parser'
+EMPTY_ELEMENT_TAGS = frozenset((
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr',
+    'image', 'img', 'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid',
+    'param', 'source', 'spacer', 'track', 'wbr'
+))
+STRING_CONTAINER_TAGS = frozenset(('rt', 'rp', 'style', 'script', 'template'))
+PRESERVE_WHITESPACE_TAGS = frozenset(('pre', 'textarea'))
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+# Entidades nomeadas, com e sem ';' (`&amp;` e `&amp` viram '&')
+ENTITIES = {name: char for name, char in html5.items() if not name.endswith(';')}
+ENTITIES.update((name[:-1], char) for name, char in html5.items() if name.endswith(';'))
+
+
+class _StopParsing(Exception):
+    """Todos os campos foram encontrados; o restante do HTML não importa"""
+
+
+class _Element:
+    """Elemento aberto durante o parse (o mínimo necessário das Tags do BeautifulSoup)"""
+
+    __slots__ = (
+        'name', 'order', 'classes', 'text_start', 'contains_start',
+        'is_empty_element', 'first_h2', 'last_child_has_value_marker'
+    )
+
+    def __init__(self, name, order, classes, text_start, contains_start):
+        self.name = name
+        self.order = order
+        self.classes = classes
+        self.text_start = text_start
+        self.contains_start = contains_start
+        self.is_empty_element = name in EMPTY_ELEMENT_TAGS
+        self.first_h2 = None  # (ordem, texto) do primeiro <h2> descendente ainda sem div "Cliente"
+        self.last_child_has_value_marker = False
+
+
+class _Extraction(HTMLParser):
+    """Parser das páginas de projeto: o HTMLParser mais a parte da árvore que importa
+
+    Trata os eventos do tokenizador como o BeautifulSoup com 'html.parser'
+    (tags vazias fechadas na hora, entidades, comentários descartados) e
+    mantém só a pilha de elementos abertos e dois fluxos de texto:
+
+    - `text`: strings que entram em `Tag.text` (inclui CDATA; sem comentários
+      nem conteúdo de script/style/template/rt/rp);
+    - `contains`: strings consideradas por `:-soup-contains` (inclui
+      script/style, exclui comentários, CDATA e conteúdo de iframes).
+
+    O texto de um elemento é a fatia dos fluxos entre a sua abertura e o seu
+    fechamento.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        # Tags vazias já fechadas na abertura cujo fechamento explícito será ignorado
+        self.already_closed_empty_element = []
+
+        self.root = _Element('[document]', -1, (), 0, 0)
+        self.stack = [self.root]
+        self.open_counts = {}
+        self.order = 0
+        self.current_data = []
+        self.preserve_whitespace_depth = 0
+        self.string_container_depth = 0
+        self.iframe_depth = 0
+
+        self.text_parts = []
+        self.contains_length = 0
+        self.contains_tail = ''
+        self.marker_positions = {marker: [] for marker in MARKERS}
+
+        self.info_user_depth = 0
+
+        # Resultados parciais de cada estratégia
+        self.client_span = None       # '.info-usuario-nome span.name'
+        self.client_span_text = None
+        self.client_h2 = None         # 'div:-soup-contains("Cliente") h2'
+        self.description_elem = None  # '.item-text.project-description'
+        self.description_text = None
+        self.description_div = None   # 'div:-soup-contains("Descrição do Projeto:"), div.project-description'
+        self.long_paragraph = None    # primeiro <p> com mais de 100 caracteres
+        self.value_div = None         # 'div:-soup-contains("Valor Mínimo:") + div'
+        self.value = None
+        self.value_done = False
+
+    # Eventos do HTMLParser ---------------------------------------------------
+
+    def handle_startendtag(self, name, attrs):
+        # <tag/>: o fechamento vem logo em seguida, seja qual for a tag
+        self.handle_starttag(name, attrs, handle_empty_element=False)
+        self.handle_endtag(name)
+
+    def handle_starttag(self, name, attrs, handle_empty_element=True):
+        element = self._open(name, attrs)
+        if element.is_empty_element and handle_empty_element:
+            self.handle_endtag(name, check_already_closed=False)
+            self.already_closed_empty_element.append(name)
+
+    def handle_endtag(self, name, check_already_closed=True):
+        if check_already_closed and name in self.already_closed_empty_element:
+            # </br> depois de <br>: a tag já foi fechada na abertura
+            self.already_closed_empty_element.remove(name)
+        else:
+            self._close(name)
+
+    def handle_data(self, data):
+        self.current_data.append(data)
+
+    def handle_charref(self, name):
+        code = int(name[1:], 16) if name[:1] in 'xX' else int(name)
+        data = None
+        if code < 256:
+            # Páginas antigas usam &#147; etc. com o significado do windows-1252
+            try:
+                data = bytes([code]).decode('windows-1252')
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(code)
+            except (ValueError, OverflowError):
+                pass
+        self.handle_data(data or '\N{REPLACEMENT CHARACTER}')
+
+    def handle_entityref(self, name):
+        self.handle_data(ENTITIES.get(name, f'&{name}'))
+
+    # Comentários, doctype e instruções não contam como texto, mas separam
+    # as strings ao redor
+    def handle_comment(self, data):
+        self.endData()
+
+    handle_decl = handle_pi = handle_comment
+
+    def unknown_decl(self, data):
+        self.endData()
+        if data.upper().startswith('CDATA['):
+            self.current_data.append(data[len('CDATA['):])
+            self.endData(cdata=True)
+
+    # Construção da árvore -----------------------------------------------------
+
+    def _open(self, name, attrs):
+        self.endData()
+
+        class_attr = None
+        for key, value in attrs:
+            if key == 'class':
+                class_attr = value
+        classes = tuple(CLASS_RE.findall(class_attr)) if class_attr else ()
+
+        parent = self.stack[-1]
+        element = _Element(name, self.order, classes, len(self.text_parts), self.contains_length)
+        self.order += 1
+
+        if name == 'span' and self.client_span is None and 'name' in classes and self.info_user_depth:
+            self.client_span = element
+        if (self.description_elem is None and 'item-text' in classes
+                and 'project-description' in classes):
+            self.description_elem = element
+        if name == 'div' and self.value_div is None and parent.last_child_has_value_marker:
+            self.value_div = element
+
+        self.stack.append(element)
+        self.open_counts[name] = self.open_counts.get(name, 0) + 1
+        if 'info-usuario-nome' in classes:
+            self.info_user_depth += 1
+        if name in PRESERVE_WHITESPACE_TAGS:
+            self.preserve_whitespace_depth += 1
+        if name in STRING_CONTAINER_TAGS:
+            self.string_container_depth += 1
+        if name == 'iframe':
+            self.iframe_depth += 1
+        return element
+
+    def _close(self, name):
+        self.endData()
+        if not self.open_counts.get(name):
+            return
+        while len(self.stack) > 1:
+            element = self._pop()
+            if element.name == name:
+                break
+
+    def endData(self, cdata=False):
+        if not self.current_data:
+            return
+
+        data = ''.join(self.current_data)
+        self.current_data = []
+
+        if not self.preserve_whitespace_depth and not data.strip(ASCII_SPACES):
+            data = '\n' if '\n' in data else ' '
+
+        if cdata:
+            # CDATA entra em `.text` (mesmo dentro de script/template), nunca em `:-soup-contains`
+            self.text_parts.append(data)
+            return
+        if not self.string_container_depth:
+            self.text_parts.append(data)
+        if not self.iframe_depth:
+            self._append_contains(data)
+
+    # Estado interno ---------------------------------------------------------
+
+    def _append_contains(self, data):
+        """Registra as posições dos marcadores no fluxo de `:-soup-contains`"""
+        window = self.contains_tail + data
+        offset = self.contains_length - len(self.contains_tail)
+        for marker in MARKERS:
+            positions = self.marker_positions[marker]
+            start = window.find(marker)
+            while start != -1:
+                position = offset + start
+                if not positions or positions[-1] < position:
+                    positions.append(position)
+                start = window.find(marker, start + 1)
+        self.contains_length += len(data)
+        self.contains_tail = window[-MARKER_TAIL:] if MARKER_TAIL else ''
+
+    def _contains(self, element, marker):
+        """Equivalente a `:-soup-contains(marker)` para um elemento já fechado"""
+        positions = self.marker_positions[marker]
+        index = bisect_left(positions, element.contains_start)
+        return index < len(positions) and positions[index] + len(marker) <= self.contains_length
+
+    def _text(self, element):
+        return ''.join(self.text_parts[element.text_start:])
+
+    def _pop(self):
+        element = self.stack.pop()
+        self.open_counts[element.name] -= 1
+        if 'info-usuario-nome' in element.classes:
+            self.info_user_depth -= 1
+        if element.name in PRESERVE_WHITESPACE_TAGS:
+            self.preserve_whitespace_depth -= 1
+        if element.name in STRING_CONTAINER_TAGS:
+            self.string_container_depth -= 1
+        if element.name == 'iframe':
+            self.iframe_depth -= 1
+
+        self._element_closed(element, self.stack[-1])
+        return element
+
+    def _element_closed(self, element, parent):
+        name = element.name
+        has_value_marker = False
+
+        if element is self.client_span:
+            self.client_span_text = self._text(element).strip()
+        if element is self.description_elem:
+            self.description_text = self._text(element).strip()
+        if element is self.value_div:
+            self._resolve_value(self._text(element).strip())
+
+        if name == 'h2':
+            candidate = (element.order, self._text(element))
+            if element.first_h2 is None or candidate[0] < element.first_h2[0]:
+                element.first_h2 = candidate
+        elif name == 'p':
+            if self.long_paragraph is None or element.order < self.long_paragraph[0]:
+                text = self._text(element)
+                if text and len(text.strip()) > 100:
+                    self.long_paragraph = (element.order, text.strip())
+        elif name == 'div':
+            if element.first_h2 is not None and self._contains(element, CLIENT_MARKER):
+                if self.client_h2 is None or element.first_h2[0] < self.client_h2[0]:
+                    self.client_h2 = element.first_h2
+                element.first_h2 = None
+            if (self.description_div is None or element.order < self.description_div[0]) and (
+                    'project-description' in element.classes
+                    or self._contains(element, DESCRIPTION_MARKER)):
+                self.description_div = (element.order, self._text(element))
+            has_value_marker = self._contains(element, VALUE_MARKER)
+
+        # O <h2> mais antigo ainda sem div "Cliente" sobe para o elemento pai
+        if element.first_h2 is not None and (
+                parent.first_h2 is None or element.first_h2[0] < parent.first_h2[0]):
+            parent.first_h2 = element.first_h2
+
+        parent.last_child_has_value_marker = has_value_marker
+
+        if self._primary_strategies_done():
+            raise _StopParsing()
+
+    def _resolve_value(self, value_text):
+        match = VALUE_RE.search(value_text)
+        if match:
+            self.value = match.group(1).replace('.', '').replace(',', '.')
+        self.value_done = True
+
+    def _primary_strategies_done(self):
+        return (
+            self.client_span_text and self.description_text
+            and self.value_done and self.value
+        )
+
+    def finish(self):
+        """Fecha o documento como o BeautifulSoup faz ao fim do parse"""
+        self.endData()
+        while len(self.stack) > 1:
+            self._pop()
+
+
+def extract_project_data(html):
+    """Extrai cliente, descrição e valor do HTML de uma página de projeto do 99freelas"""
+    state = _Extraction()
+
+    try:
+        state.feed(html)
+        state.close()
+        state.finish()
+    except _StopParsing:
+        pass
+
+    # Nome do cliente: span do perfil, <h2> do bloco "Cliente" ou texto "Cliente:"
+    client_name = state.client_span_text
+    if not client_name and state.client_h2 is not None:
+        client_name = state.client_h2[1].strip()
+    if not client_name:
+        match = CLIENT_RE.search(html)
+        if match:
+            client_name = match.group(1).strip()
+
+    # Descrição: bloco da descrição, div "Descrição do Projeto:" ou parágrafo longo
+    project_description = state.description_text
+    if not project_description and state.description_div is not None:
+        desc_text = state.description_div[1].strip()
+        if desc_text:
+            match = DESCRIPTION_RE.search(desc_text)
+            project_description = match.group(1).strip() if match else desc_text
+    if not project_description and state.long_paragraph is not None:
+        project_description = state.long_paragraph[1]
+
+    # Valor: div após "Valor Mínimo:" ou o primeiro "R$" da página
+    value = state.value
+    if not value:
+        match = VALUE_RE.search(html)
+        if match:
+            value = match.group(1).replace('.', '').replace(',', '.')
+
+    return {
+        'clientName': client_name or DEFAULT_CLIENT_NAME,
+        'projectDescription': project_description or DEFAULT_DESCRIPTION,
+        'value': value or DEFAULT_VALUE
+    }
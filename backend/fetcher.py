@@ -0,0 +1,190 @@
+"""
+Download das páginas de projeto do 99freelas com sessão e cache
+
+Todas as requisições passam por uma requests.Session compartilhada (conexões
+keep-alive, sem novo handshake TLS a cada chamada). O resultado já extraído
+de cada URL fica em cache por FREELAS_CACHE_TTL segundos; depois disso, a
+página é revalidada com GET condicional (If-None-Match / If-Modified-Since)
+e só é baixada e processada de novo se tiver mudado.
+
+Requisições ao mesmo host são espaçadas por FREELAS_HOST_DELAY segundos, e
+fetch_many() busca um lote de URLs em paralelo (até FREELAS_BATCH_CONCURRENCY
+ao mesmo tempo), entregando cada resultado assim que fica pronto.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import span
+
+FETCH_TIMEOUT = float(os.environ.get('FREELAS_FETCH_TIMEOUT', '10'))
+CACHE_TTL = float(os.environ.get('FREELAS_CACHE_TTL', '300'))
+CACHE_MAX_ENTRIES = int(os.environ.get('FREELAS_CACHE_MAX_ENTRIES', '512'))
+HOST_DELAY = float(os.environ.get('FREELAS_HOST_DELAY', '0.2'))
+BATCH_CONCURRENCY = int(os.environ.get('FREELAS_BATCH_CONCURRENCY', '8'))
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+
+class FetchError(Exception):
+    """A página respondeu com um status diferente de 200/304"""
+
+    def __init__(self, status_code):
+        super().__init__(f'Erro ao acessar a página. Status code: {status_code}')
+        self.status_code = status_code
+
+
+class HostThrottle:
+    """Garante um intervalo mínimo entre requisições ao mesmo host
+
+    Cada chamada reserva o próximo horário livre do host e dorme até ele,
+    então threads concorrentes são enfileiradas sem disputar o lock.
+    """
+
+    def __init__(self, delay=HOST_DELAY):
+        self.delay = delay
+        self._next_slot = {}  # host -> próximo horário livre (monotonic)
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        if self.delay <= 0:
+            return
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.delay
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class PageFetcher:
+    """Busca páginas com conexões reaproveitadas e cache do resultado extraído"""
+
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, timeout=FETCH_TIMEOUT,
+                 host_delay=HOST_DELAY):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.throttle = HostThrottle(host_delay)
+        self._entries = OrderedDict()  # url -> {'data', 'etag', 'last_modified', 'fetched_at'}
+        self._lock = threading.Lock()
+        self._session = None
+        self._session_pid = None
+        self.stats = {'hits': 0, 'revalidated': 0, 'downloads': 0}
+
+    @property
+    def session(self):
+        """Sessão HTTP do processo atual (recriada após fork)"""
+        if self._session is None or self._session_pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    session = requests.Session()
+                    session.headers['User-Agent'] = USER_AGENT
+                    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+                    self._session_pid = os.getpid()
+        return self._session
+
+    def _get_entry(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def _store(self, url, entry):
+        with self._lock:
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def fetch(self, url, extract):
+        """Retorna os dados extraídos da página, usando o cache quando possível
+
+        `extract(html)` transforma o HTML nos dados guardados em cache.
+        """
+        entry = self._get_entry(url)
+        if entry is not None and time.monotonic() - entry['fetched_at'] < self.ttl:
+            self._count('hits')
+            return dict(entry['data'])
+
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        # Só requisições de rede respeitam o intervalo por host; acertos no cache não esperam
+        with span('fetch'):
+            self.throttle.wait(url)
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304 and entry is not None:
+            # Página não mudou: renova a validade do resultado já extraído
+            self._store(url, dict(entry, fetched_at=time.monotonic()))
+            self._count('revalidated')
+            return dict(entry['data'])
+
+        if response.status_code != 200:
+            raise FetchError(response.status_code)
+
+        with span('parse'):
+            data = extract(response.text)
+        self._store(url, {
+            'data': data,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.monotonic()
+        })
+        self._count('downloads')
+        return dict(data)
+
+    def fetch_many(self, urls, extract, concurrency=BATCH_CONCURRENCY):
+        """Busca várias URLs em paralelo, gerando (índice, dados, erro) conforme terminam
+
+        Exatamente um de `dados` e `erro` é None. Se o consumidor parar de ler
+        (cliente desconectou), as URLs que ainda não começaram são canceladas.
+        """
+        if not urls:
+            return
+
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, min(concurrency, len(urls))),
+            thread_name_prefix='fetch'
+        )
+        futures = {executor.submit(self.fetch, url, extract): index for index, url in enumerate(urls)}
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    yield index, future.result(), None
+                except Exception as e:
+                    yield index, None, e
+        finally:
+            # shutdown(cancel_futures=True) só existe a partir do Python 3.9
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Instância compartilhada pelas rotas de extração
+fetcher = PageFetcher()
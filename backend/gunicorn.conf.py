@@ -0,0 +1,50 @@
+"""
+Configuração do gunicorn (ver serving.py para as variáveis de ambiente)
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Com o app pré-carregado, o mestre importa o app e aplica as migrações uma
+única vez; os processos filhos nascem prontos. O que não pode atravessar o
+fork é tratado nos hooks: as conexões SQLite do mestre são fechadas antes de
+cada fork e os workers da fila de jobs são iniciados em cada filho.
+
+No SIGTERM, cada processo para de aceitar conexões e espera as requisições
+em andamento por até graceful_timeout segundos; depois os workers da fila
+terminam o item atual.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import serving  # noqa: E402
+
+bind = f'{serving.WEB_HOST}:{serving.WEB_PORT}'
+workers = serving.WEB_WORKERS
+# Threads por processo: o tempo de uma geração é quase todo espera pela OpenAI
+worker_class = 'gthread'
+threads = serving.WEB_THREADS
+preload_app = serving.WEB_PRELOAD
+keepalive = serving.WEB_KEEPALIVE
+timeout = serving.WEB_TIMEOUT
+graceful_timeout = serving.WEB_GRACEFUL_TIMEOUT
+max_requests = serving.WEB_MAX_REQUESTS
+max_requests_jitter = serving.WEB_MAX_REQUESTS // 10
+accesslog = '-' if serving.WEB_ACCESS_LOG else None
+proc_name = 'pitchbot'
+
+
+def pre_fork(server, worker):
+    # Conexões abertas pelo mestre (migrações) não podem ser usadas pelos filhos
+    import db
+    db.get_pool().close()
+
+
+def post_worker_init(worker):
+    import app
+    app.job_queue.start()
+
+
+def worker_exit(server, worker):
+    import app
+    app.job_queue.stop(timeout=graceful_timeout)
@@ -0,0 +1,336 @@
+"""
+Instrumentação por requisição: tempos por fase, consultas lentas e profiling
+
+Com PITCHBOT_INSTRUMENTATION=1, cada requisição acumula o tempo gasto em
+cada fase (`db`, `fetch`, `parse`, `llm`, `serialize`, `compress`) pelos trechos
+marcados com span(). O resumo volta no cabeçalho `Server-Timing` e é
+impresso no log quando a requisição passa de SLOW_REQUEST_MS.
+
+Com DB_SLOW_QUERY_MS > 0, as conexões do banco registram no log os comandos
+que demoraram mais que o limite, com o SQL expandido recebido pelo trace
+callback do sqlite3 (valores dos parâmetros e comandos disparados por
+triggers incluídos).
+
+Com PITCHBOT_PROFILING=1, uma requisição com o cabeçalho
+`X-Pitchbot-Profile: cprofile` (ou `pyinstrument`) é executada sob o
+profiler e o resultado é gravado em PITCHBOT_PROFILE_DIR.
+
+Desligado (o padrão), nenhum hook é registrado no app, as conexões são
+sqlite3.Connection comuns e span() devolve sempre o mesmo contexto vazio.
+"""
+import contextlib
+import contextvars
+import cProfile
+import datetime
+import hmac
+import os
+import re
+import sqlite3
+import time
+
+from flask import g, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import pyinstrument
+except ImportError:  # dependência opcional
+    pyinstrument = None
+
+INSTRUMENTATION_ENABLED = os.environ.get('PITCHBOT_INSTRUMENTATION', '0') == '1'
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '500'))
+SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', '0'))
+
+PROFILING_ENABLED = os.environ.get('PITCHBOT_PROFILING', '0') == '1'
+PROFILE_DIR = os.environ.get(
+    'PITCHBOT_PROFILE_DIR',
+    os.path.join(os.path.dirname(__file__), 'profiles')
+)
+# Se definido, o cabeçalho X-Pitchbot-Profile-Token precisa trazer o mesmo valor
+PROFILE_TOKEN = os.environ.get('PITCHBOT_PROFILE_TOKEN', '')
+PROFILE_HEADER = 'X-Pitchbot-Profile'
+PROFILE_TOKEN_HEADER = 'X-Pitchbot-Profile-Token'
+PROFILERS = ('cprofile', 'pyinstrument')
+
+# Fases na ordem em que aparecem no Server-Timing
+PHASES = ('db', 'fetch', 'parse', 'llm', 'serialize', 'compress')
+
+_current = contextvars.ContextVar('pitchbot_request_timer', default=None)
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class RequestTimer:
+    """Tempo total e número de trechos de cada fase de uma requisição"""
+
+    __slots__ = ('start', 'totals', 'counts')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.totals = {}
+        self.counts = {}
+
+    def add(self, name, elapsed):
+        self.totals[name] = self.totals.get(name, 0.0) + elapsed
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self, total):
+        """Valor do cabeçalho Server-Timing (durações em milissegundos)"""
+        names = [name for name in PHASES if name in self.totals]
+        names += sorted(name for name in self.totals if name not in PHASES)
+        entries = [
+            f'{name};dur={self.totals[name] * 1000:.2f};desc="{self.counts[name]}x"'
+            for name in names
+        ]
+        entries.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(entries)
+
+
+class _Span:
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def span(name):
+    """Mede o bloco `with` como parte da fase `name` da requisição atual
+
+    Fora de uma requisição instrumentada (instrumentação desligada, threads
+    de jobs ou do writer) não mede nada.
+    """
+    timer = _current.get()
+    if timer is None:
+        return _NULL_SPAN
+    return _Span(timer, name)
+
+
+def _add_to_current(name, elapsed):
+    timer = _current.get()
+    if timer is not None:
+        timer.add(name, elapsed)
+
+
+# Banco de dados ---------------------------------------------------------------
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor que soma o tempo dos comandos (execução + leitura) à fase `db`"""
+
+    _statement_elapsed = 0.0
+    _statement_logged = True
+
+    def _observe(self, sql, elapsed):
+        _add_to_current('db', elapsed)
+        self._statement_elapsed += elapsed
+        if (SLOW_QUERY_MS > 0 and not self._statement_logged
+                and self._statement_elapsed * 1000 >= SLOW_QUERY_MS):
+            # Registra uma vez por comando, quando ele passa do limite
+            self._statement_logged = True
+            _log_slow_query(self.connection, sql, self._statement_elapsed)
+
+    def _run(self, method, sql, *args):
+        self._sql = sql
+        self._statement_elapsed = 0.0
+        self._statement_logged = False
+        self.connection._traced = []
+        start = time.perf_counter()
+        try:
+            return method(sql, *args)
+        finally:
+            self._observe(sql, time.perf_counter() - start)
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._observe(getattr(self, '_sql', ''), time.perf_counter() - start)
+
+    def execute(self, sql, parameters=()):
+        return self._run(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._run(super().executescript, sql_script)
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+
+class TracedConnection(sqlite3.Connection):
+    """Conexão cujos cursores (inclusive os de execute()) são TracedCursor"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._traced = []
+        if SLOW_QUERY_MS > 0:
+            # O callback recebe o SQL já com os parâmetros e os comandos de triggers
+            self.set_trace_callback(self._traced_statement)
+
+    def _traced_statement(self, statement):
+        self._traced.append(statement)
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def connection_factory():
+    """Classe de conexão usada por db.open_connection"""
+    if INSTRUMENTATION_ENABLED or SLOW_QUERY_MS > 0:
+        return TracedConnection
+    return sqlite3.Connection
+
+
+def _log_slow_query(conn, sql, elapsed):
+    # O trace também recebe BEGIN implícitos e os comandos de triggers ("-- TRIGGER ...")
+    statements = getattr(conn, '_traced', None) or []
+    keyword = sql.split(None, 1)[0].upper() if sql.strip() else ''
+    main = next((s for s in statements if s.lstrip().upper().startswith(keyword)), sql)
+    triggers = sum(1 for s in statements if s.startswith('--'))
+    suffix = f' (+{triggers} comandos de triggers)' if triggers else ''
+    print(f"Consulta lenta ({elapsed * 1000:.1f} ms): {' '.join(main.split())}{suffix}")
+
+
+# Serialização -----------------------------------------------------------------
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Provider JSON do Flask que mede o jsonify() como fase `serialize`"""
+
+    def response(self, *args, **kwargs):
+        with span('serialize'):
+            return super().response(*args, **kwargs)
+
+
+# Hooks do Flask ---------------------------------------------------------------
+
+def init_app(app):
+    """Registra os hooks de instrumentação e profiling que estiverem ligados"""
+    if INSTRUMENTATION_ENABLED:
+        app.json = TimedJSONProvider(app)
+        app.before_request(_start_timer)
+        app.after_request(_finish_timer)
+    if PROFILING_ENABLED:
+        app.before_request(_start_profile)
+        app.after_request(_finish_profile)
+    if INSTRUMENTATION_ENABLED or PROFILING_ENABLED:
+        app.teardown_request(_teardown)
+
+
+def _start_timer():
+    g.request_timer = RequestTimer()
+    _current.set(g.request_timer)
+
+
+def _finish_timer(response):
+    timer = g.pop('request_timer', None)
+    if timer is None:
+        return response
+
+    total = timer.elapsed()
+    response.headers['Server-Timing'] = timer.server_timing(total)
+    if total * 1000 >= SLOW_REQUEST_MS:
+        phases = ' '.join(
+            f'{name}={timer.totals[name] * 1000:.1f}ms({timer.counts[name]})'
+            for name in sorted(timer.totals)
+        )
+        print(f"Requisição lenta: {request.method} {request.path} {response.status_code} "
+              f"{total * 1000:.1f} ms {phases}".rstrip())
+    return response
+
+
+def _requested_profiler():
+    name = request.headers.get(PROFILE_HEADER, '').strip().lower()
+    if not name:
+        return None
+    if name in ('1', 'true'):
+        name = 'cprofile'
+    if name not in PROFILERS:
+        return None
+    if PROFILE_TOKEN and not hmac.compare_digest(
+            request.headers.get(PROFILE_TOKEN_HEADER, ''), PROFILE_TOKEN):
+        return None
+    if name == 'pyinstrument' and pyinstrument is None:
+        print("pyinstrument não está instalado; usando cProfile")
+        name = 'cprofile'
+    return name
+
+
+def _start_profile():
+    name = _requested_profiler()
+    if name is None:
+        return
+    if name == 'pyinstrument':
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    g.profiler = (name, profiler)
+
+
+def _stop_profile():
+    entry = g.pop('profiler', None)
+    if entry is None:
+        return None
+    name, profiler = entry
+    if name == 'pyinstrument':
+        profiler.stop()
+    else:
+        profiler.disable()
+    return name, profiler
+
+
+def _finish_profile(response):
+    entry = _stop_profile()
+    if entry is None:
+        return response
+
+    name, profiler = entry
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    endpoint = re.sub(r'[^\w.-]+', '_', request.endpoint or 'unknown')
+    if name == 'pyinstrument':
+        path = os.path.join(PROFILE_DIR, f'{stamp}-{endpoint}.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
+    else:
+        # Abra com `python -m pstats` ou snakeviz
+        path = os.path.join(PROFILE_DIR, f'{stamp}-{endpoint}.prof')
+        profiler.dump_stats(path)
+
+    response.headers['X-Pitchbot-Profile-File'] = os.path.basename(path)
+    return response
+
+
+def _teardown(error=None):
+    # Garante que nada fica ligado para a próxima requisição da mesma thread
+    _stop_profile()
+    g.pop('request_timer', None)
+    _current.set(None)
@@ -0,0 +1,332 @@
+"""
+Fila de jobs em segundo plano para geração de propostas em lote
+
+Um job é um lote de itens (especificações de proposta) gravado nas tabelas
+`jobs` e `job_items`. Um pool de threads pega os itens pendentes direto do
+banco, então os jobs sobrevivem a reinícios e vários processos podem
+compartilhar a mesma fila: cada item é reservado em uma transação
+BEGIN IMMEDIATE (SELECT e UPDATE, sem RETURNING, que exige SQLite 3.35) e
+só volta para a fila se a reserva expirar (JOB_LEASE segundos). Cada reserva
+conta como tentativa: um item cuja reserva expira na última tentativa (ex.:
+derruba o processo toda vez) é marcado como falho em vez de voltar à fila.
+
+Falhas transitórias da OpenAI (LLMError.transient: limite de requisições,
+erros 5xx, falhas de conexão) são repetidas com espera exponencial até
+JOB_MAX_ATTEMPTS tentativas.
+
+O processamento de cada item é feito pela função `process(spec, api_key)`
+passada ao JobQueue, que retorna o objeto da proposta salva.
+"""
+import datetime
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from db import get_connection
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '4'))
+JOB_MAX_ITEMS = int(os.environ.get('JOB_MAX_ITEMS', '100'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETRY_DELAY = float(os.environ.get('JOB_RETRY_DELAY', '2'))
+JOB_LEASE = float(os.environ.get('JOB_LEASE', '300'))
+JOB_POLL_INTERVAL = 1.0
+
+# Estados dos itens; um job termina quando todos os itens estão em done/failed
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def _now_iso():
+    return datetime.datetime.now().isoformat()
+
+
+class JobQueue:
+    """Pool de workers que processa os itens pendentes gravados no banco"""
+
+    def __init__(self, process, workers=JOB_WORKERS, max_attempts=JOB_MAX_ATTEMPTS,
+                 retry_delay=JOB_RETRY_DELAY, lease=JOB_LEASE):
+        self.process = process
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease = lease
+        # Chaves enviadas pelos clientes ficam só em memória (nunca no banco)
+        self._api_keys = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._pid = None
+
+    def start(self):
+        """Inicia os workers deste processo (idempotente; refeito após fork)"""
+        if self.workers <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._threads:
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout=None):
+        """Pede para os workers pararem depois do item atual"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        with self._lock:
+            self._threads = []
+
+    def submit(self, specs, api_key=None):
+        """Grava um job com os itens informados e retorna o seu id"""
+        job_id = uuid.uuid4().hex
+        now = _now_iso()
+        available_at = time.time()
+
+        with get_connection() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, status, total, created_at, updated_at) VALUES (?, ?, ?, ?, ?)',
+                (job_id, 'queued', len(specs), now, now)
+            )
+            conn.executemany('''
+            INSERT INTO job_items (job_id, position, spec, status, available_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', [
+                (job_id, position, json.dumps(spec, ensure_ascii=False), PENDING, available_at, now)
+                for position, spec in enumerate(specs)
+            ])
+            conn.commit()
+
+        if api_key:
+            with self._lock:
+                self._api_keys[job_id] = api_key
+
+        self.start()
+        self._wakeup.set()
+        return job_id
+
+    def status(self, job_id, include_results=True):
+        """Situação do job e dos seus itens, ou None se o job não existir"""
+        with get_connection() as conn:
+            job = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if job is None:
+                return None
+            items = conn.execute('''
+            SELECT position, status, attempts, proposal_id, result, error
+            FROM job_items WHERE job_id = ? ORDER BY position
+            ''', (job_id,)).fetchall()
+
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        results = []
+        for item in items:
+            counts[item['status']] += 1
+            entry = {
+                'position': item['position'],
+                'status': item['status'],
+                'attempts': item['attempts'],
+                'proposalId': item['proposal_id'],
+                'error': item['error']
+            }
+            if include_results and item['result']:
+                entry['proposal'] = json.loads(item['result'])
+            results.append(entry)
+
+        return {
+            'id': job['id'],
+            'status': job['status'],
+            'total': job['total'],
+            'pending': counts[PENDING],
+            'running': counts[RUNNING],
+            'done': counts[DONE],
+            'failed': counts[FAILED],
+            'progress': round((counts[DONE] + counts[FAILED]) / job['total'], 3) if job['total'] else 1.0,
+            'createdAt': job['created_at'],
+            'updatedAt': job['updated_at'],
+            'finishedAt': job['finished_at'],
+            'items': results
+        }
+
+    # Workers -----------------------------------------------------------------
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                item = self._claim()
+            except sqlite3.Error as e:
+                print(f"Erro ao buscar itens da fila de jobs: {str(e)}")
+                item = None
+
+            if item is None:
+                self._wakeup.wait(self._idle_timeout())
+                self._wakeup.clear()
+                continue
+
+            self._execute(item)
+
+    def _claim(self):
+        """Reserva o próximo item disponível (pendente ou com reserva expirada)"""
+        now = time.time()
+        item = None
+        with get_connection() as conn:
+            # O lock de escrita vem antes do SELECT: dois workers não pegam o mesmo item
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                finished_jobs = self._fail_expired(conn, now)
+                row = conn.execute('''
+                SELECT id, job_id, spec, attempts FROM job_items
+                WHERE (status = ? AND available_at <= ?)
+                   OR (status = ? AND lease_expires_at < ? AND attempts < ?)
+                ORDER BY available_at, id
+                LIMIT 1
+                ''', (PENDING, now, RUNNING, now, self.max_attempts)).fetchone()
+                if row is not None:
+                    conn.execute('''
+                    UPDATE job_items
+                    SET status = ?, attempts = attempts + 1, lease_expires_at = ?, updated_at = ?
+                    WHERE id = ?
+                    ''', (RUNNING, now + self.lease, _now_iso(), row['id']))
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ? AND status = 'queued'",
+                        (_now_iso(), row['job_id'])
+                    )
+                    item = dict(row, attempts=row['attempts'] + 1)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+        self._forget_keys(finished_jobs)
+        return item
+
+    def _fail_expired(self, conn, now):
+        """Marca como falhos os itens com reserva expirada que já usaram todas as tentativas
+
+        Retorna os jobs que terminaram com isso.
+        """
+        expired = 'status = ? AND lease_expires_at < ? AND attempts >= ?'
+        params = (RUNNING, now, self.max_attempts)
+        job_ids = [r['job_id'] for r in conn.execute(
+            f'SELECT DISTINCT job_id FROM job_items WHERE {expired}', params
+        ).fetchall()]
+        if not job_ids:
+            return []
+        conn.execute(f'''
+        UPDATE job_items
+        SET status = ?, error = ?, lease_expires_at = NULL, updated_at = ?
+        WHERE {expired}
+        ''', (
+            FAILED, f'Processamento interrompido em todas as {self.max_attempts} tentativas', _now_iso()
+        ) + params)
+        return [job_id for job_id in job_ids if self._close_job(conn, job_id)]
+
+    def _idle_timeout(self):
+        """Espera até a próxima nova tentativa agendada, limitada a JOB_POLL_INTERVAL"""
+        try:
+            with get_connection() as conn:
+                next_at = conn.execute(
+                    'SELECT MIN(available_at) FROM job_items WHERE status = ?', (PENDING,)
+                ).fetchone()[0]
+        except sqlite3.Error:
+            return JOB_POLL_INTERVAL
+        if next_at is None:
+            return JOB_POLL_INTERVAL
+        return min(JOB_POLL_INTERVAL, max(0.0, next_at - time.time()))
+
+    def _api_key_for(self, job_id):
+        with self._lock:
+            key = self._api_keys.get(job_id)
+        return key or os.environ.get('OPENAI_API_KEY') or os.environ.get('DEFAULT_OPENAI_API_KEY')
+
+    def _execute(self, item):
+        # llm (e o requests) só é carregado quando há item para processar
+        from llm import LLMError
+
+        spec = json.loads(item['spec'])
+        api_key = self._api_key_for(item['job_id'])
+
+        if not api_key:
+            # A chave enviada com o job se perdeu (reinício) e não há chave no ambiente
+            self._finish(item, FAILED, error='Chave API OpenAI indisponível. Envie o job novamente.')
+            return
+
+        try:
+            proposal = self.process(spec, api_key)
+        except LLMError as e:
+            if e.transient and item['attempts'] < self.max_attempts:
+                self._retry(item, str(e))
+            else:
+                self._finish(item, FAILED, error=f'Erro ao gerar a proposta: {str(e)}')
+            return
+        except Exception as e:
+            print(f"Erro ao processar item do job {item['job_id']}: {str(e)}")
+            self._finish(item, FAILED, error=f'Erro ao gerar a proposta: {str(e)}')
+            return
+
+        self._finish(item, DONE, proposal=proposal)
+
+    def _retry(self, item, error):
+        """Devolve o item para a fila com espera exponencial e jitter"""
+        delay = self.retry_delay * (2 ** (item['attempts'] - 1))
+        delay += random.uniform(0, self.retry_delay)
+        with get_connection() as conn:
+            conn.execute('''
+            UPDATE job_items
+            SET status = ?, available_at = ?, lease_expires_at = NULL, error = ?, updated_at = ?
+            WHERE id = ?
+            ''', (PENDING, time.time() + delay, error, _now_iso(), item['id']))
+            conn.commit()
+
+    def _finish(self, item, status, proposal=None, error=None):
+        """Grava o resultado do item e fecha o job quando todos terminarem"""
+        now = _now_iso()
+        with get_connection() as conn:
+            conn.execute('''
+            UPDATE job_items
+            SET status = ?, proposal_id = ?, result = ?, error = ?, lease_expires_at = NULL, updated_at = ?
+            WHERE id = ?
+            ''', (
+                status,
+                proposal['id'] if proposal else None,
+                json.dumps(proposal, ensure_ascii=False) if proposal else None,
+                error,
+                now,
+                item['id']
+            ))
+            finished = self._close_job(conn, item['job_id'])
+            conn.commit()
+
+        if finished:
+            self._forget_keys([item['job_id']])
+
+    def _close_job(self, conn, job_id):
+        """Marca o job como concluído se não restar item aberto; retorna se concluiu"""
+        now = _now_iso()
+        open_items = conn.execute(
+            'SELECT COUNT(*) FROM job_items WHERE job_id = ? AND status IN (?, ?)',
+            (job_id, PENDING, RUNNING)
+        ).fetchone()[0]
+        if open_items:
+            conn.execute('UPDATE jobs SET updated_at = ? WHERE id = ?', (now, job_id))
+            return False
+        conn.execute(
+            "UPDATE jobs SET status = 'completed', updated_at = ?, finished_at = ? WHERE id = ?",
+            (now, now, job_id)
+        )
+        return True
+
+    def _forget_keys(self, job_ids):
+        with self._lock:
+            for job_id in job_ids:
+                self._api_keys.pop(job_id, None)
@@ -0,0 +1,263 @@
+"""
+Cliente HTTP para a API de chat da OpenAI
+
+Cada requisição cria o seu próprio OpenAIClient com a chave que deve usar,
+sem tocar em estado global; todos os clientes compartilham a mesma
+requests.Session, e portanto o mesmo pool de conexões keep-alive. Isso
+permite várias gerações simultâneas no mesmo processo.
+
+O SDK (openai==0.28) guarda a chave em uma variável global e não expõe a
+resposta HTTP de um stream, por isso as chamadas são feitas diretamente.
+
+Ao fim de cada chamada (com sucesso ou erro), os listeners registrados com
+add_listener() recebem um CallStats com modelo, rota, tokens, latência,
+tempo até o primeiro token (streaming) e a classe do erro.
+"""
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import span
+
+# Mesma variável de ambiente usada pelo SDK da OpenAI
+OPENAI_API_BASE = os.environ.get('OPENAI_API_BASE', 'https://api.openai.com/v1')
+
+# Conexões keep-alive mantidas por host
+MAX_CONNECTIONS = int(os.environ.get('OPENAI_MAX_CONNECTIONS', '32'))
+
+# (conexão, leitura), em segundos; no streaming a leitura é o intervalo entre trechos
+REQUEST_TIMEOUT = (10, 120)
+STREAM_TIMEOUT = (10, 60)
+
+
+CallStats = namedtuple('CallStats', [
+    'route', 'model', 'streaming', 'prompt_tokens', 'completion_tokens',
+    'latency', 'ttft', 'error_class'
+])
+
+_listeners = []
+
+
+def add_listener(listener):
+    """Registra uma função chamada com o CallStats de cada chamada à API"""
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def _emit(stats):
+    for listener in _listeners:
+        try:
+            listener(stats)
+        except Exception as e:
+            # Telemetria nunca deve derrubar uma geração
+            print(f"Erro ao registrar a chamada à OpenAI: {str(e)}")
+
+
+def error_class(error):
+    """Classe de erro usada nas métricas"""
+    if isinstance(error, LLMError):
+        status = error.status_code
+        if status == 429:
+            return 'rate_limit'
+        if status in (401, 403):
+            return 'auth'
+        if status is not None and status >= 500:
+            return 'server_error'
+        if status is not None and status >= 400:
+            return 'bad_request'
+        return error.kind or ('transient' if error.transient else 'api_error')
+    return type(error).__name__
+
+
+class LLMError(Exception):
+    """Erro retornado pela API da OpenAI durante uma geração
+
+    `transient` indica falhas que valem uma nova tentativa (limite de
+    requisições, erro do servidor, timeout ou queda de conexão).
+    """
+
+    def __init__(self, message, status_code=None, transient=False, kind=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.transient = transient
+        self.kind = kind
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Retorna a sessão HTTP compartilhada do processo (recriada após fork)"""
+    global _session, _session_pid
+
+    if _session is not None and _session_pid == os.getpid():
+        return _session
+
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_CONNECTIONS)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+            _session_pid = os.getpid()
+        return _session
+
+
+class OpenAIClient:
+    """Cliente da API de chat com credenciais próprias e pool compartilhado"""
+
+    def __init__(self, api_key, api_base=None, session=None, route=None):
+        self.api_key = api_key
+        self.api_base = (api_base or OPENAI_API_BASE).rstrip('/')
+        self.session = session or get_session()
+        self.route = route or 'unknown'  # rota que originou a chamada, para as métricas
+
+    def _post(self, payload, stream=False):
+        """Envia uma requisição para /chat/completions"""
+        try:
+            response = self.session.post(
+                f'{self.api_base}/chat/completions',
+                headers={
+                    'Authorization': f'Bearer {self.api_key}',
+                    'Content-Type': 'application/json'
+                },
+                json=payload,
+                stream=stream,
+                timeout=STREAM_TIMEOUT if stream else REQUEST_TIMEOUT
+            )
+        except requests.Timeout as e:
+            raise LLMError(f'Falha de conexão com a OpenAI: {str(e)}', transient=True, kind='timeout')
+        except requests.ConnectionError as e:
+            raise LLMError(f'Falha de conexão com a OpenAI: {str(e)}', transient=True, kind='connection')
+
+        if response.status_code != 200:
+            message = _error_message(response)
+            response.close()
+            raise LLMError(
+                message,
+                status_code=response.status_code,
+                transient=response.status_code == 429 or response.status_code >= 500
+            )
+
+        return response
+
+    def _record(self, model, start, streaming, usage=None, ttft=None, error=None, completion_tokens=None):
+        usage = usage or {}
+        _emit(CallStats(
+            route=self.route,
+            model=model,
+            streaming=streaming,
+            prompt_tokens=usage.get('prompt_tokens'),
+            completion_tokens=usage.get('completion_tokens', completion_tokens),
+            latency=time.perf_counter() - start,
+            ttft=ttft,
+            error_class=error_class(error) if error is not None else None
+        ))
+
+    def chat(self, model, messages, max_tokens, temperature):
+        """Gera uma resposta completa e retorna o texto"""
+        start = time.perf_counter()
+        try:
+            with span('llm'):
+                response = self._post({
+                    'model': model,
+                    'messages': messages,
+                    'max_tokens': max_tokens,
+                    'temperature': temperature
+                })
+
+            try:
+                body = response.json()
+                content = body['choices'][0]['message']['content']
+            except (ValueError, KeyError, IndexError, TypeError):
+                raise LLMError(
+                    'Resposta inválida da OpenAI',
+                    status_code=response.status_code,
+                    transient=True,
+                    kind='invalid_response'
+                )
+        except LLMError as e:
+            self._record(model, start, False, error=e)
+            raise
+
+        self._record(model, start, False, usage=body.get('usage'))
+        return content
+
+    def stream_chat(self, model, messages, max_tokens, temperature):
+        """Gera os trechos de texto da resposta conforme chegam da API
+
+        Fechar o gerador (por exemplo quando o cliente HTTP desconecta) fecha a
+        conexão com a OpenAI e interrompe a geração dos tokens restantes.
+        """
+        start = time.perf_counter()
+        try:
+            response = self._post({
+                'model': model,
+                'messages': messages,
+                'max_tokens': max_tokens,
+                'temperature': temperature,
+                'stream': True,
+                # Pede o uso de tokens no último evento do stream
+                'stream_options': {'include_usage': True}
+            }, stream=True)
+        except LLMError as e:
+            self._record(model, start, True, error=e)
+            raise
+
+        ttft = None
+        usage = None
+        pieces = 0
+        error = None
+        try:
+            # chunk_size=None entrega cada evento assim que ele chega, sem buffer
+            for line in response.iter_lines(chunk_size=None):
+                if not line.startswith(b'data:'):
+                    continue
+
+                payload = line[5:].strip()
+                if payload == b'[DONE]':
+                    break
+
+                chunk = json.loads(payload)
+                if chunk.get('error'):
+                    raise LLMError(chunk['error'].get('message', 'Erro durante o streaming'), kind='stream_error')
+                if chunk.get('usage'):
+                    usage = chunk['usage']
+
+                choices = chunk.get('choices') or [{}]
+                piece = choices[0].get('delta', {}).get('content')
+                if piece:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    pieces += 1
+                    yield piece
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = LLMError(f'Conexão com a OpenAI interrompida: {str(e)}', transient=True, kind='connection')
+            raise error
+        except GeneratorExit:
+            # O consumidor fechou o gerador (cliente desconectou)
+            error = LLMError('Geração cancelada', kind='cancelled')
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            response.close()
+            # Sem `usage` no stream, cada evento de conteúdo conta como um token
+            self._record(model, start, True, usage=usage, ttft=ttft, error=error, completion_tokens=pieces)
+
+
+def _error_message(response):
+    """Extrai a mensagem de erro de uma resposta não-200 da OpenAI"""
+    try:
+        return response.json()['error']['message']
+    except (ValueError, KeyError, TypeError):
+        return f'Status code: {response.status_code}'
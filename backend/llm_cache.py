@@ -0,0 +1,172 @@
+"""
+Cache persistente das respostas da OpenAI
+
+A chave é o hash de (modelo, temperatura, prompt de sistema, prompt do
+usuário) normalizados. As entradas ficam em um LRU em memória com TTL e são
+gravadas na tabela `llm_cache`, então sobrevivem a reinícios e são
+compartilhadas entre processos.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from db import get_connection
+
+CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', '1') != '0'
+CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', '256'))
+CACHE_TTL = float(os.environ.get('LLM_CACHE_TTL', str(7 * 24 * 3600)))
+
+
+def normalize_prompt(text):
+    """Remove diferenças que não mudam o prompt (quebras CRLF e espaços nas pontas)"""
+    lines = text.replace('\r\n', '\n').strip().split('\n')
+    return '\n'.join(line.rstrip() for line in lines)
+
+
+def make_key(model, temperature, system_prompt, prompt):
+    """Calcula a chave de cache de uma chamada"""
+    payload = json.dumps([
+        model,
+        round(float(temperature), 3),
+        normalize_prompt(system_prompt),
+        normalize_prompt(prompt)
+    ], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """LRU em memória com TTL, apoiado na tabela SQLite `llm_cache`"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, enabled=CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries = OrderedDict()  # key -> (content, expires_at, latency)
+        self._lock = threading.Lock()
+        self._stats = {
+            'memory_hits': 0,
+            'db_hits': 0,
+            'misses': 0,
+            'bypasses': 0,
+            'stores': 0,
+            'saved_seconds': 0.0
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _remember(self, key, content, expires_at, latency):
+        with self._lock:
+            self._entries[key] = (content, expires_at, latency)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key, bypass=False):
+        """Retorna o conteúdo em cache ou None
+
+        Com `bypass`, apenas contabiliza o desvio e retorna None.
+        """
+        if not self.enabled:
+            return None
+        if bypass:
+            self._count('bypasses')
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                self._stats['saved_seconds'] += entry[2]
+                return entry[0]
+            if entry:
+                del self._entries[key]
+
+        try:
+            with get_connection() as conn:
+                row = conn.execute(
+                    'SELECT content, expires_at, latency FROM llm_cache WHERE key = ? AND expires_at > ?',
+                    (key, now)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Erro ao consultar o cache de respostas: {str(e)}")
+            row = None
+
+        if row is None:
+            self._count('misses')
+            return None
+
+        self._remember(key, row['content'], row['expires_at'], row['latency'])
+        with self._lock:
+            self._stats['db_hits'] += 1
+            self._stats['saved_seconds'] += row['latency']
+        return row['content']
+
+    def put(self, key, model, content, latency):
+        """Grava uma resposta na memória e no banco"""
+        if not self.enabled:
+            return
+
+        now = time.time()
+        expires_at = now + self.ttl
+        self._remember(key, content, expires_at, latency)
+
+        # Uma falha ao gravar o cache não deve derrubar a geração
+        try:
+            with get_connection() as conn:
+                conn.execute('''
+                INSERT OR REPLACE INTO llm_cache (key, model, content, latency, created_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ''', (key, model, content, latency, now, expires_at))
+                conn.execute('DELETE FROM llm_cache WHERE expires_at <= ?', (now,))
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Erro ao gravar o cache de respostas: {str(e)}")
+
+        self._count('stores')
+
+    def get_or_generate(self, key, model, generate, bypass=False):
+        """Retorna (conteúdo, veio_do_cache), chamando `generate()` em caso de miss
+
+        Com `bypass`, ignora o cache na leitura mas grava a nova resposta,
+        que passa a ser a servida nas próximas chamadas iguais.
+        """
+        content = self.get(key, bypass=bypass)
+        if content is not None:
+            return content, True
+
+        start = time.perf_counter()
+        content = generate()
+        self.put(key, model, content, time.perf_counter() - start)
+        return content, False
+
+    def stats(self):
+        """Contadores de uso do cache"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._entries)
+
+        lookups = stats['memory_hits'] + stats['db_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['db_hits']) / lookups if lookups else 0.0
+        stats['saved_seconds'] = round(stats['saved_seconds'], 3)
+        stats['enabled'] = self.enabled
+        return stats
+
+    def clear(self):
+        """Esvazia o cache em memória e no banco"""
+        with self._lock:
+            self._entries.clear()
+        with get_connection() as conn:
+            conn.execute('DELETE FROM llm_cache')
+            conn.commit()
+
+
+# Cache compartilhado pelas rotas de geração
+cache = LLMCache()
@@ -0,0 +1,566 @@
+"""
+Migrações versionadas do esquema do banco
+
+A versão do esquema fica em `PRAGMA user_version`. migrate() compara essa
+versão com a quantidade de migrações de MIGRATIONS e aplica, em ordem e
+dentro de uma transação BEGIN IMMEDIATE, só as que faltam; com o banco já
+atualizado, a inicialização faz uma única leitura do PRAGMA e nenhum DDL.
+
+O app (na inicialização) e o db_utils.py (init, stats e import) usam o
+mesmo runner, então os dois sempre enxergam o mesmo esquema.
+
+Para mudar o esquema, acrescente uma função ao final de MIGRATIONS; nunca
+altere uma migração que já foi publicada. Por isso cada migração traz o seu
+próprio DDL, como era na versão em que foi publicada, em vez de chamar
+funções dos outros módulos, que podem mudar depois.
+"""
+import sqlite3
+
+import compression
+
+
+def _columns(cursor, table):
+    return {row[1] for row in cursor.execute(f'PRAGMA table_info({table})').fetchall()}
+
+
+def has_table(conn, name):
+    """Verifica se a tabela (ou tabela virtual) existe no banco"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def _001_base_schema(cursor):
+    """Tabelas originais do app (idempotente para bancos criados antes das migrações)"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS proposals (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_name TEXT NOT NULL,
+        project_description TEXT NOT NULL,
+        value REAL NOT NULL,
+        deadline TEXT NOT NULL,
+        additional_points TEXT,
+        custom_prompt TEXT,
+        content TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        author TEXT NOT NULL,
+        model TEXT NOT NULL,
+        project_id INTEGER
+    )
+    ''')
+    # Bancos criados pelo db_utils.py antigo não tinham a coluna
+    if 'project_id' not in _columns(cursor, 'proposals'):
+        cursor.execute('ALTER TABLE proposals ADD COLUMN project_id INTEGER')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS projects (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        description TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )
+    ''')
+
+    # Cache persistente das respostas da OpenAI (ver llm_cache.py)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS llm_cache (
+        key TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        content TEXT NOT NULL,
+        latency REAL NOT NULL,
+        created_at REAL NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_expires_at ON llm_cache (expires_at)')
+
+    # Fila de geração em lote (ver jobs.py)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        total INTEGER NOT NULL,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        finished_at TEXT
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS job_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_id TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        spec TEXT NOT NULL,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        available_at REAL NOT NULL,
+        lease_expires_at REAL,
+        proposal_id INTEGER,
+        result TEXT,
+        error TEXT,
+        updated_at TEXT NOT NULL
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_job_items_job ON job_items (job_id, position)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_job_items_status ON job_items (status, available_at)')
+
+    # Telemetria das chamadas à OpenAI (ver telemetry.py)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS llm_calls (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at REAL NOT NULL,
+        route TEXT NOT NULL,
+        model TEXT NOT NULL,
+        streaming INTEGER NOT NULL,
+        prompt_tokens INTEGER,
+        completion_tokens INTEGER,
+        latency REAL NOT NULL,
+        ttft REAL,
+        error_class TEXT
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_calls_created_at ON llm_calls (created_at)')
+
+
+def _002_search_index(cursor):
+    """Índice FTS5 das propostas e os triggers que o mantêm sincronizado"""
+    exists = has_table(cursor.connection, 'proposals_fts')
+
+    try:
+        # remove_diacritics 2: "orcamento" encontra "orçamento"; prefix acelera buscas parciais
+        cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS proposals_fts USING fts5(
+            client_name,
+            project_description,
+            content,
+            content='proposals',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"FTS5 indisponível, a busca usará LIKE: {str(e)}")
+        return
+
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS proposals_fts_insert AFTER INSERT ON proposals BEGIN
+        INSERT INTO proposals_fts (rowid, client_name, project_description, content)
+        VALUES (new.id, new.client_name, new.project_description, new.content);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS proposals_fts_delete AFTER DELETE ON proposals BEGIN
+        INSERT INTO proposals_fts (proposals_fts, rowid, client_name, project_description, content)
+        VALUES ('delete', old.id, old.client_name, old.project_description, old.content);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS proposals_fts_update AFTER UPDATE ON proposals BEGIN
+        INSERT INTO proposals_fts (proposals_fts, rowid, client_name, project_description, content)
+        VALUES ('delete', old.id, old.client_name, old.project_description, old.content);
+        INSERT INTO proposals_fts (rowid, client_name, project_description, content)
+        VALUES (new.id, new.client_name, new.project_description, new.content);
+    END
+    ''')
+
+    # Indexa as propostas que já existiam antes da criação do índice
+    if not exists:
+        cursor.execute("INSERT INTO proposals_fts (proposals_fts) VALUES ('rebuild')")
+
+
+def _fill_proposal_stats(cursor):
+    """Soma todas as propostas aos agregados (usada pelas migrações 3 e 5)"""
+    for dimension, key in (
+        ('total', "''"),
+        ('model', 'model'),
+        ('month', 'substr(created_at, 1, 7)'),
+        ('project', "COALESCE(CAST(project_id AS TEXT), '')"),
+        ('author', 'author'),
+    ):
+        cursor.execute(f'''
+        INSERT INTO proposal_stats (dimension, key, count, total_value)
+        SELECT '{dimension}', {key}, COUNT(*), TOTAL(value)
+        FROM proposals
+        GROUP BY {key}
+        ON CONFLICT (dimension, key) DO UPDATE SET
+            count = count + excluded.count,
+            total_value = total_value + excluded.total_value
+        ''')
+
+
+def _003_stats_rollups(cursor):
+    """Agregados de /api/stats mantidos por triggers (ver stats.py)"""
+    exists = has_table(cursor.connection, 'proposal_stats')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS proposal_stats (
+        dimension TEXT NOT NULL,
+        key TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        total_value REAL NOT NULL,
+        PRIMARY KEY (dimension, key)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS proposal_stats_insert AFTER INSERT ON proposals BEGIN
+        INSERT INTO proposal_stats (dimension, key, count, total_value) VALUES
+            ('total', '', 1, 1 * new.value),
+            ('model', new.model, 1, 1 * new.value),
+            ('month', substr(new.created_at, 1, 7), 1, 1 * new.value),
+            ('project', COALESCE(CAST(new.project_id AS TEXT), ''), 1, 1 * new.value),
+            ('author', new.author, 1, 1 * new.value)
+        ON CONFLICT (dimension, key) DO UPDATE SET
+            count = count + excluded.count,
+            total_value = total_value + excluded.total_value;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS proposal_stats_delete AFTER DELETE ON proposals BEGIN
+        INSERT INTO proposal_stats (dimension, key, count, total_value) VALUES
+            ('total', '', -1, -1 * old.value),
+            ('model', old.model, -1, -1 * old.value),
+            ('month', substr(old.created_at, 1, 7), -1, -1 * old.value),
+            ('project', COALESCE(CAST(old.project_id AS TEXT), ''), -1, -1 * old.value),
+            ('author', old.author, -1, -1 * old.value)
+        ON CONFLICT (dimension, key) DO UPDATE SET
+            count = count + excluded.count,
+            total_value = total_value + excluded.total_value;
+        DELETE FROM proposal_stats WHERE count <= 0;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS proposal_stats_update
+    AFTER UPDATE OF value, model, created_at, project_id, author ON proposals BEGIN
+        INSERT INTO proposal_stats (dimension, key, count, total_value) VALUES
+            ('total', '', -1, -1 * old.value),
+            ('model', old.model, -1, -1 * old.value),
+            ('month', substr(old.created_at, 1, 7), -1, -1 * old.value),
+            ('project', COALESCE(CAST(old.project_id AS TEXT), ''), -1, -1 * old.value),
+            ('author', old.author, -1, -1 * old.value)
+        ON CONFLICT (dimension, key) DO UPDATE SET
+            count = count + excluded.count,
+            total_value = total_value + excluded.total_value;
+        INSERT INTO proposal_stats (dimension, key, count, total_value) VALUES
+            ('total', '', 1, 1 * new.value),
+            ('model', new.model, 1, 1 * new.value),
+            ('month', substr(new.created_at, 1, 7), 1, 1 * new.value),
+            ('project', COALESCE(CAST(new.project_id AS TEXT), ''), 1, 1 * new.value),
+            ('author', new.author, 1, 1 * new.value)
+        ON CONFLICT (dimension, key) DO UPDATE SET
+            count = count + excluded.count,
+            total_value = total_value + excluded.total_value;
+        DELETE FROM proposal_stats WHERE count <= 0;
+    END
+    ''')
+
+    # Na primeira criação, a tabela é preenchida com as propostas existentes
+    if not exists:
+        _fill_proposal_stats(cursor)
+
+
+def _004_import_dedupe(cursor):
+    """Hash de conteúdo e checkpoints da importação em lote (ver db_utils.py)"""
+    if 'content_hash' not in _columns(cursor, 'proposals'):
+        cursor.execute('ALTER TABLE proposals ADD COLUMN content_hash BLOB')
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_proposals_content_hash
+    ON proposals (content_hash) WHERE content_hash IS NOT NULL
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS import_checkpoints (
+        source TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime INTEGER NOT NULL,
+        format TEXT NOT NULL,
+        offset INTEGER NOT NULL,
+        rows_read INTEGER NOT NULL,
+        inserted INTEGER NOT NULL,
+        duplicates INTEGER NOT NULL,
+        invalid INTEGER NOT NULL,
+        deferred_sql TEXT,
+        first_id INTEGER NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    ''')
+
+
+def _005_indexes_and_foreign_key(cursor):
+    """Chave estrangeira proposals.project_id -> projects.id e índices das consultas
+
+    O SQLite não adiciona chaves estrangeiras com ALTER TABLE, então a tabela
+    é recriada (mantendo os ids, que o índice FTS usa como rowid). Propostas
+    que apontavam para projetos já removidos ficam sem projeto.
+    """
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(proposals)').fetchall()]
+    dependents = cursor.execute('''
+    SELECT sql FROM sqlite_master
+    WHERE tbl_name = 'proposals' AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    ''').fetchall()
+
+    cursor.execute('''
+    CREATE TABLE proposals_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_name TEXT NOT NULL,
+        project_description TEXT NOT NULL,
+        value REAL NOT NULL,
+        deadline TEXT NOT NULL,
+        additional_points TEXT,
+        custom_prompt TEXT,
+        content TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        author TEXT NOT NULL,
+        model TEXT NOT NULL,
+        project_id INTEGER REFERENCES projects (id) ON DELETE SET NULL,
+        content_hash BLOB
+    )
+    ''')
+    copied = ', '.join(column for column in columns if column != 'project_id')
+    cursor.execute(f'''
+    INSERT INTO proposals_new ({copied}, project_id)
+    SELECT {copied}, CASE WHEN project_id IN (SELECT id FROM projects) THEN project_id END
+    FROM proposals
+    ''')
+    cursor.execute('DROP TABLE proposals')
+    cursor.execute('ALTER TABLE proposals_new RENAME TO proposals')
+
+    # DROP TABLE levou junto os índices e triggers (FTS, agregados, hash)
+    for (sql,) in dependents:
+        cursor.execute(sql)
+
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_proposals_created_at ON proposals (created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_proposals_project_id ON proposals (project_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_proposals_client_name ON proposals (client_name COLLATE NOCASE)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_projects_created_at ON projects (created_at)')
+
+    # Os agregados por projeto mudam se algum project_id órfão virou NULL
+    cursor.execute('DELETE FROM proposal_stats')
+    _fill_proposal_stats(cursor)
+
+
+def _006_compressed_text(cursor):
+    """Texto das propostas comprimido com dicionário (ver compression.py)
+
+    Treina o primeiro dicionário com as propostas existentes, comprime as
+    linhas e recria o índice FTS5 lendo da view que descomprime o texto
+    (snippet() e 'rebuild' leem as colunas da tabela de conteúdo). O treino
+    e a compressão continuam em compression.py: cada valor gravado leva no
+    cabeçalho o formato e o id do dicionário, então uma mudança ali não
+    altera o esquema nem a leitura do que esta migração gravou.
+    """
+    conn = cursor.connection
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS text_dictionaries (
+        id INTEGER PRIMARY KEY,
+        data BLOB NOT NULL,
+        samples INTEGER NOT NULL,
+        created_at TEXT NOT NULL
+    )
+    ''')
+    dictionary_id, samples = compression.train(conn)
+    compression.register(conn)
+
+    fts = has_table(conn, 'proposals_fts')
+    if fts:
+        cursor.execute('DROP TRIGGER IF EXISTS proposals_fts_insert')
+        cursor.execute('DROP TRIGGER IF EXISTS proposals_fts_delete')
+        cursor.execute('DROP TRIGGER IF EXISTS proposals_fts_update')
+        cursor.execute('DROP TABLE proposals_fts')
+
+    # Os agregados só observam colunas numéricas e de agrupamento: o UPDATE não os dispara
+    cursor.execute('''
+    UPDATE proposals
+    SET project_description = pack_text(project_description), content = pack_text(content)
+    ''')
+    if cursor.rowcount:
+        print(f"  {cursor.rowcount} propostas comprimidas "
+              f"(dicionário {dictionary_id:08x}, treinado com {samples} propostas)")
+
+    if not fts:
+        return
+
+    cursor.execute('''
+    CREATE VIEW IF NOT EXISTS proposals_fts_source AS
+    SELECT id, client_name, unpack_text(project_description) AS project_description,
+           unpack_text(content) AS content
+    FROM proposals
+    ''')
+    cursor.execute('''
+    CREATE VIRTUAL TABLE proposals_fts USING fts5(
+        client_name,
+        project_description,
+        content,
+        content='proposals_fts_source',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER proposals_fts_insert AFTER INSERT ON proposals BEGIN
+        INSERT INTO proposals_fts (rowid, client_name, project_description, content)
+        VALUES (new.id, new.client_name, unpack_text(new.project_description), unpack_text(new.content));
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER proposals_fts_delete AFTER DELETE ON proposals BEGIN
+        INSERT INTO proposals_fts (proposals_fts, rowid, client_name, project_description, content)
+        VALUES ('delete', old.id, old.client_name, unpack_text(old.project_description), unpack_text(old.content));
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER proposals_fts_update AFTER UPDATE ON proposals BEGIN
+        INSERT INTO proposals_fts (proposals_fts, rowid, client_name, project_description, content)
+        VALUES ('delete', old.id, old.client_name, unpack_text(old.project_description), unpack_text(old.content));
+        INSERT INTO proposals_fts (rowid, client_name, project_description, content)
+        VALUES (new.id, new.client_name, unpack_text(new.project_description), unpack_text(new.content));
+    END
+    ''')
+    cursor.execute("INSERT INTO proposals_fts (proposals_fts) VALUES ('rebuild')")
+
+
+def _007_data_versions(cursor):
+    """Contadores de versão de propostas e projetos (ETags, ver response_cache.py)"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS data_versions (
+        scope TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO data_versions (scope, version) VALUES ('proposals', 0), ('projects', 0)")
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS proposals_version_insert AFTER INSERT ON proposals BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE scope = 'proposals';
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS proposals_version_update AFTER UPDATE ON proposals BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE scope = 'proposals';
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS proposals_version_delete AFTER DELETE ON proposals BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE scope = 'proposals';
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS projects_version_insert AFTER INSERT ON projects BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE scope = 'projects';
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS projects_version_update AFTER UPDATE ON projects BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE scope = 'projects';
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS projects_version_delete AFTER DELETE ON projects BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE scope = 'projects';
+    END
+    ''')
+
+
+def _008_search_update_columns(cursor):
+    """Trigger de UPDATE da busca restrito às colunas indexadas
+
+    Sem a lista de colunas, qualquer UPDATE (como o preenchimento do
+    content_hash antes de cada importação) apagava e reinseria a linha no
+    índice FTS, descomprimindo o texto duas vezes.
+    """
+    if not has_table(cursor.connection, 'proposals_fts'):
+        return
+    cursor.execute('DROP TRIGGER IF EXISTS proposals_fts_update')
+    cursor.execute('''
+    CREATE TRIGGER proposals_fts_update
+    AFTER UPDATE OF client_name, project_description, content ON proposals BEGIN
+        INSERT INTO proposals_fts (proposals_fts, rowid, client_name, project_description, content)
+        VALUES ('delete', old.id, old.client_name, unpack_text(old.project_description), unpack_text(old.content));
+        INSERT INTO proposals_fts (rowid, client_name, project_description, content)
+        VALUES (new.id, new.client_name, unpack_text(new.project_description), unpack_text(new.content));
+    END
+    ''')
+
+
+def _009_checkpoints_without_first_id(cursor):
+    """Remove a coluna first_id, sem uso, dos checkpoints da importação
+
+    ALTER TABLE DROP COLUMN só existe a partir do SQLite 3.35, então a
+    tabela é recriada, mantendo os checkpoints de importações em andamento.
+    """
+    cursor.execute('''
+    CREATE TABLE import_checkpoints_new (
+        source TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime INTEGER NOT NULL,
+        format TEXT NOT NULL,
+        offset INTEGER NOT NULL,
+        rows_read INTEGER NOT NULL,
+        inserted INTEGER NOT NULL,
+        duplicates INTEGER NOT NULL,
+        invalid INTEGER NOT NULL,
+        deferred_sql TEXT,
+        updated_at TEXT NOT NULL
+    )
+    ''')
+    cursor.execute('''
+    INSERT INTO import_checkpoints_new
+    SELECT source, size, mtime, format, offset, rows_read, inserted, duplicates, invalid,
+           deferred_sql, updated_at
+    FROM import_checkpoints
+    ''')
+    cursor.execute('DROP TABLE import_checkpoints')
+    cursor.execute('ALTER TABLE import_checkpoints_new RENAME TO import_checkpoints')
+
+
+MIGRATIONS = (
+    _001_base_schema,
+    _002_search_index,
+    _003_stats_rollups,
+    _004_import_dedupe,
+    _005_indexes_and_foreign_key,
+    _006_compressed_text,
+    _007_data_versions,
+    _008_search_update_columns,
+    _009_checkpoints_without_first_id,
+)
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    """Aplica as migrações pendentes e retorna a versão final do esquema"""
+    if schema_version(conn) >= SCHEMA_VERSION:
+        return SCHEMA_VERSION
+
+    if conn.in_transaction:
+        conn.commit()
+    # Recriar tabelas com chaves estrangeiras exige foreign_keys desligado
+    # (o PRAGMA não tem efeito dentro de uma transação)
+    foreign_keys = conn.execute('PRAGMA foreign_keys').fetchone()[0]
+    conn.execute('PRAGMA foreign_keys=OFF')
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Outro processo pode ter migrado enquanto esperávamos o lock
+            version = schema_version(conn)
+            cursor = conn.cursor()
+            for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                migration(cursor)
+                cursor.execute(f'PRAGMA user_version = {number}')
+                print(f"Migração {number} aplicada: {migration.__doc__.splitlines()[0]}")
+
+            violations = cursor.execute('PRAGMA foreign_key_check').fetchall()
+            if violations:
+                raise sqlite3.IntegrityError(f'Migração deixou {len(violations)} chaves estrangeiras inválidas')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute(f'PRAGMA foreign_keys={"ON" if foreign_keys else "OFF"}')
+
+    return SCHEMA_VERSION
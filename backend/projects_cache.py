@@ -0,0 +1,120 @@
+"""
+Cache em memória da tabela de projetos
+
+Os projetos mudam pouco, mas são lidos a cada geração (resolve_project_id),
+a cada listagem e pelas estatísticas. O cache guarda uma cópia da tabela
+inteira, já na ordem da listagem (created_at DESC, id DESC), e a recarrega
+quando a versão `projects` de `data_versions` (ver response_cache.py) muda.
+
+As rotas que alteram projetos chamam invalidate(), então no próprio
+processo a mudança aparece na leitura seguinte. Escritas de outros
+processos (outros workers, db_utils.py) são percebidas pela versão, que é
+conferida no máximo a cada PROJECTS_CACHE_CHECK_INTERVAL segundos: entre
+uma conferência e outra, as leituras não executam nenhum SQL. Quem já leu
+a versão (as rotas com ETag) passa `min_version` e recebe um snapshot pelo
+menos tão novo quanto ela.
+"""
+import os
+import threading
+import time
+
+from db import get_connection
+
+PROJECTS_CACHE_ENABLED = os.environ.get('PROJECTS_CACHE_ENABLED', '1') != '0'
+PROJECTS_CACHE_CHECK_INTERVAL = float(os.environ.get('PROJECTS_CACHE_CHECK_INTERVAL', '1'))
+
+
+class ProjectsCache:
+    """Cópia da tabela projects, invalidada pelas rotas e pela versão no banco"""
+
+    def __init__(self, check_interval=PROJECTS_CACHE_CHECK_INTERVAL, enabled=PROJECTS_CACHE_ENABLED):
+        self.check_interval = check_interval
+        self.enabled = enabled
+        self._projects = None  # lista na ordem da listagem
+        self._by_id = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._generation = 0  # muda a cada invalidate()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'checks': 0, 'loads': 0}
+
+    def _load(self, min_version=None):
+        """Snapshot (projetos, índice por id) atual, recarregando se a versão mudou
+
+        Com `min_version`, um snapshot de versão anterior é recarregado sem
+        esperar pela próxima conferência.
+        """
+        now = time.monotonic()
+        with self._lock:
+            fresh = min_version is None or (self._version is not None and self._version >= min_version)
+            if self._projects is not None and fresh and now - self._checked_at < self.check_interval:
+                self._stats['hits'] += 1
+                return self._projects, self._by_id
+            generation = self._generation
+            projects, by_id, version = self._projects, self._by_id, self._version
+            self._stats['checks'] += 1
+
+        loaded = False
+        with get_connection() as conn:
+            # A versão é lida antes das linhas: se mudar no meio, a próxima conferência recarrega
+            current = conn.execute(
+                "SELECT version FROM data_versions WHERE scope = 'projects'"
+            ).fetchone()[0]
+            if projects is None or current != version:
+                projects = [dict(row) for row in conn.execute(
+                    'SELECT * FROM projects ORDER BY created_at DESC, id DESC'
+                ).fetchall()]
+                by_id = {project['id']: project for project in projects}
+                loaded = True
+
+        with self._lock:
+            # Um invalidate() durante a leitura vence: este snapshot pode ser anterior à escrita
+            if generation == self._generation:
+                self._projects, self._by_id, self._version = projects, by_id, current
+                self._checked_at = now
+                if loaded:
+                    self._stats['loads'] += 1
+        return projects, by_id
+
+    def get(self, project_id, min_version=None):
+        """Projeto (dict) pelo id, ou None"""
+        try:
+            project_id = int(project_id)
+        except (TypeError, ValueError):
+            return None
+
+        if not self.enabled:
+            with get_connection() as conn:
+                row = conn.execute('SELECT * FROM projects WHERE id = ?', (project_id,)).fetchone()
+            return dict(row) if row else None
+
+        project = self._load(min_version)[1].get(project_id)
+        return dict(project) if project else None
+
+    def list(self, min_version=None):
+        """Todos os projetos, do mais recente para o mais antigo"""
+        if not self.enabled:
+            with get_connection() as conn:
+                return [dict(row) for row in conn.execute(
+                    'SELECT * FROM projects ORDER BY created_at DESC, id DESC'
+                ).fetchall()]
+
+        return [dict(project) for project in self._load(min_version)[0]]
+
+    def invalidate(self):
+        """Descarta a cópia (chamada depois de criar, alterar ou remover um projeto)"""
+        with self._lock:
+            self._generation += 1
+            self._projects = None
+            self._by_id = {}
+            self._version = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, projects=len(self._by_id), version=self._version)
+        stats['enabled'] = self.enabled
+        return stats
+
+
+# Cache compartilhado pelas rotas e pela geração
+cache = ProjectsCache()
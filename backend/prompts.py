@@ -0,0 +1,346 @@
+"""
+Montagem dos prompts de geração com orçamento de tokens
+
+As partes fixas (prompt de sistema, instruções de formatação e o bloco de
+instruções do prompt do usuário) são montadas uma única vez, quando o
+PromptBuilder é criado, e ficam no início das mensagens, para que o cache de
+prefixo do provedor possa reaproveitá-las. Os dados da proposta vêm por
+último.
+
+Os campos variáveis têm os espaços normalizados e, se o prompt passar do
+orçamento de tokens de entrada do modelo, os maiores são truncados até
+caberem. A contagem usa o tiktoken quando ele está instalado e o vocabulário
+já foi carregado; caso contrário, usa uma estimativa (aproximadamente um
+token a cada 4 caracteres de uma palavra). O vocabulário é carregado em
+segundo plano desde a inicialização (warmup), com espera limitada; o
+próprio import do tiktoken acontece nessa thread, fora do import do app.
+"""
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+# Tamanho do contexto de cada modelo e orçamento de tokens de entrada
+MODEL_CONTEXT_TOKENS = {
+    'gpt-3.5-turbo': 16385,
+    'gpt-4': 8192
+}
+DEFAULT_CONTEXT_TOKENS = 4096
+INPUT_TOKEN_BUDGET = int(os.environ.get('PROMPT_MAX_INPUT_TOKENS', '3000'))
+
+# Espera máxima (s) pelo vocabulário do tiktoken e intervalo entre tentativas depois de uma falha
+TIKTOKEN_LOAD_TIMEOUT = float(os.environ.get('TIKTOKEN_LOAD_TIMEOUT', '10'))
+TIKTOKEN_RETRY_INTERVAL = float(os.environ.get('TIKTOKEN_RETRY_INTERVAL', '300'))
+# Carrega os vocabulários na inicialização (0: só na primeira geração de cada modelo)
+TIKTOKEN_WARMUP = os.environ.get('TIKTOKEN_WARMUP', '1') != '0'
+
+# Tokens extras que a API acrescenta por mensagem e por resposta (formato chat)
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+TRUNCATION_MARKER = ' [...]'
+
+# Campos variáveis que podem ser truncados, do que menos ao que mais perde
+TRUNCATABLE_FIELDS = ('clientName', 'deadline', 'additionalPoints', 'customPrompt', 'projectDescription')
+
+# O cumprimento leva o nome do cliente, então fica na parte variável, depois dos dados
+GREETING_INSTRUCTION = '- OBRIGATORIAMENTE comece com o cumprimento "Prezado(a) {client_name}, tudo bem?"'
+# Vezes que o nome do cliente aparece no prompt (nos dados e no cumprimento)
+CLIENT_NAME_OCCURRENCES = 2
+
+SPACES_RE = re.compile(r'[ \t\f\v]+')
+BLANK_LINES_RE = re.compile(r'\n{3,}')
+ESTIMATE_TOKEN_RE = re.compile(r'\s*\w{1,4}|\s*[^\w\s]|\s+')
+
+FORMAT_INSTRUCTIONS = """
+VOCÊ DEVE USAR ESTAS TAGS FREQUENTEMENTE NO TEXTO PARA DESTACAR INFORMAÇÕES:
+
+{b} {/b}: negrito - USE MUITO para destacar pontos principais, valores, prazos e termos importantes
+{i} {/i}: itálico - USE MUITO para enfatizar conceitos, metodologias e explicações importantes
+{u} {/u}: sublinhado - USE MUITO para elementos cruciais que exigem atenção especial do cliente
+
+EXEMPLOS DE USO CORRETO:
+- "Nosso prazo para entrega será de {b}30 dias úteis{/b}"
+- "Utilizaremos a metodologia {i}Design Thinking{/i} para desenvolver sua solução"
+- "É {u}imprescindível{/u} que os materiais sejam fornecidos até a data acordada"
+
+IMPORTANTE:
+- Use as tags de formatação em CADA PARÁGRAFO pelo menos uma vez
+- Utilize espaçamento generoso entre parágrafos (linhas em branco)
+- Separe cada tópico principal com pelo menos duas linhas em branco
+- Use listas com marcadores para melhorar a legibilidade
+"""
+
+SYSTEM_PROMPT = """Redator de propostas comerciais: Crie propostas persuasivas e formais para a plataforma 99freelas.
+
+IMPORTANTE: A proposta é de um FREELANCER INDIVIDUAL (não uma equipe/empresa). Use sempre primeira pessoa do singular ("eu farei", "entregarei", "minha experiência", etc.) e não "nós" ou "nossa equipe".
+
+Estruture o conteúdo de forma lógica com espaçamento entre parágrafos, mas SEM USAR CABEÇALHOS EXPLÍCITOS como "Apresentação", "Escopo", etc.
+
+A proposta deve fluir naturalmente incluindo:
+- Um cumprimento inicial ao cliente que DEVE seguir este formato específico:
+  * Identifique o gênero do cliente com base no nome fornecido (analise o primeiro nome)
+  * Use "Prezado" para nomes masculinos ou "Prezada" para nomes femininos
+  * SEMPRE inclua ", tudo bem?" logo após o nome
+  * Exemplo: "Prezado João, tudo bem?" ou "Prezada Maria, tudo bem?"
+- Demonstração de entendimento sobre o projeto
+- Descrição do que será entregue
+- Menção ao valor e prazo
+- Uma conclusão com proposta de próximos passos
+
+Formatação:
+- UTILIZE FREQUENTEMENTE AS TAGS DE FORMATAÇÃO {b}{/b}, {i}{/i} e {u}{/u} no texto
+- Use {b}{/b} para destacar pontos principais, valores, prazos e termos importantes
+- Use {i}{/i} para conceitos, metodologias e explicações
+- Use {u}{/u} para elementos cruciais que exigem atenção especial
+- Utilize bastante espaço em branco entre parágrafos (linhas em branco)
+- NÃO use títulos de seção como "APRESENTAÇÃO", "ESCOPO", etc.
+- Use parágrafos curtos e concisos
+
+Use linguagem formal, destaque benefícios e personalize para o cliente.
+Assine como autor fornecido no final do texto, indicando que é um freelancer profissional.
+
+""" + FORMAT_INSTRUCTIONS
+
+# Instruções fixas do prompt do usuário; só o autor é preenchido (uma vez)
+USER_INSTRUCTIONS = """Escreva uma proposta comercial para a plataforma 99freelas com os dados informados ao final. O texto deve fluir naturalmente entre os tópicos, sem usar cabeçalhos de seção:
+
+- Esta proposta é como FREELANCER INDIVIDUAL, não como equipe ou empresa
+- Use sempre primeira pessoa do singular ("eu farei", "entregarei", "desenvolverei")
+- NUNCA use "nós", "nosso time", "nossa equipe" ou qualquer referência a uma equipe
+- OBRIGATORIAMENTE comece com o cumprimento indicado ao final, usando o pronome correto (Prezado/Prezada) baseado no gênero do cliente que você deve identificar pelo nome
+- Adicione uma breve frase cordial antes de entrar no assunto
+- Demonstre que entendeu o projeto e as necessidades
+- Descreva o que será entregue e como será feito por você (individualmente)
+- Explique prazos e cronograma do seu trabalho individual
+- Mencione o investimento e condições de pagamento
+- Finalize com próximos passos e um convite para contato
+
+MUITO IMPORTANTE:
+- USE FREQUENTEMENTE as tags de formatação em seu texto
+- Use {{b}}negrito{{/b}} para destacar valores, prazos e pontos principais
+- Use {{i}}itálico{{/i}} para metodologias e conceitos importantes
+- Use {{u}}sublinhado{{/u}} para elementos cruciais que exigem atenção especial
+- Use pelo menos 3-4 formatações diferentes em cada parágrafo
+
+Use bastante espaço em branco entre parágrafos para facilitar a leitura.
+
+Assine ao final com:
+
+Atenciosamente,
+{{b}}{author}{{/b}}
+
+Proposta comercial para:
+"""
+
+Prompt = namedtuple('Prompt', ['system_prompt', 'prompt', 'model', 'tokens', 'budget', 'truncated'])
+
+
+class Tokenizer:
+    """Conta e trunca tokens com o vocabulário do modelo (ou uma estimativa)"""
+
+    def __init__(self, encoding=None):
+        self.encoding = encoding
+        self.exact = encoding is not None
+
+    def count(self, text):
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return len(ESTIMATE_TOKEN_RE.findall(text))
+
+    def truncate(self, text, max_tokens):
+        """Primeiros `max_tokens` tokens do texto"""
+        if max_tokens <= 0:
+            return ''
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            # Um corte no meio de um caractere multibyte vira '�'
+            return self.encoding.decode(tokens[:max_tokens]).rstrip('�')
+
+        for index, match in enumerate(ESTIMATE_TOKEN_RE.finditer(text)):
+            if index == max_tokens:
+                return text[:match.start()]
+        return text
+
+
+ESTIMATE = Tokenizer()
+
+_tokenizers = {}  # modelo -> Tokenizer com o vocabulário carregado
+_loads = {}  # modelo -> carga em andamento ou que falhou
+_tokenizers_lock = threading.Lock()
+
+
+class _Load:
+    """Carga do vocabulário de um modelo em uma thread própria"""
+
+    def __init__(self, model):
+        self.model = model
+        self.started_at = time.monotonic()
+        self.failed_at = None
+        self.missing = False  # tiktoken não instalado: não adianta tentar de novo
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f'tiktoken-{model}', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            import tiktoken  # dependência opcional, importada só aqui (fora da inicialização)
+            _tokenizers[self.model] = Tokenizer(tiktoken.encoding_for_model(self.model))
+        except ImportError:
+            self.missing = True
+            self.failed_at = time.monotonic()
+        except Exception as e:
+            # Vocabulário indisponível (ex.: sem rede na primeira execução): tenta de novo mais tarde
+            self.failed_at = time.monotonic()
+            print(f"Tokenizer do modelo {self.model} indisponível, usando estimativa: {str(e)}")
+        finally:
+            self.done.set()
+
+    def stale(self, now):
+        """A carga falhou há mais de TIKTOKEN_RETRY_INTERVAL s, ou a thread sumiu (fork)"""
+        if self.failed_at is not None:
+            return not self.missing and now - self.failed_at >= TIKTOKEN_RETRY_INTERVAL
+        return not self.done.is_set() and not self.thread.is_alive()
+
+
+def get_tokenizer(model, timeout=TIKTOKEN_LOAD_TIMEOUT):
+    """Tokenizer do modelo, carregado uma vez por processo
+
+    O vocabulário é carregado (e, na primeira execução, baixado) em uma
+    thread. Quem pede o tokenizer espera pela carga só até `timeout`
+    segundos depois do início dela; depois disso, ou se a carga falhar,
+    recebe a estimativa. Uma carga que falhou é repetida depois de
+    TIKTOKEN_RETRY_INTERVAL segundos; sem o tiktoken instalado, a estimativa
+    vale para sempre.
+    """
+    tokenizer = _tokenizers.get(model)
+    if tokenizer is not None:
+        return tokenizer
+
+    now = time.monotonic()
+    with _tokenizers_lock:
+        load = _loads.get(model)
+        if load is None or load.stale(now):
+            load = _loads[model] = _Load(model)
+
+    if load.failed_at is None:
+        load.done.wait(max(0.0, load.started_at + timeout - now))
+    return _tokenizers.get(model, ESTIMATE)
+
+
+def warmup(models=tuple(MODEL_CONTEXT_TOKENS)):
+    """Começa a carregar os vocabulários na inicialização, sem esperar por eles"""
+    if not TIKTOKEN_WARMUP:
+        return
+    for model in models:
+        get_tokenizer(model, timeout=0)
+
+
+def normalize_field(text):
+    """Remove espaços repetidos, linhas em branco extras e espaços nas pontas"""
+    text = str(text).replace('\r\n', '\n').replace('\r', '\n')
+    text = SPACES_RE.sub(' ', text)
+    text = '\n'.join(line.strip() for line in text.split('\n'))
+    return BLANK_LINES_RE.sub('\n\n', text).strip()
+
+
+def allocate(sizes, budget):
+    """Divide o orçamento entre os campos: os menores cabem inteiros, os maiores dividem o resto"""
+    caps = {}
+    remaining = max(0, budget)
+    ordered = sorted(sizes.items(), key=lambda item: item[1])
+    for index, (name, size) in enumerate(ordered):
+        share = remaining // (len(ordered) - index)
+        caps[name] = min(size, share)
+        remaining -= caps[name]
+    return caps
+
+
+class PromptBuilder:
+    """Monta os prompts de geração dentro do orçamento de tokens de cada modelo"""
+
+    def __init__(self, author, max_tokens, input_budget=INPUT_TOKEN_BUDGET):
+        self.max_tokens = max_tokens
+        self.input_budget = input_budget
+        self.system_prompt = SYSTEM_PROMPT
+        self.user_instructions = USER_INSTRUCTIONS.format(author=author)
+        # (modelo, vocabulário exato) -> tokens; a estimativa é usada enquanto o vocabulário carrega
+        self._fixed_tokens = {}  # tokens das partes fixas
+        self._system_tokens = {}  # tokens do prompt de sistema
+
+    def budget_for(self, model):
+        """Tokens de entrada permitidos: o orçamento configurado ou o que sobra no contexto"""
+        context = MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+        return min(self.input_budget, context - self.max_tokens)
+
+    def _render(self, fields, value):
+        """Bloco com os dados da proposta (a parte variável, no fim do prompt)"""
+        prompt = (
+            f"{self.user_instructions}\n"
+            f"{{b}}CLIENTE:{{/b}} {fields['clientName']}\n\n"
+            f"{{b}}PROJETO:{{/b}} {fields['projectDescription']}\n\n"
+            f"{{b}}VALOR:{{/b}} R$ {float(value):.2f}\n\n"
+            f"{{b}}PRAZO:{{/b}} {fields['deadline']}"
+        )
+        if fields['additionalPoints']:
+            prompt += f"\n\n{{b}}PONTOS ADICIONAIS:{{/b}} {fields['additionalPoints']}"
+        if fields['customPrompt']:
+            prompt += f"\n\n{{b}}INSTRUÇÕES:{{/b}} {fields['customPrompt']}"
+        prompt += '\n\n' + GREETING_INSTRUCTION.format(client_name=fields['clientName'])
+        return prompt
+
+    def fixed_tokens(self, model, tokenizer):
+        """Tokens de tudo que não depende da requisição (contados uma vez por modelo)"""
+        key = (model, tokenizer.exact)
+        if key not in self._fixed_tokens:
+            empty = {name: '' for name in TRUNCATABLE_FIELDS}
+            # Rótulos opcionais entram na conta para não estourar quando estiverem presentes
+            skeleton = self._render(dict(empty, additionalPoints=' ', customPrompt=' '), 0)
+            self._fixed_tokens[key] = (
+                tokenizer.count(self.system_prompt)
+                + tokenizer.count(skeleton)
+                + 2 * TOKENS_PER_MESSAGE + TOKENS_PER_REPLY
+            )
+        return self._fixed_tokens[key]
+
+    def count_messages(self, model, tokenizer, prompt):
+        """Tokens de entrada da chamada (prompt de sistema contado uma vez por modelo)"""
+        key = (model, tokenizer.exact)
+        if key not in self._system_tokens:
+            self._system_tokens[key] = tokenizer.count(self.system_prompt)
+        return (
+            self._system_tokens[key] + tokenizer.count(prompt)
+            + 2 * TOKENS_PER_MESSAGE + TOKENS_PER_REPLY
+        )
+
+    def build(self, data):
+        """Retorna um Prompt com as mensagens, o modelo e a contagem de tokens"""
+        model = "gpt-4" if data.get('useGPT4', False) else "gpt-3.5-turbo"
+        tokenizer = get_tokenizer(model)
+        budget = self.budget_for(model)
+
+        fields = {name: normalize_field(data.get(name) or '') for name in TRUNCATABLE_FIELDS}
+        sizes = {name: tokenizer.count(text) for name, text in fields.items()}
+        sizes['clientName'] *= CLIENT_NAME_OCCURRENCES
+
+        truncated = []
+        available = budget - self.fixed_tokens(model, tokenizer) - 10  # folga de arredondamento
+        if sum(sizes.values()) > available:
+            marker_tokens = tokenizer.count(TRUNCATION_MARKER)
+            caps = allocate(sizes, available)
+            for name, cap in caps.items():
+                if cap < sizes[name]:
+                    if name == 'clientName':
+                        cap //= CLIENT_NAME_OCCURRENCES
+                    fields[name] = tokenizer.truncate(fields[name], cap - marker_tokens).rstrip() + TRUNCATION_MARKER
+                    truncated.append(name)
+
+        prompt = self._render(fields, data['value'])
+        tokens = self.count_messages(model, tokenizer, prompt)
+
+        return Prompt(self.system_prompt, prompt, model, tokens, budget, truncated)
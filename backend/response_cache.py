@@ -0,0 +1,148 @@
+"""
+Versões dos dados, ETags e cache das respostas das rotas de leitura
+
+A tabela `data_versions` guarda um contador para cada tabela observada
+(`proposals` e `projects`), incrementado por triggers a cada INSERT, UPDATE
+ou DELETE, inclusive os feitos por outros processos (db_utils.py, outros
+workers). Ler as versões é uma consulta a uma tabela de duas linhas.
+
+As rotas decoradas com @cached(...) respondem com um ETag fraco montado
+com as versões das tabelas de que dependem. Se o If-None-Match do cliente
+bater, a resposta é 304 sem consultar as tabelas. Senão, o corpo JSON é
+procurado em um LRU em memória chaveado por (rota, query, versões), e a
+view só roda (SQL e serialização) em caso de miss. Uma escrita muda a
+versão, então as entradas antigas deixam de ser encontradas e saem do LRU
+com o tempo. A tabela e os triggers são criados pela migração 7
+(ver migrations.py).
+"""
+import functools
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response, g, has_request_context, make_response, request
+
+from db import get_connection
+
+RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', '1') != '0'
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '256'))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+
+def read_versions(conn):
+    """Versão atual de cada tabela observada"""
+    return {scope: version for scope, version in conn.execute('SELECT scope, version FROM data_versions')}
+
+
+def etag_version(scope):
+    """Versão de `scope` usada no ETag da requisição atual (None fora de uma rota @cached)
+
+    As views leem dados de outros caches em memória (ver projects_cache.py)
+    com esta versão como mínimo: o corpo guardado sob um ETag nunca é mais
+    antigo que ele.
+    """
+    if not has_request_context():
+        return None
+    return g.get('data_versions', {}).get(scope)
+
+
+def make_etag(scopes, versions):
+    """Valor do ETag (fraco) para as versões das tabelas de uma rota"""
+    return '-'.join(f'{scope}.{versions.get(scope, 0)}' for scope in scopes)
+
+
+class ResponseCache:
+    """LRU dos corpos JSON já serializados, limitado em entradas e em bytes"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, max_bytes=RESPONSE_CACHE_MAX_BYTES,
+                 enabled=RESPONSE_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._entries = OrderedDict()  # (rota, query, etag) -> corpo
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'not_modified': 0}
+
+    def count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return body
+
+    def put(self, key, body):
+        # Uma resposta enorme (listagem completa) não pode expulsar todo o resto
+        if not self.enabled or len(body) > self.max_bytes // 4:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = body
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries), bytes=self._bytes)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['enabled'] = self.enabled
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+# Cache compartilhado pelas rotas de leitura
+cache = ResponseCache()
+
+
+def cached(*scopes):
+    """Decorator de rota GET: ETag/304 e cache do corpo pelas versões de `scopes`
+
+    Só respostas 200 em JSON vão para o cache; as demais (404, 400) passam
+    direto, sem ETag.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with get_connection() as conn:
+                versions = read_versions(conn)
+            etag = make_etag(scopes, versions)
+            g.data_versions = versions
+
+            if request.if_none_match.contains_weak(etag):
+                cache.count('not_modified')
+                response = Response(status=304)
+            else:
+                key = (request.path, tuple(sorted(request.args.items(multi=True))), etag)
+                body = cache.get(key)
+                if body is not None:
+                    response = Response(body, mimetype='application/json')
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.mimetype != 'application/json':
+                        return response
+                    cache.put(key, response.get_data())
+
+            response.set_etag(etag, weak=True)
+            # O navegador guarda a resposta, mas confirma o ETag a cada uso
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,166 @@
+"""
+Servidor de produção do backend
+
+    python serving.py                    # gunicorn se instalado, senão waitress
+    python serving.py --server waitress
+
+No Linux/macOS o app roda no gunicorn (gunicorn.conf.py + wsgi.py): vários
+processos com o app pré-carregado, cada um com WEB_THREADS threads (worker
+`gthread`), o que serve bem a este backend, que passa a maior parte do tempo
+esperando a OpenAI e o 99freelas. No Windows, onde o gunicorn não roda, o
+app é servido pelo waitress em um único processo com WEB_THREADS threads.
+
+Em ambos, SIGTERM (ou Ctrl+C) para de aceitar conexões e espera as
+requisições em andamento (inclusive gerações em streaming) por até
+WEB_GRACEFUL_TIMEOUT segundos antes de encerrar; os workers da fila de jobs
+terminam o item atual. O `flask run` continua sendo o servidor de
+desenvolvimento.
+"""
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+
+from werkzeug.wsgi import ClosingIterator
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+WEB_HOST = os.environ.get('WEB_HOST', '127.0.0.1')
+WEB_PORT = int(os.environ.get('WEB_PORT', os.environ.get('PORT', '5000')))
+# Processos do gunicorn (cada um tem o seu pool do banco e os seus caches em memória)
+WEB_WORKERS = int(os.environ.get('WEB_WORKERS', str(min(os.cpu_count() or 1, 4))))
+# Requisições simultâneas por processo; uma geração ocupa uma thread durante toda a chamada.
+# As conexões keep-alive não se dividem por igual entre os processos, então o valor deve
+# cobrir o pico de gerações simultâneas, não o pico dividido por WEB_WORKERS
+WEB_THREADS = int(os.environ.get('WEB_THREADS', '32'))
+WEB_PRELOAD = os.environ.get('WEB_PRELOAD', '1') != '0'
+WEB_KEEPALIVE = int(os.environ.get('WEB_KEEPALIVE', '5'))
+# Acima do tempo máximo de uma chamada à OpenAI (llm.REQUEST_TIMEOUT, 120 s)
+WEB_TIMEOUT = int(os.environ.get('WEB_TIMEOUT', '150'))
+WEB_GRACEFUL_TIMEOUT = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', '150'))
+# Reinicia cada processo depois de N requisições (0 desliga)
+WEB_MAX_REQUESTS = int(os.environ.get('WEB_MAX_REQUESTS', '0'))
+WEB_ACCESS_LOG = os.environ.get('WEB_ACCESS_LOG', '0') != '0'
+
+
+class InFlight:
+    """Middleware WSGI que conta as requisições em andamento
+
+    Uma requisição só termina quando o servidor fecha o corpo da resposta,
+    então respostas em streaming (SSE, NDJSON) contam até o último byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.active = 0
+        self._changed = threading.Condition()
+
+    def __call__(self, environ, start_response):
+        with self._changed:
+            self.active += 1
+        try:
+            body = self.app(environ, start_response)
+        except BaseException:
+            self._leave()
+            raise
+        return ClosingIterator(body, self._leave)
+
+    def _leave(self):
+        with self._changed:
+            self.active -= 1
+            self._changed.notify_all()
+
+    def wait(self, timeout):
+        """Espera até não haver requisições em andamento; False se o tempo acabar"""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.active == 0, timeout)
+
+
+def run_gunicorn(host, port):
+    """Substitui o processo atual pelo gunicorn com gunicorn.conf.py"""
+    os.environ['WEB_HOST'] = host
+    os.environ['WEB_PORT'] = str(port)
+    config = os.path.join(BACKEND_DIR, 'gunicorn.conf.py')
+    os.chdir(BACKEND_DIR)
+    os.execv(sys.executable, [sys.executable, '-m', 'gunicorn', '-c', config, 'wsgi:app'])
+
+
+def run_waitress(host, port):
+    """Serve o app com o waitress até SIGTERM/SIGINT, esperando as requisições em andamento"""
+    from waitress import wasyncore
+    from waitress.server import create_server
+
+    import app as backend
+
+    tracker = InFlight(backend.create_app(start_jobs=False))
+    server = create_server(
+        tracker,
+        host=host,
+        port=port,
+        threads=WEB_THREADS,
+        # Conexões keep-alive sem requisição em andamento; gerações longas não são cortadas
+        # (o limite delas é o timeout das chamadas em llm.py)
+        channel_timeout=WEB_KEEPALIVE,
+        cleanup_interval=WEB_KEEPALIVE,
+        ident='pitchbot'
+    )
+    backend.job_queue.start()
+
+    def drain():
+        start = time.monotonic()
+        drained = tracker.wait(WEB_GRACEFUL_TIMEOUT)
+        remaining = max(0.0, WEB_GRACEFUL_TIMEOUT - (time.monotonic() - start))
+        backend.job_queue.stop(timeout=remaining)
+        if not drained:
+            print(f'⚠️ {tracker.active} requisições ainda em andamento após {WEB_GRACEFUL_TIMEOUT} s')
+        # Fecha os canais restantes na thread do loop, que então termina
+        server.trigger.pull_trigger(lambda: wasyncore.close_all(server._map))
+
+    def shutdown(signum, frame):
+        if getattr(shutdown, 'called', False):
+            return
+        shutdown.called = True
+        print(f'Encerrando: aguardando {tracker.active} requisições em andamento...')
+        # Só o socket de escuta; as conexões abertas continuam sendo atendidas
+        server.trigger.pull_trigger(lambda: wasyncore.dispatcher.close(server))
+        threading.Thread(target=drain, name='drain', daemon=True).start()
+
+    for name in ('SIGTERM', 'SIGINT', 'SIGBREAK'):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), shutdown)
+
+    print(f'Servindo em http://{host}:{port} (waitress, {WEB_THREADS} threads)')
+    server.run()
+    server.task_dispatcher.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--server', choices=('auto', 'gunicorn', 'waitress'), default='auto')
+    parser.add_argument('--host', default=WEB_HOST)
+    parser.add_argument('--port', type=int, default=WEB_PORT)
+    args = parser.parse_args()
+
+    server = args.server
+    if server == 'auto':
+        try:
+            import gunicorn  # noqa: F401
+            server = 'gunicorn' if os.name != 'nt' else 'waitress'
+        except ImportError:
+            server = 'waitress'
+
+    if server == 'gunicorn':
+        run_gunicorn(args.host, args.port)
+    else:
+        try:
+            import waitress  # noqa: F401
+        except ImportError:
+            print('Instale o gunicorn (Linux/macOS) ou o waitress: pip install -r requirements.txt')
+            sys.exit(1)
+        run_waitress(args.host, args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Estatísticas das propostas mantidas em tabela de agregados
+
+A tabela `proposal_stats` guarda, para cada dimensão (total, modelo, mês,
+projeto e autor), a quantidade de propostas e a soma dos valores. Triggers
+em `proposals` atualizam as linhas afetadas a cada INSERT, DELETE ou UPDATE,
+então ler as estatísticas custa o número de grupos, não o de propostas.
+
+A tabela e os triggers são criados pelas migrações (ver migrations.py).
+rebuild() recalcula tudo a partir de `proposals` (usado pelo comando
+`db_utils.py stats --rebuild`, por exemplo depois de editar o banco com os
+triggers removidos).
+"""
+
+# Dimensão -> expressão da chave (as mesmas dos triggers das migrações, ver migrations.py)
+DIMENSIONS = (
+    ('total', "''"),
+    ('model', '{row}.model'),
+    ('month', 'substr({row}.created_at, 1, 7)'),
+    ('project', "COALESCE(CAST({row}.project_id AS TEXT), '')"),
+    ('author', '{row}.author'),
+)
+
+UPSERT = '''
+ON CONFLICT (dimension, key) DO UPDATE SET
+    count = count + excluded.count,
+    total_value = total_value + excluded.total_value
+'''
+
+
+def add_rows(cursor):
+    """Soma aos agregados todas as propostas (com a tabela vazia, recalcula tudo)"""
+    for dimension, key in DIMENSIONS:
+        expression = key.format(row='proposals')
+        cursor.execute(f'''
+        INSERT INTO proposal_stats (dimension, key, count, total_value)
+        SELECT '{dimension}', {expression}, COUNT(*), TOTAL(value)
+        FROM proposals
+        GROUP BY {expression}
+        {UPSERT}
+        ''')
+
+
+def rebuild(conn):
+    """Recalcula todos os agregados a partir de `proposals` em uma transação"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('DELETE FROM proposal_stats')
+        add_rows(conn)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def read(conn):
+    """Estatísticas agrupadas por dimensão, lidas só da tabela de agregados"""
+    result = {
+        'total': {'count': 0, 'totalValue': 0.0},
+        'byModel': [],
+        'byMonth': [],
+        'byProject': [],
+        'byAuthor': []
+    }
+    names = {'model': 'byModel', 'month': 'byMonth', 'project': 'byProject', 'author': 'byAuthor'}
+
+    rows = conn.execute(
+        'SELECT dimension, key, count, total_value FROM proposal_stats ORDER BY dimension, key'
+    ).fetchall()
+    for dimension, key, count, total_value in rows:
+        entry = {'count': count, 'totalValue': round(total_value, 2)}
+        if dimension == 'total':
+            result['total'] = entry
+            continue
+        if dimension == 'project':
+            entry['projectId'] = int(key) if key else None
+        else:
+            entry[dimension] = key
+        result[names[dimension]].append(entry)
+
+    result['byMonth'].reverse()  # mais recente primeiro
+    return result
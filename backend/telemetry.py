@@ -0,0 +1,208 @@
+"""
+Telemetria das chamadas à OpenAI
+
+Cada chamada (recebida de llm.add_listener) é gravada na tabela `llm_calls`
+pelo writer de group commit, sem bloquear a requisição, e entra nos
+histogramas em memória do processo. render_prometheus() exporta os
+contadores, os histogramas de latência e de tempo até o primeiro token e os
+percentis p50/p95/p99 por modelo e rota no formato texto do Prometheus.
+
+Os percentis são calculados sobre as últimas TELEMETRY_WINDOW observações
+de cada série; os buckets dos histogramas são cumulativos desde o início do
+processo.
+"""
+import bisect
+import math
+import os
+import threading
+import time
+from collections import deque
+
+import db
+
+TELEMETRY_ENABLED = os.environ.get('TELEMETRY_ENABLED', '1') != '0'
+TELEMETRY_WINDOW = int(os.environ.get('TELEMETRY_WINDOW', '1024'))
+TELEMETRY_RETENTION_DAYS = float(os.environ.get('TELEMETRY_RETENTION_DAYS', '30'))
+
+# Buckets em segundos: gerações levam de centenas de ms a minutos
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+TTFT_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# A cada quantas chamadas as linhas antigas são apagadas
+PRUNE_EVERY = 1000
+
+INSERT_SQL = '''
+INSERT INTO llm_calls (
+    created_at, route, model, streaming, prompt_tokens, completion_tokens, latency, ttft, error_class
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+class Histogram:
+    """Buckets cumulativos (formato Prometheus) e janela recente para percentis"""
+
+    def __init__(self, buckets, window=TELEMETRY_WINDOW):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # o último é +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantile(self, q):
+        """Percentil pelo método nearest-rank sobre a janela recente"""
+        if not self.recent:
+            return math.nan
+        ordered = sorted(self.recent)
+        return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            total += count
+            yield bound, total
+
+
+class Telemetry:
+    """Métricas das chamadas à OpenAI agrupadas por (modelo, rota)"""
+
+    def __init__(self, enabled=TELEMETRY_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._latency = {}    # (modelo, rota) -> Histogram
+        self._ttft = {}       # (modelo, rota) -> Histogram
+        self._requests = {}   # (modelo, rota, status) -> contagem
+        self._errors = {}     # (modelo, rota, classe do erro) -> contagem
+        self._tokens = {}     # (modelo, rota, tipo) -> soma
+        self._recorded = 0
+
+    def record(self, stats):
+        """Listener de llm: atualiza os histogramas e grava a chamada no banco"""
+        if not self.enabled:
+            return
+
+        key = (stats.model, stats.route)
+        status = 'error' if stats.error_class else 'ok'
+
+        with self._lock:
+            if key not in self._latency:
+                self._latency[key] = Histogram(LATENCY_BUCKETS)
+            self._latency[key].observe(stats.latency)
+
+            if stats.ttft is not None:
+                if key not in self._ttft:
+                    self._ttft[key] = Histogram(TTFT_BUCKETS)
+                self._ttft[key].observe(stats.ttft)
+
+            request_key = key + (status,)
+            self._requests[request_key] = self._requests.get(request_key, 0) + 1
+            if stats.error_class:
+                error_key = key + (stats.error_class,)
+                self._errors[error_key] = self._errors.get(error_key, 0) + 1
+            for kind, value in (('prompt', stats.prompt_tokens), ('completion', stats.completion_tokens)):
+                if value:
+                    token_key = key + (kind,)
+                    self._tokens[token_key] = self._tokens.get(token_key, 0) + value
+
+            self._recorded += 1
+            prune = self._recorded % PRUNE_EVERY == 0
+
+        # Gravação assíncrona: a requisição não espera o commit
+        db.get_writer().submit(INSERT_SQL, (
+            time.time(), stats.route, stats.model, int(stats.streaming),
+            stats.prompt_tokens, stats.completion_tokens, stats.latency, stats.ttft, stats.error_class
+        ))
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Apaga as chamadas mais antigas que TELEMETRY_RETENTION_DAYS"""
+        cutoff = time.time() - TELEMETRY_RETENTION_DAYS * 86400
+        db.get_writer().submit('DELETE FROM llm_calls WHERE created_at < ?', (cutoff,))
+
+    def reset(self):
+        """Zera as métricas em memória (o histórico no banco é mantido)"""
+        with self._lock:
+            self._latency.clear()
+            self._ttft.clear()
+            self._requests.clear()
+            self._errors.clear()
+            self._tokens.clear()
+
+    def render_prometheus(self, extra=None):
+        """Exporta as métricas no formato texto do Prometheus (versão 0.0.4)"""
+        lines = []
+        with self._lock:
+            _counter(lines, 'pitchbot_llm_requests_total', 'Chamadas à OpenAI por resultado',
+                     ('model', 'route', 'status'), self._requests)
+            _counter(lines, 'pitchbot_llm_errors_total', 'Chamadas à OpenAI com erro, por classe',
+                     ('model', 'route', 'error_class'), self._errors)
+            _counter(lines, 'pitchbot_llm_tokens_total', 'Tokens de entrada (prompt) e saída (completion)',
+                     ('model', 'route', 'type'), self._tokens)
+            _histogram(lines, 'pitchbot_llm_latency_seconds', 'Duração das chamadas à OpenAI',
+                       self._latency)
+            _histogram(lines, 'pitchbot_llm_ttft_seconds', 'Tempo até o primeiro token no streaming',
+                       self._ttft)
+
+        for name, help_text, value in extra or ():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {_format(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _format(value):
+    if isinstance(value, float):
+        if math.isnan(value):
+            return 'NaN'
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(round(value, 6))
+    return str(value)
+
+
+def _counter(lines, name, help_text, label_names, values):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} counter')
+    for key, value in sorted(values.items()):
+        lines.append(f'{name}{{{_labels(label_names, key)}}} {_format(value)}')
+
+
+def _histogram(lines, name, help_text, histograms):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for (model, route), histogram in sorted(histograms.items()):
+        labels = _labels(('model', 'route'), (model, route))
+        for bound, count in histogram.cumulative():
+            le = '+Inf' if math.isinf(bound) else _format(float(bound))
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {count}')
+        lines.append(f'{name}_sum{{{labels}}} {_format(histogram.sum)}')
+        lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+    # Percentis da janela recente (um histograma não os carrega diretamente)
+    quantile_name = f'{name}_quantile'
+    lines.append(f'# HELP {quantile_name} Percentis de {name} nas últimas {TELEMETRY_WINDOW} chamadas')
+    lines.append(f'# TYPE {quantile_name} gauge')
+    for (model, route), histogram in sorted(histograms.items()):
+        labels = _labels(('model', 'route'), (model, route))
+        for q in QUANTILES:
+            lines.append(f'{quantile_name}{{{labels},quantile="{q}"}} {_format(histogram.quantile(q))}')
+
+
+# Instância compartilhada, registrada como listener do cliente da OpenAI
+telemetry = Telemetry()
@@ -0,0 +1,57 @@
+"""
+Confere o extrator de passada única contra a implementação anterior
+
+O extrator reproduz sobre o html.parser.HTMLParser as regras de árvore do
+BeautifulSoup; estes casos garantem que o resultado continua idêntico ao
+dos seletores sobre a árvore completa (benchmarks/bench_extractor.py), nas
+páginas salvas e em trechos com as construções que o tokenizador trata de
+forma especial.
+
+Uso:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), 'benchmarks'))
+
+from bench_extractor import legacy_extract_project_data, load_fixtures  # noqa: E402
+from extractor import extract_project_data  # noqa: E402
+
+FIXTURES = load_fixtures()
+
+SNIPPETS = {
+    'entities': '<div class="info-usuario-nome"><span class="name">Jo&atilde;o &amp Filhos &nbsp;&foo;</span></div>',
+    'charrefs': '<div><div>Valor Mínimo:</div><div>R$ 1.250,00 &#147;&#x93;&#129;&#0;&#1114112;</div></div>',
+    'comments_and_cdata': '<div>Descrição do <!-- x -->Projeto: <![CDATA[oculto]]>Loja &lt;virtual&gt;</div>',
+    'cdata_marker': '<div><![CDATA[Valor Mínimo:]]></div><div>R$ 10</div><p>R$ 20</p>',
+    'cdata_in_template': '<div class="info-usuario-nome"><span class="name"><template><![CDATA[Fabi]]></template></span></div>',
+    'doctype_and_pi': '<!DOCTYPE html><?xml version="1.0"?><p>' + 'Texto longo sobre o projeto. ' * 5 + '</p>',
+    'empty_elements': '<div class="item-text project-description">Linha<br>um<br/>dois</br><img src=x>três</img></div>',
+    'self_closing_div': '<div>Cliente<div/><h2>Ana Lima</h2></div>',
+    'script_marker': '<div><script>var a = "Cliente";</script><h2>Bruno</h2></div>',
+    'iframe_marker': '<div><iframe>Cliente</iframe><h2>Carla</h2></div>',
+    'template_text': '<div class="info-usuario-nome"><span class="name"><template>x</template>Dani</span></div>',
+    'whitespace': '<div class="project-description">\n\n  <pre>  a\n  </pre>\t <textarea> </textarea>  </div>',
+    'duplicate_class': '<div class="info-usuario-nome"><span class="x" class="name">Edu</span></div>',
+    'unclosed_tags': '<div><div>Valor Mínimo:<div>R$ 99<p>Fim',
+    'stray_end_tags': '</span></div><div class="project-description">Texto</b></div>',
+    'uppercase_tags': '<DIV CLASS="item-text project-description">Caixa Alta</DIV>',
+    'empty': '',
+}
+
+
+@pytest.mark.parametrize('name', sorted(FIXTURES))
+def test_fixture_pages_match_soup(name):
+    html = FIXTURES[name]
+    assert extract_project_data(html) == legacy_extract_project_data(html)
+
+
+@pytest.mark.parametrize('name', sorted(SNIPPETS))
+def test_snippets_match_soup(name):
+    html = SNIPPETS[name]
+    assert extract_project_data(html) == legacy_extract_project_data(html)
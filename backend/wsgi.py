@@ -0,0 +1,13 @@
+"""
+Ponto de entrada WSGI para servidores de produção
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+O app é criado com os workers da fila de jobs parados: com o app
+pré-carregado, este módulo roda no processo mestre, e as threads não
+sobreviveriam ao fork. Cada processo que atende requisições inicia os seus
+(post_worker_init em gunicorn.conf.py).
+"""
+from app import create_app
+
+app = create_app(start_jobs=False)